@@ -0,0 +1,5 @@
+import os
+
+# The local stub has no quota, so benchmarks run the client without the OpenWeather plan's rate
+# limit unless asked to (bench_rate_limit builds its own limiters).
+os.environ.setdefault("OPENWEATHER_CALLS_PER_MINUTE", "0")
@@ -0,0 +1,147 @@
+"""Offline city index: build cost, size and lookup latency, against geocoding through the OpenWeather stub.
+
+Without --dataset a synthetic GeoNames-format file of --cities cities is generated (made-up
+names, clustered coordinates, Pareto populations), so it runs with no downloads; pass a real
+dump such as cities15000.txt or city.list.json to measure that instead. Nearest-neighbour
+results are checked against a brute-force scan.
+
+    python -m benchmarks.bench_city_index --cities 200000 --lookups 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.load_driver import percentile
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, statefulagent, weather_cache, weather_client, weather_provider
+from multi_tool_agent.city_index import CityIndex, build_index, haversine_km, load_dataset
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.weather_cache import WeatherCache
+from multi_tool_agent.weather_client import OpenWeatherClient
+from multi_tool_agent.weather_provider import LocalWeatherProvider
+
+SYLLABLES = ["ka", "lo", "san", "ber", "ton", "vil", "mar", "os", "ri", "ge", "na", "dor", "lin", "sha", "po",
+             "ville", "burg", "ham", "ta", "mi", "ro", "el", "an", "qu", "zu", "fen", "sø", "ão", "é"]
+
+
+def write_synthetic(path: str, count: int, seed: int):
+    """Writes `count` made-up cities as a GeoNames dump (tab separated, 19 columns)."""
+    rng = random.Random(seed)
+    centres = [(rng.uniform(-55, 65), rng.uniform(-180, 180)) for _ in range(400)]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title()
+            lat, lon = rng.choice(centres)
+            lat = max(-89.9, min(89.9, lat + rng.gauss(0, 3)))
+            lon = (lon + rng.gauss(0, 3) + 180) % 360 - 180
+            population = int(1000 * rng.paretovariate(1.2))
+            country = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(2))
+            f.write("\t".join([str(i), name, name, "", f"{lat:.5f}", f"{lon:.5f}", "P", "PPL", country, "",
+                               "", "", "", "", str(population), "", "", "UTC", "2024-01-01"]) + "\n")
+
+
+def timed(fn, args_list) -> tuple[list, list[float]]:
+    results, latencies = [], []
+    for args in args_list:
+        start = time.perf_counter()
+        results.append(fn(*args))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def report(label: str, latencies: list[float], extra: str = ""):
+    print(f"{label:<30} p50={percentile(latencies, 50) * 1e6:9.1f} us  p95={percentile(latencies, 95) * 1e6:9.1f} us"
+          f"  {extra}")
+
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(2, len(name)) if len(name) > 3 else len(name) - 1
+    return name[:i] + name[i + 1:]
+
+
+async def geocode_through(provider, names: list[str]) -> list[float]:
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache()
+    latencies = []
+    for name in names:
+        start = time.perf_counter()
+        await statefulagent.fetch_observation(name) if provider is None else await provider.geocode(name)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def compare_network(index: CityIndex, names: list[str], latency: float):
+    stub = StubOpenWeather(latency=latency).start_in_thread()
+    try:
+        client = OpenWeatherClient(api_key="x", base_url=stub.base_url)
+        before = stub.requests_served
+        report("geocode via OpenWeather stub", await geocode_through(client, names),
+               f"upstream calls={stub.requests_served - before}")
+        await client.aclose()
+        local = LocalWeatherProvider(index, fallback=None)
+        before = stub.requests_served
+        report("geocode via local index", await geocode_through(local, names),
+               f"upstream calls={stub.requests_served - before}")
+    finally:
+        stub.stop_thread()
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset = args.dataset
+        if dataset is None:
+            dataset = os.path.join(tmp, "cities.txt")
+            write_synthetic(dataset, args.cities, args.seed)
+        index_path = os.path.join(tmp, "cities.idx")
+        start = time.perf_counter()
+        count = build_index(load_dataset(dataset), index_path)
+        build_s = time.perf_counter() - start
+        size = os.path.getsize(index_path)
+        print(f"built {count} cities in {build_s:.2f}s: {size / 1e6:.1f} MB index ({size / count:.0f} bytes/city), "
+              f"dataset {os.path.getsize(dataset) / 1e6:.1f} MB")
+
+        start = time.perf_counter()
+        index = CityIndex(index_path)
+        print(f"opened in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        cities = [index.city(rng.randrange(count)) for _ in range(args.lookups)]
+        names = [c.name for c in cities]
+        found, latencies = timed(index.exact, [(n,) for n in names])
+        report("exact", latencies, f"found={sum(bool(r) for r in found)}/{len(names)}")
+        _, latencies = timed(index.prefix, [(n[:3],) for n in names])
+        report("prefix (3 chars, top 10)", latencies)
+        misspelt = [typo(n, rng) for n in names]
+        found, latencies = timed(index.lookup, [(n,) for n in misspelt])
+        report("lookup with one typo", latencies,
+               f"resolved to the intended name={sum(bool(r) and r.name == n for r, n in zip(found, names))}/{len(names)}")
+        points = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(args.lookups)]
+        found, latencies = timed(index.nearest, points)
+        report("nearest", latencies)
+
+        # Brute force over every record for a sample of the points.
+        every = [index.city(i) for i in range(count)]
+        sample = min(len(points), args.verify)
+        mismatches = 0
+        for (lat, lon), result in zip(points[:sample], found[:sample]):
+            best = min(haversine_km(lat, lon, c.lat, c.lon) for c in every)
+            mismatches += abs(result[0][1] - best) > 1e-6
+        print(f"nearest checked against brute force on {sample} points: {mismatches} mismatches")
+
+        await compare_network(index, names[:args.network_lookups], args.latency_ms / 1000)
+        index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dataset", help="GeoNames .txt, OpenWeather .json or .csv (optionally .gz)")
+    parser.add_argument("--cities", type=int, default=200000, help="synthetic cities when no --dataset")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--verify", type=int, default=50, help="nearest results checked by brute force")
+    parser.add_argument("--network-lookups", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50, help="stub response latency")
+    parser.add_argument("--seed", type=int, default=3)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,55 @@
+"""Session history size and turn latency for one long session, with and without compaction.
+
+    python -m benchmarks.bench_compaction --turns 60 --keep-turns 6
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import statefulagent, weather_client
+from multi_tool_agent.compaction import CompactionPolicy, history_size
+from multi_tool_agent.sqlite_session_service import SqliteSessionService
+
+QUERIES = ["What's the weather in London?", "Tell me the weather in New York.",
+           "What's the weather in London, Paris and Tokyo?", "How is the weather in Berlin?"]
+
+
+async def long_session(turns: int, policy: CompactionPolicy | None) -> dict:
+    runner = build_fake_runner(FakeLlm(), SqliteSessionService())
+    statefulagent.compaction_policy = policy
+    session = runner.session_service.create_session(app_name=runner.app_name, user_id="bench_user",
+                                                    state={"user_preference_temperature_unit": "Celsius"})
+    start = time.perf_counter()
+    for i in range(turns):
+        with contextlib.redirect_stdout(io.StringIO()):
+            await statefulagent.call_agent_async(QUERIES[i % len(QUERIES)], runner, session.user_id, session.id)
+    elapsed = time.perf_counter() - start
+    stored = runner.session_service.get_session(app_name=runner.app_name, user_id=session.user_id,
+                                                session_id=session.id)
+    return {**history_size(stored.events), "mean_turn_ms": elapsed / turns * 1000}
+
+
+async def main(turns: int, keep_turns: int):
+    stub = await StubOpenWeather(latency=0.0).start()
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+    try:
+        full = await long_session(turns, None)
+        compacted = await long_session(turns, CompactionPolicy(keep_turns=keep_turns, compact_after=keep_turns * 2))
+    finally:
+        await weather_client._shared_client.aclose()
+        await stub.stop()
+    for label, result in (("full history", full), ("compacted", compacted)):
+        print(f"{label:<13} after {turns} turns: {result['events']:4d} events, {result['bytes']:8d} bytes, "
+              f"~{result['tokens']:6d} tokens, mean turn {result['mean_turn_ms']:6.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=60)
+    parser.add_argument("--keep-turns", type=int, default=6)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.keep_turns))
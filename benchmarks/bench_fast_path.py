@@ -0,0 +1,76 @@
+"""LLM calls and latency saved by the fast-path greeting/farewell router.
+
+Replays benchmarks/conversations.jsonl through call_agent_async twice, once with the router
+disabled and once enabled, using FakeLlm (with a simulated per-call latency) and the local
+OpenWeather stub, and reports model calls and turn latency for both runs.
+
+    python -m benchmarks.bench_fast_path --llm-latency-ms 400
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+from pathlib import Path
+
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import response_cache, statefulagent, weather_client
+from multi_tool_agent.response_cache import ResponseCache
+from multi_tool_agent.router import FastPathRouter
+
+CORPUS = Path(__file__).with_name("conversations.jsonl")
+
+
+def load_corpus(path: Path = CORPUS) -> list[dict]:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def replay(corpus: list[dict], fast_path: bool, llm_latency: float) -> dict:
+    llm = FakeLlm(latency=llm_latency)
+    runner = build_fake_runner(llm)
+    router = FastPathRouter(statefulagent.say_hello, statefulagent.say_goodbye, enabled=fast_path)
+    statefulagent.fast_path_router = router
+    # Measure the router on its own; repeated questions would otherwise also hit the response cache.
+    response_cache._shared_cache = ResponseCache(max_entries=0)
+    latencies = []
+    for conversation in corpus:
+        session = runner.session_service.create_session(
+            app_name=runner.app_name, user_id="bench_user", session_id=conversation["conversation_id"],
+            state={"user_preference_temperature_unit": "Celsius"})
+        for query in conversation["turns"]:
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                await statefulagent.call_agent_async(query, runner, session.user_id, session.id)
+            latencies.append(time.perf_counter() - start)
+    return {"turns": len(latencies), "llm_calls": llm.calls, "total_s": sum(latencies),
+            "mean_ms": statistics.mean(latencies) * 1000, "router": router.stats()}
+
+
+async def main(llm_latency: float):
+    corpus = load_corpus()
+    stub = await StubOpenWeather(latency=0.02).start()
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+    try:
+        baseline = await replay(corpus, fast_path=False, llm_latency=llm_latency)
+        routed = await replay(corpus, fast_path=True, llm_latency=llm_latency)
+    finally:
+        await weather_client._shared_client.aclose()
+        await stub.stop()
+
+    for label, result in (("LLM only", baseline), ("fast path", routed)):
+        print(f"{label:<10} {result['turns']} turns, {result['llm_calls']:4d} LLM calls, "
+              f"total {result['total_s']:6.2f}s, mean turn {result['mean_ms']:7.1f} ms")
+    print(f"Saved {baseline['llm_calls'] - routed['llm_calls']} LLM calls "
+          f"({1 - routed['llm_calls'] / baseline['llm_calls']:.0%}) and "
+          f"{baseline['total_s'] - routed['total_s']:.2f}s of turn latency. Router stats: {routed['router']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    args = parser.parse_args()
+    asyncio.run(main(args.llm_latency_ms / 1000))
@@ -0,0 +1,101 @@
+"""Report formatting cost per tool call: formatting every time vs the precomputed text cached observations carry.
+
+Three paths over the same observations and a mix of session preferences (state as the tools see it):
+- legacy: the old build_report (Celsius / Fahrenheit only), formatted on every call;
+- per call: units.format_report with the full preference (temperature unit, wind unit, locale);
+- precomputed: FormattedObservation.report, as the weather tools use for weather cache hits.
+Each path includes reading the preference from state. Also reports the one-time cost of building a
+FormattedObservation when the cache stores an observation, and checks that Celsius / Fahrenheit
+reports are unchanged from the legacy wording.
+
+    python -m benchmarks.bench_formatting --observations 500 --calls 200000
+"""
+import argparse
+import random
+import time
+
+from multi_tool_agent.units import (TEMPERATURE_STATE_KEY, FormattedObservation, Locale, TemperatureUnit,
+                                    UnitPreference, WindUnit, format_report)
+
+CONDITIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "moderate rain", "snow", "mist"]
+CITIES = ["london", "paris", "tokyo", "new york", "sydney", "berlin", "madrid", "toronto"]
+
+
+def legacy_build_report(city: str, condition: str, temp_c: float, preferred_unit: str) -> str:
+    """build_report as it was before unit preferences (without the stale suffix)."""
+    if preferred_unit == "Fahrenheit":
+        temp_value = (temp_c * 9/5) + 32
+        temp_unit = "°F"
+    else:
+        temp_value = temp_c
+        temp_unit = "°C"
+    return f"The weather in {city.capitalize()} is {condition} with a temperature of {temp_value:.0f}{temp_unit}."
+
+
+def legacy_call(city: str, observation: dict, state: dict) -> str:
+    preferred_unit = state.get(TEMPERATURE_STATE_KEY, "Celsius")
+    return legacy_build_report(city, observation["condition"], observation["temp_c"], preferred_unit)
+
+
+def per_call(city: str, observation: dict, state: dict) -> str:
+    return format_report(city, observation, UnitPreference.from_state(state))
+
+
+def precomputed(city: str, observation: FormattedObservation, state: dict) -> str:
+    return observation.report(city, UnitPreference.from_state(state))
+
+
+def time_per_call(fn, work: list) -> float:
+    """Nanoseconds per call, best of three passes."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter_ns()
+        for city, observation, state in work:
+            fn(city, observation, state)
+        best = min(best, (time.perf_counter_ns() - start) / len(work))
+    return best
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    observations = [{"condition": rng.choice(CONDITIONS), "temp_c": round(rng.uniform(-25, 40), 2),
+                     "wind_ms": round(rng.uniform(0, 20), 1)} for _ in range(args.observations)]
+    legacy_states = [{TEMPERATURE_STATE_KEY: unit} for unit in ("Celsius", "Fahrenheit")]
+    full_states = [{**UnitPreference(temperature, wind, locale).state_delta()}
+                   for temperature in TemperatureUnit for wind in WindUnit for locale in Locale]
+
+    start = time.perf_counter_ns()
+    formatted = [FormattedObservation(observation) for observation in observations]
+    build_ns = (time.perf_counter_ns() - start) / len(observations)
+
+    # The same call sequence for every path: an observation, its city (one per coordinate, as in the
+    # weather cache) and a session's state.
+    picks = [(CITIES[i % len(CITIES)], i) for i in (rng.randrange(len(observations)) for _ in range(args.calls))]
+    legacy_work = [(city, observations[i], legacy_states[n % 2]) for n, (city, i) in enumerate(picks)]
+    print(f"{args.calls} calls over {args.observations} observations")
+    print(f"  building a FormattedObservation (once per stored observation): {build_ns / 1000:8.1f} us")
+
+    for label, states in (("Celsius / Fahrenheit", legacy_states), ("all preferences", full_states)):
+        work = [(city, observations[i], states[n % len(states)]) for n, (city, i) in enumerate(picks)]
+        work_formatted = [(city, formatted[i], states[n % len(states)]) for n, (city, i) in enumerate(picks)]
+        results = {"per call": time_per_call(per_call, work),
+                   "precomputed": time_per_call(precomputed, work_formatted)}
+        if states is legacy_states:
+            results = {"legacy": time_per_call(legacy_call, legacy_work), **results}
+        baseline = results.get("legacy", results["per call"])
+        print(f"{label} ({len(states)} preferences):")
+        for name, ns in results.items():
+            print(f"  {name:<12} {ns:8.0f} ns/call  ({baseline / ns:4.1f}x)")
+
+    unchanged = all(legacy_call(city, observation, state) == per_call(city, observation, state)
+                    == precomputed(city, formatted[i], state)
+                    for (city, observation, state), (_, i) in zip(legacy_work[:10000], picks))
+    print(f"Celsius / Fahrenheit reports identical to the legacy wording: {unchanged}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--observations", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,54 @@
+"""Cold-start import time of the agent modules, with a budget check.
+
+Each sample imports the package in a fresh interpreter. Fails (exit 1) if the median is over
+--budget-ms or if importing pulled in google.adk, which means something is being built at
+import time again.
+
+    python -m benchmarks.bench_import_time --budget-ms 1000
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "adk_loaded": "google.adk" in sys.modules}}))
+"""
+
+MODULES = ["multi_tool_agent", "multi_tool_agent.statefulagent"]
+
+
+def sample(module: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    args = parser.parse_args()
+
+    failures = []
+    for module in MODULES:
+        samples = [sample(module) for _ in range(args.samples)]
+        median_ms = statistics.median(s["seconds"] for s in samples) * 1000
+        adk_loaded = any(s["adk_loaded"] for s in samples)
+        print(f"import {module:<32} median {median_ms:7.1f} ms  (google.adk imported: {adk_loaded})")
+        if median_ms > args.budget_ms:
+            failures.append(f"{module} took {median_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        if adk_loaded:
+            failures.append(f"{module} imports google.adk at import time")
+    if failures:
+        print("REGRESSION: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Weather cache hit rate and lookup latency with and without background prefetching of popular cities.
+
+Lookups arrive at a steady rate with Zipf-skewed demand over --cities cities, so a few cities get
+most of the traffic, and weather observations expire after --ttl seconds. Without prefetching,
+every expiry of a hot city costs the next user a full upstream round trip; with it, the top-K
+cities are refreshed --lead seconds before they expire. Reports the cache hit rate, the share of
+lookups answered without waiting on an upstream call (overall and for the top-K cities), lookup
+latency and how the upstream calls split between users and refreshes.
+
+    python -m benchmarks.bench_prefetch --seconds 8 --rate 200 --ttl 2 --top-k 10
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.load_driver import percentile
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, prefetch, rate_limiter, statefulagent, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.prefetch import Prefetcher
+from multi_tool_agent.rate_limiter import RateLimiter
+from multi_tool_agent.weather_cache import WeatherCache
+from multi_tool_agent.weather_client import OpenWeatherClient
+
+
+def zipf_weights(n: int, s: float = 1.1) -> list[float]:
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+async def run(stub: StubOpenWeather, prefetcher: Prefetcher, cities: list[str], hot: set[str], seconds: float,
+              rate: float, ttl: float, seed: int) -> dict:
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache(ttl=ttl, stale_ttl=0)
+    weather_client._shared_client = OpenWeatherClient(api_key="x", base_url=stub.base_url)
+    prefetch._prefetcher = prefetcher
+    rng = random.Random(seed)
+    weights = zipf_weights(len(cities))
+    latencies = {"hot": [], "other": []}
+    cache = weather_cache._shared_cache
+
+    async def one(city: str):
+        start = time.perf_counter()
+        await statefulagent.fetch_observation(city)
+        latencies["hot" if city in hot else "other"].append(time.perf_counter() - start)
+
+    # Geocode every city first so the comparison is about weather observations only.
+    await asyncio.gather(*(statefulagent.fetch_observation(city) for city in cities))
+    cache.hits = cache.misses = cache.coalesced = 0
+    upstream_before, refreshed_before = stub.requests_served, prefetcher.refreshed
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(int(seconds * rate)):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(rng.choices(cities, weights)[0])))
+    await asyncio.gather(*tasks)
+    await prefetcher.stop()
+    await weather_client._shared_client.aclose()
+
+    refreshes = prefetcher.refreshed - refreshed_before
+    everything = latencies["hot"] + latencies["other"]
+    # A lookup that waited on nobody's upstream call (not even a coalesced one) was answered from cache.
+    cached = stub.latency / 2
+    return {"lookups": len(everything), "hit_rate": cache.stats()["hit_rate"],
+            "answered_from_cache": sum(t < cached for t in everything) / len(everything),
+            "hot_answered_from_cache": sum(t < cached for t in latencies["hot"]) / max(1, len(latencies["hot"])),
+            "p50_ms": percentile(everything, 50) * 1000, "p95_ms": percentile(everything, 95) * 1000,
+            "hot_p95_ms": percentile(latencies["hot"], 95) * 1000 if latencies["hot"] else 0.0,
+            "user_calls": stub.requests_served - upstream_before - refreshes, "refresh_calls": refreshes,
+            "skipped_budget": prefetcher.skipped_budget}
+
+
+def report(label: str, result: dict):
+    print(f"{label:<20} lookups={result['lookups']:5d}  cache hit rate={result['hit_rate']:6.1%}  "
+          f"answered without waiting={result['answered_from_cache']:6.1%} "
+          f"(top-K {result['hot_answered_from_cache']:6.1%})  p50={result['p50_ms']:6.1f} ms p95={result['p95_ms']:6.1f} ms "
+          f"top-K p95={result['hot_p95_ms']:6.1f} ms  upstream: users={result['user_calls']:4d} "
+          f"refresh={result['refresh_calls']:4d} skipped (budget)={result['skipped_budget']}")
+
+
+async def main(args):
+    stub = StubOpenWeather(latency=args.latency_ms / 1000).start_in_thread()
+    cities = [f"City {i}" for i in range(args.cities)]
+    hot = set(cities[:args.top_k])  # the most requested cities under the Zipf weights
+    rate_limiter._shared_limiter = RateLimiter(calls_per_minute=args.calls_per_minute)
+    try:
+        for label, top_k in (("no prefetch", 0), (f"prefetch top {args.top_k}", args.top_k)):
+            prefetcher = Prefetcher(top_k=top_k, lead_time=args.lead, budget_share=args.budget_share,
+                                    interval=args.lead / 4)
+            result = await run(stub, prefetcher, cities, hot, args.seconds, args.rate, args.ttl, args.seed)
+            report(label, result)
+    finally:
+        stub.stop_thread()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=8)
+    parser.add_argument("--rate", type=float, default=200, help="lookups per second")
+    parser.add_argument("--cities", type=int, default=200)
+    parser.add_argument("--ttl", type=float, default=2, help="weather cache ttl in seconds")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--lead", type=float, default=0.5, help="refresh lead time in seconds")
+    parser.add_argument("--budget-share", type=float, default=0.2)
+    parser.add_argument("--calls-per-minute", type=float, default=0,
+                        help="OpenWeather budget the share applies to (0 = unlimited)")
+    parser.add_argument("--latency-ms", type=float, default=50, help="stub response latency")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
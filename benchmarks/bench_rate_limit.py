@@ -0,0 +1,137 @@
+"""A burst of weather lookups against a quota-enforcing stub, with and without the client-side rate limiter.
+
+The stub answers HTTP 429 beyond --quota requests per second, like OpenWeather's plan limits.
+Without the limiter the burst collects 429s (and retries spend even more calls); with it, calls
+queue and go out within budget. The priority run queues background lookups ahead of interactive
+ones and shows the interactive ones still go first. The cross-process run has two processes
+draw from one SQLite-backed budget and checks their combined rate. The last run spends a daily
+quota and checks later lookups fail within their deadline instead of queueing until the next day.
+
+    python -m benchmarks.bench_rate_limit --lookups 120 --quota 20
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+
+from benchmarks.load_driver import percentile
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, statefulagent, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.rate_limiter import PRIORITY_BACKGROUND, RateLimiter, RateLimitTimeout, request_priority
+from multi_tool_agent.resilience import RetryPolicy
+from multi_tool_agent.weather_cache import WeatherCache
+from multi_tool_agent.weather_client import OpenWeatherClient, OpenWeatherError
+
+
+async def burst(stub: StubOpenWeather, limiter: RateLimiter, lookups: int, background: int = 0) -> dict:
+    """Looks up `lookups` distinct cities at once; the first `background` at background priority."""
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache()
+    weather_client._shared_client = OpenWeatherClient(
+        api_key="x", base_url=stub.base_url, rate_limiter=limiter,
+        retry=RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=1.0))
+    latencies = {"interactive": [], "background": []}
+    errors = 0
+    before_requests, before_429 = stub.requests_served, stub.rate_limited
+
+    async def one(i: int):
+        nonlocal errors
+        kind = "background" if i < background else "interactive"
+        start = time.perf_counter()
+        try:
+            if kind == "background":
+                with request_priority(PRIORITY_BACKGROUND):
+                    await statefulagent.fetch_observation(f"City {i}")
+            else:
+                await statefulagent.fetch_observation(f"City {i}")
+        except OpenWeatherError:
+            errors += 1
+        latencies[kind].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(lookups)))
+    elapsed = time.perf_counter() - start
+    await weather_client._shared_client.aclose()
+    return {"elapsed_s": elapsed, "errors": errors, "upstream": stub.requests_served - before_requests,
+            "http_429": stub.rate_limited - before_429, "latencies": latencies, "limiter": limiter.stats()}
+
+
+def print_burst(label: str, result: dict):
+    limiter = result["limiter"]
+    print(f"{label:<30} {result['elapsed_s']:5.1f}s  errors={result['errors']:4d}  upstream calls={result['upstream']:4d}  "
+          f"HTTP 429={result['http_429']:4d}  queued={limiter['queued']:4d} timed out={limiter['timed_out']:3d}  "
+          f"queue wait p50={limiter['wait_ms']['p50']:7.1f} ms p95={limiter['wait_ms']['p95']:7.1f} ms")
+    for kind, values in result["latencies"].items():
+        if values and result["latencies"]["background"]:
+            print(f"{'':<30}{kind:<12} lookup p50={percentile(values, 50) * 1000:7.1f} ms "
+                  f"p95={percentile(values, 95) * 1000:7.1f} ms")
+
+
+def _draw(db_path: str, per_minute: float, seconds: float) -> list[float]:
+    limiter = RateLimiter(calls_per_minute=per_minute, burst=1, max_wait=seconds, db_path=db_path)
+    grants = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        limiter.acquire_blocking()
+        grants.append(time.time())
+    return grants
+
+
+def cross_process(per_second: float, processes: int, seconds: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "quota.db")
+        RateLimiter(calls_per_minute=per_second * 60, burst=1, db_path=db_path)  # create the table up front
+        with multiprocessing.Pool(processes) as pool:
+            runs = pool.starmap(_draw, [(db_path, per_second * 60, seconds)] * processes)
+    grants = sorted(t for run in runs for t in run)
+    rate = (len(grants) - 1) / (grants[-1] - grants[0])
+    print(f"{processes} processes sharing a {per_second:g}/s SQLite budget for {seconds:g}s: "
+          f"{' + '.join(str(len(run)) for run in runs)} = {len(grants)} calls, combined {rate:.1f} calls/s")
+
+
+async def quota_exhausted(max_wait: float = 0.2, attempts: int = 5):
+    """Acquires against a spent daily quota: each must fail within max_wait, none may hang."""
+    limiter = RateLimiter(calls_per_minute=0, calls_per_day=1, max_wait=max_wait)
+    await limiter.acquire()
+    failed, hung, slowest = 0, 0, 0.0
+    for _ in range(attempts):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(limiter.acquire(), max_wait * 10)
+        except RateLimitTimeout:
+            failed += 1
+        except asyncio.TimeoutError:
+            hung += 1
+        slowest = max(slowest, time.perf_counter() - start)
+    print(f"daily quota spent, {max_wait:g}s deadline: {failed}/{attempts} acquires failed in time, {hung} hung, "
+          f"slowest {slowest * 1000:.1f} ms")
+
+
+async def main(lookups: int, quota: float):
+    stub = StubOpenWeather(latency=0.01, quota_per_second=quota).start_in_thread()
+    # Stay a little under the limit; the stub counts per second, so the burst must fit in one second too.
+    def limiter(max_wait: float) -> RateLimiter:
+        return RateLimiter(calls_per_minute=quota * 60 * 0.9, burst=quota * 0.9, max_wait=max_wait)
+
+    try:
+        print_burst("no client-side limiter", await burst(stub, RateLimiter(calls_per_minute=0), lookups))
+        for label, max_wait, background in (("rate limiter", 60, 0),
+                                            ("rate limiter, half background", 60, lookups // 2),
+                                            ("rate limiter, 2s deadline", 2, 0)):
+            await asyncio.sleep(1.1)  # let the stub's window and the previous run's retries clear
+            print_burst(label, await burst(stub, limiter(max_wait), lookups, background))
+    finally:
+        stub.stop_thread()
+    cross_process(per_second=quota, processes=2, seconds=3)
+    await quota_exhausted()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=120)
+    parser.add_argument("--quota", type=float, default=20, help="stub requests allowed per second")
+    args = parser.parse_args()
+    asyncio.run(main(args.lookups, args.quota))
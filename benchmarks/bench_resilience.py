@@ -0,0 +1,109 @@
+"""Weather lookups against a fault-injecting OpenWeather stub: retries, timeouts, circuit breaker, stale data.
+
+Each scenario runs `--lookups` fetch_observation calls over a set of cities (at --concurrency)
+and reports how many answered with fresh data, stale data or an error, plus lookup latency,
+upstream requests and circuit breaker activity.
+
+    python -m benchmarks.bench_resilience --lookups 400 --concurrency 20
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.load_driver import percentile
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, statefulagent, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.resilience import RetryPolicy
+from multi_tool_agent.weather_cache import WeatherCache
+from multi_tool_agent.weather_client import OpenWeatherClient, OpenWeatherError
+
+CITIES = ["London", "Paris", "Tokyo", "Berlin", "Madrid", "Rome", "Sydney", "Oslo", "Lima", "Cairo",
+          "Delhi", "Seoul", "Dublin", "Vienna", "Prague", "Lisbon", "Boston", "Denver", "Austin", "Miami"]
+
+
+async def lookups(count: int, concurrency: int) -> dict:
+    gate = asyncio.Semaphore(concurrency)
+    outcomes = {"fresh": 0, "stale": 0, "error": 0}
+    latencies = []
+
+    async def one(i: int):
+        async with gate:
+            start = time.perf_counter()
+            try:
+                observation = await statefulagent.fetch_observation(CITIES[i % len(CITIES)])
+                outcomes["stale" if observation and observation.get("stale") else "fresh"] += 1
+            except OpenWeatherError:
+                outcomes["error"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(count)))
+    return {**outcomes, "p50_ms": percentile(latencies, 50) * 1000, "p95_ms": percentile(latencies, 95) * 1000,
+            "max_ms": max(latencies) * 1000}
+
+
+def fresh_caches(ttl: float, stale_ttl: float):
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache(ttl=ttl, stale_ttl=stale_ttl)
+
+
+def use_client(stub: StubOpenWeather, max_attempts: int, timeout: float, reset_timeout: float):
+    weather_client._shared_client = OpenWeatherClient(
+        api_key="x", base_url=stub.base_url, connect_timeout=timeout, read_timeout=timeout,
+        retry=RetryPolicy(max_attempts=max_attempts, base_delay=0.05, max_delay=0.5))
+    for breaker in weather_client._shared_client.breakers.values():
+        breaker.reset_timeout = reset_timeout
+
+
+def report(label: str, stub: StubOpenWeather, result: dict, requests_before: int):
+    breakers = weather_client._shared_client.stats()["breakers"]
+    opened = sum(b["opened"] for b in breakers.values())
+    rejected = sum(b["rejected"] for b in breakers.values())
+    print(f"{label:<34} fresh={result['fresh']:4d} stale={result['stale']:4d} error={result['error']:4d}  "
+          f"p50={result['p50_ms']:7.1f} ms p95={result['p95_ms']:7.1f} ms max={result['max_ms']:7.1f} ms  "
+          f"upstream={stub.requests_served - requests_before:5d} breaker opened={opened} rejected={rejected}")
+
+
+async def main(count: int, concurrency: int, timeout: float):
+    stub = StubOpenWeather(latency=0.005, seed=7).start_in_thread()
+    try:
+        # No weather caching or stale data, so every lookup reaches the upstream; each scenario starts cold.
+        for label, attempts, error_rate, hang_rate in (
+                ("healthy", 3, 0.0, 0.0),
+                ("20% HTTP 503, no retries", 1, 0.2, 0.0),
+                ("20% HTTP 503, 3 attempts", 3, 0.2, 0.0),
+                ("5% hung requests, 3 attempts", 3, 0.0, 0.05)):
+            stub.error_rate, stub.hang_rate = error_rate, hang_rate
+            fresh_caches(ttl=0.0, stale_ttl=0.0)
+            use_client(stub, attempts, timeout, reset_timeout=60)
+            before = stub.requests_served
+            report(label, stub, await lookups(count, concurrency), before)
+            await weather_client._shared_client.aclose()
+
+        # Outage: observations are cached, expire, then OpenWeather goes down and comes back.
+        stub.error_rate = stub.hang_rate = 0.0
+        fresh_caches(ttl=0.2, stale_ttl=3600)
+        use_client(stub, 3, timeout, reset_timeout=1.0)
+        await lookups(len(CITIES), concurrency)
+        await asyncio.sleep(0.3)
+        stub.down = True
+        before = stub.requests_served
+        report("outage (stale served, circuit opens)", stub, await lookups(count, concurrency), before)
+        stub.down = False
+        await asyncio.sleep(1.1)
+        # The first lookups after the reset timeout probe the upstream; the rest keep getting stale data until it answers.
+        await lookups(len(CITIES), concurrency)
+        before = stub.requests_served
+        report("recovered (after probe)", stub, await lookups(count, concurrency), before)
+        await weather_client._shared_client.aclose()
+    finally:
+        stub.stop_thread()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--timeout", type=float, default=0.25, help="connect and read timeout in seconds")
+    args = parser.parse_args()
+    asyncio.run(main(args.lookups, args.concurrency, args.timeout))
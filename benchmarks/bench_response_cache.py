@@ -0,0 +1,91 @@
+"""LLM calls and turn latency saved by the response cache on repeated weather questions.
+
+Replays benchmarks/conversations.jsonl (every other conversation in Fahrenheit) through
+call_agent_async with the response cache off and on, using FakeLlm and the local OpenWeather
+stub. Reports model calls, turn latency and cache metrics, and checks that every reply and the
+last_weather_report / last_city_checked_stateful state match between the two runs. Differing
+replies are listed: FakeLlm keeps a mis-routed sub-agent in charge after "Hi, what's the weather
+in ...?", so a repeated question right after one can go wrong without the cache, while the cache
+answers it with the root agent's earlier reply (a state difference then lingers for the turn after).
+
+    python -m benchmarks.bench_response_cache --llm-latency-ms 400 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from benchmarks.bench_fast_path import load_corpus
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, response_cache, statefulagent, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.response_cache import ResponseCache
+from multi_tool_agent.weather_cache import WeatherCache
+
+STATE_KEYS = ("last_weather_report", "last_city_checked_stateful")
+
+
+async def replay(corpus: list[dict], rounds: int, cache_size: int, llm_latency: float, weather_ttl: float) -> dict:
+    llm = FakeLlm(latency=llm_latency)
+    runner = build_fake_runner(llm)
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache(ttl=weather_ttl)
+    cache = response_cache._shared_cache = ResponseCache(max_entries=cache_size)
+    latencies, queries, replies, states = [], [], [], []
+    for round_ in range(rounds):
+        for i, conversation in enumerate(corpus):
+            session = runner.session_service.create_session(
+                app_name=runner.app_name, user_id="bench_user", session_id=f"{conversation['conversation_id']}_{round_}",
+                state={"user_preference_temperature_unit": "Fahrenheit" if i % 2 else "Celsius"})
+            for query in conversation["turns"]:
+                out = io.StringIO()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(out):
+                    await statefulagent.call_agent_async(query, runner, session.user_id, session.id)
+                latencies.append(time.perf_counter() - start)
+                queries.append(query)
+                replies.append(out.getvalue().strip().splitlines()[-1].split(": ", 1)[1])
+                state = runner.session_service.get_session(app_name=runner.app_name, user_id=session.user_id,
+                                                           session_id=session.id).state
+                states.append(tuple(state.get(key) for key in STATE_KEYS))
+    return {"turns": len(latencies), "llm_calls": llm.calls, "total_s": sum(latencies),
+            "mean_ms": statistics.mean(latencies) * 1000, "queries": queries, "replies": replies, "states": states,
+            "cache": cache.stats()}
+
+
+async def main(args):
+    corpus = load_corpus()
+    stub = await StubOpenWeather(latency=0.02).start()
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+    try:
+        results = {}
+        for label, size in (("no response cache", 0), ("response cache", args.cache_size)):
+            results[label] = await replay(corpus, args.rounds, size, args.llm_latency_ms / 1000, args.weather_ttl)
+    finally:
+        await weather_client._shared_client.aclose()
+        await stub.stop()
+
+    for label, result in results.items():
+        print(f"{label:<18} {result['turns']} turns, {result['llm_calls']:4d} LLM calls, "
+              f"total {result['total_s']:6.2f}s, mean turn {result['mean_ms']:7.1f} ms")
+    baseline, cached = results.values()
+    print(f"Saved {baseline['llm_calls'] - cached['llm_calls']} LLM calls "
+          f"({1 - cached['llm_calls'] / baseline['llm_calls']:.0%}). Cache stats: {cached['cache']}")
+    reply_diffs = sum(a != b for a, b in zip(baseline["replies"], cached["replies"]))
+    state_diffs = sum(a != b for a, b in zip(baseline["states"], cached["states"]))
+    print(f"Replies differing from the uncached run: {reply_diffs}; session states differing: {state_diffs}")
+    for query, a, b in zip(baseline["queries"], baseline["replies"], cached["replies"]):
+        if a != b:
+            print(f"  {query!r}: uncached {a!r}, cached {b!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency-ms", type=float, default=400)
+    parser.add_argument("--rounds", type=int, default=3, help="times the corpus is replayed (new sessions each time)")
+    parser.add_argument("--cache-size", type=int, default=1024)
+    parser.add_argument("--weather-ttl", type=float, default=600)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,152 @@
+"""Session write throughput with per-event commits vs the write-behind buffer (per turn, group commits).
+
+Two parts, each run once per SESSION_DURABILITY mode against a SQLite file:
+- storage only: --sessions sessions each append --turns weather-like turns (user message, tool call,
+  tool response with last_city_checked_stateful, final reply with last_weather_report) straight to
+  SqliteSessionService, timing appends plus the final flush;
+- end to end: benchmarks/conversations.jsonl replayed concurrently through call_agent_async with FakeLlm
+  and the OpenWeather stub.
+Reports commits, events per commit and throughput, and checks every mode stored the same events and state.
+
+    python -m benchmarks.bench_session_writes --sessions 200 --turns 20
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+from benchmarks.bench_fast_path import load_corpus
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, response_cache, statefulagent, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.response_cache import ResponseCache
+from multi_tool_agent.sqlite_session_service import DURABILITY_MODES, SqliteSessionService
+from multi_tool_agent.weather_cache import WeatherCache
+
+APP = "bench_app"
+
+
+def turn_events(index: int, city: str) -> list[Event]:
+    invocation_id = f"e-{index}"
+    report = f"The weather in {city} is sunny with a temperature of 25°C."
+    call = types.FunctionCall(name="get_weather_stateful_async", args={"city": city})
+    response = types.FunctionResponse(name="get_weather_stateful_async", response={"status": "success",
+                                                                                   "report": report})
+    return [
+        Event(invocation_id=invocation_id, author="user",
+              content=types.Content(role="user", parts=[types.Part(text=f"What's the weather in {city}?")])),
+        Event(invocation_id=invocation_id, author="weather_agent",
+              content=types.Content(role="model", parts=[types.Part(function_call=call)])),
+        Event(invocation_id=invocation_id, author="weather_agent",
+              content=types.Content(role="user", parts=[types.Part(function_response=response)]),
+              actions=EventActions(state_delta={"last_city_checked_stateful": city})),
+        Event(invocation_id=invocation_id, author="weather_agent",
+              content=types.Content(role="model", parts=[types.Part(text=report)]),
+              actions=EventActions(state_delta={"last_weather_report": report})),
+    ]
+
+
+def snapshot(db_path: str) -> dict:
+    """(event count, state) per session as stored on disk."""
+    service = SqliteSessionService(db_path, durability="event")
+    result = {}
+    for app_name, user_id, session_id in service._db.execute(
+            "SELECT app_name, user_id, session_id FROM sessions").fetchall():
+        session = service.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        result[(user_id, session_id)] = (len(session.events), session.state)
+    service.close()
+    return result
+
+
+def storage_only(db_path: str, durability: str, sessions: int, turns: int) -> dict:
+    service = SqliteSessionService(db_path, durability=durability)
+    handles = [service.create_session(app_name=APP, user_id=f"s{i}", session_id=f"s{i}") for i in range(sessions)]
+    cities = ["London", "Paris", "Tokyo", "New York", "Sydney"]
+    # Interleave sessions turn by turn, like concurrent users.
+    work = [(session, turn_events(t, cities[(i + t) % len(cities)]))
+            for t in range(turns) for i, session in enumerate(handles)]
+    start = time.perf_counter()
+    for session, events in work:
+        for event in events:
+            service.append_event(session, event)
+    service.close()
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "turns_per_s": len(work) / elapsed, **service.stats()}
+
+
+async def end_to_end(db_path: str, durability: str, concurrency: int, llm_latency: float) -> dict:
+    # Same work in every mode: cold lookups caches, and no response cache answering repeats.
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache(db_path=None)
+    response_cache._shared_cache = ResponseCache(max_entries=0)
+    service = SqliteSessionService(db_path, durability=durability)
+    runner = build_fake_runner(FakeLlm(latency=llm_latency), service)
+    gate = asyncio.Semaphore(concurrency)
+    turns = 0
+
+    async def converse(conversation: dict, round_: int):
+        nonlocal turns
+        async with gate:
+            session = service.create_session(app_name=runner.app_name, user_id="u",
+                                             session_id=f"{conversation['conversation_id']}_{round_}")
+            for query in conversation["turns"]:
+                await statefulagent.call_agent_async(query, runner, session.user_id, session.id)
+                turns += 1
+
+    corpus = load_corpus()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(converse(c, r) for r in range(10) for c in corpus))
+    service.close()
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "turns_per_s": turns / elapsed, **service.stats()}
+
+
+def report(label: str, result: dict, baseline: dict):
+    print(f"  {label:<6} {result['turns_per_s']:8.0f} turns/s ({result['turns_per_s'] / baseline['turns_per_s']:4.1f}x)"
+          f"  commits={result['commits']:6d}  events/commit={result['events_per_commit']:6.1f}")
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"storage only: {args.sessions} sessions x {args.turns} turns, 4 events per turn")
+        results, stored = {}, {}
+        for mode in DURABILITY_MODES:
+            path = os.path.join(tmp, f"storage_{mode}.db")
+            results[mode] = storage_only(path, mode, args.sessions, args.turns)
+            stored[mode] = snapshot(path)
+            report(mode, results[mode], results["event"])
+        identical = len({repr(sorted(s.items())) for s in stored.values()}) == 1
+        print(f"  stored events and state identical across modes: {identical}")
+
+        stub = await StubOpenWeather(latency=0.0).start()
+        weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+        try:
+            print(f"end to end: corpus x 10 through call_agent_async, concurrency {args.concurrency}, "
+                  f"LLM latency {args.llm_latency_ms:.0f} ms")
+            # Untimed pass so first-call setup doesn't land on the first mode.
+            await end_to_end(os.path.join(tmp, "warmup.db"), "turn", args.concurrency, 0.0)
+            results = {}
+            for mode in DURABILITY_MODES:
+                results[mode] = await end_to_end(os.path.join(tmp, f"e2e_{mode}.db"), mode, args.concurrency,
+                                                 args.llm_latency_ms / 1000)
+                report(mode, results[mode], results["event"])
+        finally:
+            await weather_client._shared_client.aclose()
+            await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--llm-latency-ms", type=float, default=0)
+    asyncio.run(main(parser.parse_args()))
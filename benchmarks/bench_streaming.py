@@ -0,0 +1,86 @@
+"""Time to first visible output with and without streaming, through the local SSE endpoint.
+
+Replays benchmarks/conversations.jsonl against FakeLlm and the OpenWeather stub via
+multi_tool_agent.stream_server. Without streaming the user sees nothing until the final answer
+(what call_agent_async prints); with streaming the first tool-progress or text event shows up
+as soon as the root agent's first model call returns. Total turn time should not change.
+
+    python -m benchmarks.bench_streaming --llm-latency-ms 300 --upstream-latency-ms 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+import httpx
+
+from benchmarks.bench_fast_path import load_corpus
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.load_driver import percentile
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import weather_client
+from multi_tool_agent.sqlite_session_service import SqliteSessionService
+from multi_tool_agent.stream_server import StreamServer
+
+
+async def sse_turn(client: httpx.AsyncClient, user_id: str, session_id: str, query: str) -> tuple[float, float, list]:
+    """(seconds to first agent event, seconds to the final event, event types) for one turn."""
+    start = time.perf_counter()
+    first = None
+    events = []
+    async with client.stream("POST", "/chat", json={"user_id": user_id, "session_id": session_id,
+                                                    "query": query}) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("event: ") or line == "event: session":
+                continue
+            events.append(line[len("event: "):])
+            if first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start, events
+
+
+async def replay(streaming: bool, llm_latency: float, stub_url: str) -> dict:
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub_url)
+    runner = build_fake_runner(FakeLlm(latency=llm_latency), SqliteSessionService())
+    server = await StreamServer(runner, streaming=streaming).start()
+    first_byte, total, counts = [], [], {}
+    try:
+        async with httpx.AsyncClient(base_url=server.base_url, timeout=60) as client:
+            for index, conversation in enumerate(load_corpus()):
+                for query in conversation["turns"]:
+                    first, done, events = await sse_turn(client, f"user_{index}", f"session_{index}", query)
+                    # Without streaming the only thing a user can be shown is the final answer.
+                    first_byte.append(first if streaming else done)
+                    total.append(done)
+                    for event in events:
+                        counts[event] = counts.get(event, 0) + 1
+    finally:
+        await server.stop()
+        await weather_client._shared_client.aclose()
+    return {"first_ms": [percentile(first_byte, p) * 1000 for p in (50, 95)],
+            "total_ms": [percentile(total, p) * 1000 for p in (50, 95)], "events": counts}
+
+
+async def main(llm_latency: float, upstream_latency: float):
+    stub = StubOpenWeather(latency=upstream_latency).start_in_thread()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # Untimed pass at zero model latency so first-call setup doesn't land on either mode.
+            await replay(False, 0.0, stub.base_url)
+            results = {label: await replay(streaming, llm_latency, stub.base_url)
+                       for label, streaming in (("final only", False), ("streaming", True))}
+    finally:
+        stub.stop_thread()
+    for label, result in results.items():
+        print(f"{label:<10}: first output p50={result['first_ms'][0]:6.1f} ms p95={result['first_ms'][1]:6.1f} ms, "
+              f"turn p50={result['total_ms'][0]:6.1f} ms p95={result['total_ms'][1]:6.1f} ms")
+        print(f"{'':<12}events: " + ", ".join(f"{k}={v}" for k, v in sorted(result["events"].items())))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.llm_latency_ms / 1000, args.upstream_latency_ms / 1000))
@@ -0,0 +1,91 @@
+"""Tool executions and upstream requests saved by the per-turn tool memo when the model repeats calls.
+
+Replays benchmarks/conversations.jsonl through call_agent_async with a FakeLlm that makes every
+tool call twice (repeat_tool_calls), so the root agent repeats its weather lookups and the
+greeting/farewell sub-agents repeat say_hello / say_goodbye. The fast path and the response cache
+are off so every turn reaches the agents, and the weather cache TTL is 0 so every executed lookup
+goes to the OpenWeather stub. Runs without repeats, then with repeats and the memo off and on,
+and checks the replies and session state with the memo match the run without it.
+
+    python -m benchmarks.bench_tool_memo --llm-latency-ms 50 --upstream-latency-ms 50
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from benchmarks.bench_fast_path import load_corpus
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, response_cache, statefulagent, tool_memo, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.response_cache import ResponseCache
+from multi_tool_agent.router import FastPathRouter
+from multi_tool_agent.tool_memo import ToolMemo
+from multi_tool_agent.weather_cache import WeatherCache
+
+STATE_KEYS = ("last_weather_report", "last_city_checked_stateful")
+
+
+async def replay(corpus: list[dict], repeat: bool, memo: bool, llm_latency: float, stub: StubOpenWeather) -> dict:
+    llm = FakeLlm(latency=llm_latency, repeat_tool_calls=repeat)
+    runner = build_fake_runner(llm)
+    statefulagent.fast_path_router = FastPathRouter(statefulagent.say_hello, statefulagent.say_goodbye, enabled=False)
+    response_cache._shared_cache = ResponseCache(max_entries=0)
+    geocode_cache._shared_cache = GeocodeCache(db_path=None)
+    weather_cache._shared_cache = WeatherCache(ttl=0, db_path=None)
+    memo_ = tool_memo._shared_memo = ToolMemo(enabled=memo)
+    upstream_before = stub.requests_served
+    latencies, replies, states = [], [], []
+    for i, conversation in enumerate(corpus):
+        session = runner.session_service.create_session(
+            app_name=runner.app_name, user_id="bench_user", session_id=conversation["conversation_id"],
+            state={"user_preference_temperature_unit": "Fahrenheit" if i % 2 else "Celsius"})
+        for query in conversation["turns"]:
+            out = io.StringIO()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(out):
+                await statefulagent.call_agent_async(query, runner, session.user_id, session.id)
+            latencies.append(time.perf_counter() - start)
+            replies.append(out.getvalue().strip().splitlines()[-1])
+            state = runner.session_service.get_session(app_name=runner.app_name, user_id=session.user_id,
+                                                       session_id=session.id).state
+            states.append(tuple(state.get(key) for key in STATE_KEYS))
+    return {"turns": len(latencies), "llm_calls": llm.calls, "mean_ms": statistics.mean(latencies) * 1000,
+            "tool_calls": sum(n for name, n in llm.tool_calls.items() if name != "transfer_to_agent"),
+            "upstream": stub.requests_served - upstream_before, "memo": memo_.stats(),
+            "replies": replies, "states": states}
+
+
+async def main(args):
+    corpus = load_corpus()
+    stub = await StubOpenWeather(latency=args.upstream_latency_ms / 1000).start()
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+    try:
+        results = {}
+        for label, repeat, memo in (("no repeats", False, False), ("repeats, memo off", True, False),
+                                    ("repeats, memo on", True, True)):
+            results[label] = await replay(corpus, repeat, memo, args.llm_latency_ms / 1000, stub)
+    finally:
+        await weather_client._shared_client.aclose()
+        await stub.stop()
+
+    for label, result in results.items():
+        executed = result["memo"]["executed"] if result["memo"]["calls"] else result["tool_calls"]
+        print(f"{label:<18} {result['turns']} turns: tool calls asked {result['tool_calls']:4d}, executed {executed:4d}, "
+              f"upstream requests {result['upstream']:4d}, mean turn {result['mean_ms']:6.1f} ms")
+    memo_stats = results["repeats, memo on"]["memo"]
+    print(f"suppressed duplicates: {memo_stats['suppressed']} {memo_stats['suppressed_by_tool']}")
+    baseline, memoized = results["no repeats"], results["repeats, memo on"]
+    print(f"replies differing from the run without repeats: "
+          f"{sum(a != b for a, b in zip(baseline['replies'], memoized['replies']))}; session states differing: "
+          f"{sum(a != b for a, b in zip(baseline['states'], memoized['states']))}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    asyncio.run(main(parser.parse_args()))
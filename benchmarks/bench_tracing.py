@@ -0,0 +1,92 @@
+"""Tracing overhead at several sample rates, plus where a traced turn spends its time.
+
+Replays the conversation corpus against FakeLlm and the local OpenWeather stub once per sample
+rate, then breaks the fully traced run down by span name (LLM calls, delegation, HTTP, cache
+lookups, state writes) from the in-memory ring buffer.
+
+    python -m benchmarks.bench_tracing --rates 0 0.1 1 --rounds 3
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+from collections import defaultdict
+
+from benchmarks.bench_fast_path import load_corpus
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import geocode_cache, statefulagent, tracing, weather_cache, weather_client
+from multi_tool_agent.geocode_cache import GeocodeCache
+from multi_tool_agent.sqlite_session_service import SqliteSessionService
+from multi_tool_agent.weather_cache import WeatherCache
+
+
+async def replay(corpus: list[dict], rounds: int) -> float:
+    """Mean turn time in ms over `rounds` passes of the corpus, each with cold caches."""
+    runner = build_fake_runner(FakeLlm(), SqliteSessionService())
+    turns = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        geocode_cache._shared_cache = GeocodeCache(db_path=None)
+        weather_cache._shared_cache = WeatherCache()
+        for conversation in corpus:
+            session = runner.session_service.create_session(app_name=runner.app_name, user_id="bench_user")
+            for query in conversation["turns"]:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    await statefulagent.call_agent_async(query, runner, session.user_id, session.id)
+                turns += 1
+    return (time.perf_counter() - start) / turns * 1000
+
+
+def breakdown(traces: dict[str, list[dict]]) -> list[tuple[str, int, float, float]]:
+    """(span name, count, mean ms, p95 ms) across all buffered traces, slowest total first."""
+    durations = defaultdict(list)
+    for spans in traces.values():
+        for span in spans:
+            durations[span["name"]].append(span["duration_ms"])
+    rows = []
+    for name, values in durations.items():
+        ordered = sorted(values)
+        rows.append((name, len(values), statistics.fmean(values), ordered[int(0.95 * (len(ordered) - 1))]))
+    return sorted(rows, key=lambda row: row[1] * row[2], reverse=True)
+
+
+async def main(rates: list[float], rounds: int, upstream_latency: float):
+    corpus = load_corpus()
+    stub = await StubOpenWeather(latency=upstream_latency).start()
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+    results = {}
+    try:
+        # Untimed pass so imports and first-call setup don't land on the first rate.
+        tracing._tracer = tracing.Tracer(sample_rate=0.0)
+        await replay(corpus, 1)
+        for rate in rates:
+            exporter = tracing.RingBufferExporter(max_spans=100_000)
+            tracing._tracer = tracing.Tracer(sample_rate=rate, exporter=exporter)
+            results[rate] = (await replay(corpus, rounds), exporter.traces())
+    finally:
+        await weather_client._shared_client.aclose()
+        await stub.stop()
+
+    baseline = results[rates[0]][0]
+    for rate, (mean_ms, traces) in results.items():
+        print(f"sample rate {rate:<4}: mean turn {mean_ms:6.2f} ms "
+              f"({(mean_ms / baseline - 1) * 100:+5.1f}% vs rate {rates[0]}), {len(traces)} turns traced")
+
+    traced = max(results.values(), key=lambda result: len(result[1]))[1]
+    if traced:
+        print(f"\nspan breakdown over {len(traced)} traced turns:")
+        print(f"{'span':<22}{'count':>7}{'mean ms':>10}{'p95 ms':>10}")
+        for name, count, mean_ms, p95_ms in breakdown(traced):
+            print(f"{name:<22}{count:>7}{mean_ms:>10.3f}{p95_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.1, 1.0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--upstream-latency-ms", type=float, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.rates, args.rounds, args.upstream_latency_ms / 1000))
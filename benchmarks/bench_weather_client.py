@@ -0,0 +1,71 @@
+"""Blocking requests.get vs the pooled async OpenWeather client, both against the local stub.
+
+Simulates `--sessions` concurrent sessions each doing one weather lookup (geocode + weather)
+inside a single event loop, which is how runner.run_async drives the tools.
+
+    python -m benchmarks.bench_weather_client --sessions 100 --latency-ms 50
+"""
+import argparse
+import asyncio
+import time
+
+import requests
+
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent.weather_client import GEOCODE_PATH, WEATHER_PATH, OpenWeatherClient
+
+CITIES = ["London", "New York", "Tokyo", "Paris", "Berlin", "Madrid", "Rome", "Sydney"]
+
+
+async def blocking_lookup(base_url: str, city: str):
+    # Same two calls get_weather_stateful makes, executed on the event loop thread.
+    geo = requests.get(f"{base_url}{GEOCODE_PATH}", params={"q": city, "limit": 2, "appid": "x"}).json()
+    requests.get(f"{base_url}{WEATHER_PATH}",
+                 params={"lat": geo[0]["lat"], "lon": geo[0]["lon"], "appid": "x", "units": "metric"}).json()
+
+
+async def async_lookup(client: OpenWeatherClient, city: str):
+    coords = await client.geocode(city)
+    await client.current_weather(*coords)
+
+
+async def measure_loop_lag(stop: asyncio.Event, interval: float = 0.005) -> float:
+    """Returns the worst delay seen between asking to sleep `interval` and waking up."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(label: str, make_call, sessions: int):
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call(CITIES[i % len(CITIES)]) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    worst_lag = await lag_task
+    print(f"{label:<10} {sessions} lookups in {elapsed:7.3f}s  "
+          f"({sessions / elapsed:8.1f} lookups/s, worst event-loop lag {worst_lag * 1000:7.1f} ms)")
+
+
+async def main(sessions: int, latency: float):
+    stub = StubOpenWeather(latency).start_in_thread()
+    try:
+        await run("blocking", lambda city: blocking_lookup(stub.base_url, city), sessions)
+        client = OpenWeatherClient(api_key="x", base_url=stub.base_url)
+        await run("async", lambda city: async_lookup(client, city), sessions)
+        await client.aclose()
+    finally:
+        stub.stop_thread()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.sessions, args.latency_ms / 1000))
@@ -0,0 +1,133 @@
+"""Scripted stand-in for gemini-2.0-flash-exp so agent turns can be replayed without an API key.
+
+It plays each agent the way the real model is instructed to: the root agent calls the weather
+tools or transfers greetings/farewells, the sub-agents call say_hello / say_goodbye, and once a
+tool has answered it replies with the tool's report. Every call sleeps `latency` seconds and is
+counted, so benchmarks can report how many model calls a conversation cost. With stream=True
+(ADK's SSE mode) text replies arrive as `stream_chunks` partial responses spread over that
+latency, followed by the merged text, like the Gemini client does. With repeat_tool_calls=True
+every tool call is made a second time with the same arguments before replying, like a model
+retrying a call it has already had answered.
+"""
+import asyncio
+import re
+from collections import Counter
+from typing import AsyncGenerator
+
+from google.adk.models import BaseLlm, LlmRequest, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import BaseSessionService, InMemorySessionService
+from google.genai import types
+from pydantic import Field
+
+GREETING_RE = re.compile(r"^\s*(hi|hello|hey|good (morning|afternoon|evening))\b", re.IGNORECASE)
+FAREWELL_RE = re.compile(r"\b(bye|goodbye|see you|see ya)\b", re.IGNORECASE)
+CITIES_RE = re.compile(r"\b(?:in|for)\s+([A-Z][\w .,'-]*?)\s*[?.!]*$")
+
+
+def split_cities(text: str) -> list[str]:
+    return [c.strip() for c in re.split(r",|\band\b", text) if c.strip()]
+
+
+class FakeLlm(BaseLlm):
+    """Deterministic LLM double. `calls` counts generate_content_async invocations, `tool_calls` the
+    function calls it issued by name."""
+
+    model: str = "fake-llm"
+    latency: float = 0.0
+    root_agent_name: str = "weather_agent_v4_stateful"
+    stream_chunks: int = 4
+    repeat_tool_calls: bool = False
+    calls: int = 0
+    tool_calls: Counter = Field(default_factory=Counter)
+
+    @staticmethod
+    def _last_user_text(llm_request: LlmRequest) -> str:
+        for content in reversed(llm_request.contents):
+            if content.role != "user":
+                continue
+            for part in content.parts or []:
+                # Skip the "For context:" notes ADK adds when another agent's events are replayed.
+                if part.text and not part.text.startswith("For context:"):
+                    return part.text
+        return ""
+
+    @staticmethod
+    def _call_to_repeat(llm_request: LlmRequest) -> types.FunctionCall | None:
+        """The function call just answered, if this turn hasn't made it twice yet."""
+        calls = []
+        for content in reversed(llm_request.contents):
+            parts = content.parts or []
+            if content.role == "user" and any(p.text and not p.text.startswith("For context:") for p in parts):
+                break
+            calls += [p.function_call for p in parts if p.function_call]
+        if not calls or calls[0].name == "transfer_to_agent":
+            return None
+        last = calls[0]
+        same = [c for c in calls if c.name == last.name and c.args == last.args]
+        return last if len(same) < 2 else None
+
+    def _respond(self, llm_request: LlmRequest) -> types.Part:
+        last = llm_request.contents[-1] if llm_request.contents else None
+        responses = [p.function_response for p in (last.parts or []) if p.function_response] if last else []
+        if responses and self.repeat_tool_calls:
+            repeat = self._call_to_repeat(llm_request)
+            if repeat is not None:
+                return types.Part(function_call=types.FunctionCall(name=repeat.name, args=repeat.args))
+        if responses:
+            response = responses[-1].response or {}
+            text = response.get("report") or response.get("result") or response.get("error_message") or "Done."
+            return types.Part(text=str(text))
+
+        query = self._last_user_text(llm_request)
+        tools = llm_request.tools_dict
+        if GREETING_RE.search(query):
+            intent, tool, args = "greeting_agent", "say_hello", {}
+        elif FAREWELL_RE.search(query):
+            intent, tool, args = "farewell_agent", "say_goodbye", {}
+        else:
+            match = CITIES_RE.search(query)
+            cities = split_cities(match.group(1)) if match else []
+            intent = self.root_agent_name
+            if len(cities) > 1 and "get_weather_many" in tools:
+                tool, args = "get_weather_many", {"cities": cities}
+            elif cities:
+                tool, args = "get_weather_stateful_async", {"city": cities[0]}
+            else:
+                return types.Part(text="I can only help with weather, greetings and farewells.")
+
+        if tool in tools:
+            return types.Part(function_call=types.FunctionCall(name=tool, args=args))
+        if "transfer_to_agent" in tools:
+            return types.Part(function_call=types.FunctionCall(name="transfer_to_agent",
+                                                               args={"agent_name": intent}))
+        return types.Part(text="I can't help with that.")
+
+    async def generate_content_async(self, llm_request: LlmRequest,
+                                     stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        self.calls += 1
+        part = self._respond(llm_request)
+        if stream and part.text:
+            words = part.text.split(" ")
+            step = -(-len(words) // self.stream_chunks)
+            chunks = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            for i, chunk in enumerate(chunks):
+                if self.latency:
+                    await asyncio.sleep(self.latency / len(chunks))
+                text = chunk if i == len(chunks) - 1 else chunk + " "
+                yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text=text)]),
+                                  partial=True)
+            yield LlmResponse(content=types.Content(role="model", parts=[part]))
+            return
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if part.function_call:
+            self.tool_calls[part.function_call.name] += 1
+        yield LlmResponse(content=types.Content(role="model", parts=[part]))
+
+
+def build_fake_runner(llm: FakeLlm, session_service: BaseSessionService | None = None) -> Runner:
+    """The stateful agent team (statefulagent.WeatherApp) driven by the fake model."""
+    from multi_tool_agent.statefulagent import WeatherApp
+
+    return WeatherApp(model=llm, session_service=session_service or InMemorySessionService()).runner
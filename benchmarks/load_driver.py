@@ -0,0 +1,208 @@
+"""Concurrent multi-session load driver for the stateful weather agent.
+
+Replays benchmarks/conversations.jsonl across many simulated users and sessions at a fixed
+concurrency, against FakeLlm and the local OpenWeather stub (served from its own thread, so a
+blocking call on the agent's loop shows up as latency and loop lag instead of a deadlock).
+Reports p50/p95/p99 turn latency, throughput, tool-call counts, upstream requests and
+event-loop lag.
+
+    python -m benchmarks.load_driver --users 2000 --concurrency 200 --llm-latency-ms 300
+
+Use --max-p95-ms / --max-loop-lag-ms to fail (exit 1) on regressions, e.g. a blocking
+requests.get sneaking back onto the event loop.
+
+With --workers N the same users are served over HTTP by multi_tool_agent.worker_pool (N worker
+processes sharing sessions, caches and the rate limit through SQLite files in a temporary
+directory) instead of in-process; model and tool call counts then stay in the workers and
+aren't reported. Compare --workers 1, 2, 4 ... at a low --llm-latency-ms to see the scaling.
+
+    python -m benchmarks.load_driver --users 1000 --concurrency 100 --llm-latency-ms 20 --workers 4
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_fast_path import load_corpus
+from benchmarks.fake_llm import FakeLlm, build_fake_runner
+from benchmarks.stub_openweather import StubOpenWeather
+from multi_tool_agent import statefulagent, weather_client
+from multi_tool_agent.sqlite_session_service import SqliteSessionService
+from multi_tool_agent.worker_pool import WorkerPool
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes a task that asked to sleep `interval` seconds."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+
+
+def worker_runner(llm_latency: float, stub_url: str):
+    """Runner factory for worker processes: FakeLlm and the parent's OpenWeather stub."""
+    weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub_url)
+    return build_fake_runner(FakeLlm(latency=llm_latency), SqliteSessionService(statefulagent.SESSION_DB_PATH))
+
+
+async def run_load(users: int, sessions_per_user: int, concurrency: int, llm_latency: float,
+                   upstream_latency: float, session_db: str, workers: int = 0) -> dict:
+    corpus = load_corpus()
+    stub = StubOpenWeather(latency=upstream_latency).start_in_thread()
+    llm = pool = client = None
+    with contextlib.ExitStack() as stack:
+        if workers:
+            state_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            pool = await WorkerPool(workers, state_dir=state_dir, streaming=False,
+                                    runner_factory=functools.partial(worker_runner, llm_latency, stub.base_url)).start()
+            # Sessions are created here in the store the workers share, the turns go through the front door.
+            session_service, app_name = SqliteSessionService(pool.worker_env()["SESSION_DB_PATH"]), statefulagent.APP_NAME
+            client = httpx.AsyncClient(base_url=pool.base_url, timeout=300,
+                                       limits=httpx.Limits(max_connections=concurrency))
+
+            async def turn(query: str, user_id: str, session_id: str):
+                async with client.stream("POST", "/chat", json={"user_id": user_id, "session_id": session_id,
+                                                                "query": query}) as response:
+                    async for _ in response.aiter_raw():
+                        pass
+        else:
+            llm = FakeLlm(latency=llm_latency)
+            runner = build_fake_runner(llm, SqliteSessionService(session_db))
+            weather_client._shared_client = weather_client.OpenWeatherClient(api_key="x", base_url=stub.base_url)
+            session_service, app_name = runner.session_service, runner.app_name
+
+            async def turn(query: str, user_id: str, session_id: str):
+                await statefulagent.call_agent_async(query, runner, user_id, session_id)
+
+        gate = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def simulate(user: int, index: int):
+            conversation = corpus[(user * sessions_per_user + index) % len(corpus)]
+            async with gate:
+                session = session_service.create_session(
+                    app_name=app_name, user_id=f"user_{user}",
+                    state={"user_preference_temperature_unit": "Fahrenheit" if user % 3 == 0 else "Celsius"})
+                for query in conversation["turns"]:
+                    start = time.perf_counter()
+                    await turn(query, session.user_id, session.id)
+                    latencies.append(time.perf_counter() - start)
+
+        monitor = LoopLagMonitor()
+        monitor.start()
+        start = time.perf_counter()
+        try:
+            # call_agent_async prints every turn; keep the report readable.
+            with contextlib.redirect_stdout(io.StringIO()):
+                await asyncio.gather(*(simulate(user, index)
+                                       for user in range(users) for index in range(sessions_per_user)))
+        finally:
+            elapsed = time.perf_counter() - start
+            await monitor.stop()
+            if pool is not None:
+                await client.aclose()
+                await pool.stop()
+            else:
+                await weather_client._shared_client.aclose()
+            stub.stop_thread()
+
+    tool_calls = {}
+    if llm is not None:
+        tool_calls = dict(llm.tool_calls)
+        for intent, count in statefulagent.fast_path_router.handled.items():
+            tool = "say_hello" if intent == "greeting" else "say_goodbye"
+            tool_calls[f"{tool} (fast path)"] = count
+    return {
+        "sessions": users * sessions_per_user,
+        "turns": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_turns_per_s": round(len(latencies) / elapsed, 1),
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        "workers": workers,
+        "worker_requests": pool.requests if pool is not None else None,
+        "llm_calls": llm.calls if llm is not None else None,
+        "tool_calls": tool_calls,
+        "upstream_requests": stub.requests_served,
+        "loop_lag_ms": {"p99": round(percentile(monitor.samples, 99) * 1000, 1),
+                        "max": round(max(monitor.samples, default=0.0) * 1000, 1)},
+    }
+
+
+def print_report(result: dict):
+    served_by = f"{result['workers']} worker processes" if result["workers"] else "in-process"
+    print(f"{result['sessions']} sessions, {result['turns']} turns in {result['elapsed_s']}s "
+          f"({result['throughput_turns_per_s']} turns/s, {served_by})")
+    print("turn latency ms: " + ", ".join(f"{k}={v}" for k, v in result["latency_ms"].items()))
+    if result["workers"]:
+        print(f"requests per worker: {result['worker_requests']}, "
+              f"upstream OpenWeather requests: {result['upstream_requests']}")
+    else:
+        print(f"LLM calls: {result['llm_calls']}, upstream OpenWeather requests: {result['upstream_requests']}")
+        print("tool calls: " + ", ".join(f"{k}={v}" for k, v in sorted(result["tool_calls"].items())))
+    print(f"event-loop lag ms: p99={result['loop_lag_ms']['p99']}, max={result['loop_lag_ms']['max']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--sessions-per-user", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--upstream-latency-ms", type=float, default=50)
+    parser.add_argument("--session-db", default=":memory:")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="serve through a WorkerPool of this many processes (0: in-process)")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    parser.add_argument("--max-p95-ms", type=float, help="exit 1 if p95 turn latency exceeds this")
+    parser.add_argument("--max-loop-lag-ms", type=float, help="exit 1 if max event-loop lag exceeds this")
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.users, args.sessions_per_user, args.concurrency,
+                                  args.llm_latency_ms / 1000, args.upstream_latency_ms / 1000, args.session_db,
+                                  args.workers))
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    failures = []
+    if args.max_p95_ms is not None and result["latency_ms"]["p95"] > args.max_p95_ms:
+        failures.append(f"p95 turn latency {result['latency_ms']['p95']} ms > {args.max_p95_ms} ms")
+    if args.max_loop_lag_ms is not None and result["loop_lag_ms"]["max"] > args.max_loop_lag_ms:
+        failures.append(f"event-loop lag {result['loop_lag_ms']['max']} ms > {args.max_loop_lag_ms} ms")
+    if failures:
+        print("REGRESSION: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Minimal local stand-in for the two OpenWeather endpoints the agent uses.
+
+Speaks just enough HTTP/1.1 (with keep-alive) for requests and httpx, and adds a fixed
+latency to every response so client behaviour under a slow upstream can be measured.
+Faults can be injected: a fraction of requests answered with an error status, a fraction
+that hang, or a full outage (`down`), to exercise timeouts, retries and the circuit breaker.
+
+Run it standalone with:  python -m benchmarks.stub_openweather --port 8089 --latency-ms 50 --error-rate 0.2
+then point the agent at it with OPENWEATHER_BASE_URL=http://127.0.0.1:8089
+"""
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import zlib
+from urllib.parse import parse_qs, urlsplit
+
+CONDITIONS = ["clear sky", "few clouds", "scattered clouds", "light rain", "mist", "snow"]
+
+
+class StubOpenWeather:
+    """Stub server state. `requests_served` counts upstream calls so benchmarks can report them.
+    Args:
+        latency (float): Seconds added to every response.
+        error_rate (float): Fraction of requests answered with error_status.
+        error_status (int): Status used for injected errors and while down.
+        hang_rate (float): Fraction of requests that wait hang_seconds before answering.
+        hang_seconds (float): How long a hung request takes.
+        seed (int, optional): Seeds the fault injection for repeatable runs.
+        quota_per_second (float): Like OpenWeather's plan limits: requests beyond this many in a
+            one-second window get HTTP 429 (counted in `rate_limited`). 0 disables it.
+    Set `down = True` at any time to fail every request until it is cleared.
+    """
+
+    def __init__(self, latency: float = 0.05, error_rate: float = 0.0, error_status: int = 503,
+                 hang_rate: float = 0.0, hang_seconds: float = 30.0, seed: int | None = None,
+                 quota_per_second: float = 0.0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.down = False
+        self.rng = random.Random(seed)
+        self.requests_served = 0
+        self.faults_injected = 0
+        self.quota_per_second = quota_per_second
+        self.rate_limited = 0
+        self._window = (0, 0)  # (second, requests in it)
+        self.server = None
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def geocode(self, query: dict):
+        city = query.get("q", [""])[0]
+        if not city or city.lower().startswith("nowhere"):
+            return 200, []
+        # Stable pseudo-coordinates per city name.
+        seed = zlib.crc32(city.lower().encode())
+        return 200, [{"name": city, "lat": (seed % 18000) / 100 - 90, "lon": (seed // 18000 % 36000) / 100 - 180}]
+
+    def weather(self, query: dict):
+        lat = float(query.get("lat", ["0"])[0])
+        lon = float(query.get("lon", ["0"])[0])
+        seed = zlib.crc32(f"{lat:.2f},{lon:.2f}".encode())
+        return 200, {"weather": [{"description": CONDITIONS[seed % len(CONDITIONS)]}],
+                     "main": {"temp": round(seed % 4000 / 100 - 10, 2)}, "wind": {"speed": seed % 150 / 10}}
+
+    def over_quota(self) -> bool:
+        second = int(time.monotonic())
+        window_second, count = self._window
+        count = count + 1 if window_second == second else 1
+        self._window = (second, count)
+        return count > self.quota_per_second
+
+    async def respond(self, path: str, query: dict):
+        if self.quota_per_second and self.over_quota():
+            self.rate_limited += 1
+            return 429, {"message": "rate limit exceeded"}
+        await asyncio.sleep(self.latency)
+        if self.down or (self.error_rate and self.rng.random() < self.error_rate):
+            self.faults_injected += 1
+            return self.error_status, {"message": "injected fault"}
+        if self.hang_rate and self.rng.random() < self.hang_rate:
+            self.faults_injected += 1
+            await asyncio.sleep(self.hang_seconds)
+        if path == "/geo/1.0/direct":
+            return self.geocode(query)
+        if path == "/data/2.5/weather":
+            return self.weather(query)
+        return 404, {"message": "not found"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                # Drain headers; the stub never needs a request body.
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                _, target, _ = request_line.decode("latin-1").split(" ", 2)
+                url = urlsplit(target)
+                self.requests_served += 1
+                status, payload = await self.respond(url.path, parse_qs(url.query))
+                body = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # CancelledError: a hung request still sleeping when the server stops.
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def start_in_thread(self, host: str = "127.0.0.1", port: int = 0):
+        """Serves from a daemon thread with its own loop, so blocking clients can't starve it."""
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start(host, port))
+            started.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, name="stub-openweather", daemon=True).start()
+        started.wait()
+        self._thread_loop = loop
+        return self
+
+    def stop_thread(self):
+        asyncio.run_coroutine_threadsafe(self.stop(), self._thread_loop).result()
+        self._thread_loop.call_soon_threadsafe(self._thread_loop.stop)
+
+
+async def _serve(port: int, latency: float, error_rate: float, hang_rate: float):
+    stub = await StubOpenWeather(latency, error_rate=error_rate, hang_rate=hang_rate).start(port=port)
+    print(f"Stub OpenWeather listening on {stub.base_url}")
+    await stub.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--hang-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.port, args.latency_ms / 1000, args.error_rate, args.hang_rate))
@@ -0,0 +1,376 @@
+"""Offline city dataset compiled into a compact, memory-mapped index.
+
+build_index() turns a bulk dataset into one binary file; CityIndex opens it with mmap, so
+opening is instant, memory is shared between processes and only the pages a lookup touches are
+read. The file holds:
+
+- fixed-size city records (lat, lon, population, optional temperature/condition, country),
+- a name index sorted by normalized name (then population, largest first), binary-searched for
+  exact and prefix lookups and scanned within a prefix range for fuzzy ones,
+- a 1-degree lat/lon grid (cell directory + record ids) for nearest-neighbour searches,
+- the display names, normalized keys and condition strings as blobs.
+
+Supported datasets (optionally gzipped): GeoNames dumps (cities15000.txt and friends, tab
+separated), OpenWeather bulk JSON (city.list.json, or the current weather bulk files whose
+observations are kept too) and CSV with a header containing name, country, lat, lon and
+optionally population, temp_c, condition.
+
+    python -m multi_tool_agent.city_index build cities15000.txt cities.idx
+    python -m multi_tool_agent.city_index query cities.idx "sao paulo"
+"""
+import argparse
+import bisect
+import csv
+import difflib
+import gzip
+import heapq
+import io
+import json
+import math
+import mmap
+import os
+import struct
+import unicodedata
+from typing import Iterable, Iterator, NamedTuple
+
+from .geocode_cache import normalize_city
+
+MAGIC = b"CITYIDX1"
+# magic, records, name index entries, names blob, keys blob, conditions blob sizes
+HEADER = struct.Struct("<8sIIIII")
+# lat, lon, population, temp_c (NaN if none), name offset, name length, condition (NO_CONDITION if none), country
+RECORD = struct.Struct("<ffIfIHH2s")
+# key offset, key length, record id
+KEY_ENTRY = struct.Struct("<IHI")
+U32 = struct.Struct("<I")
+NO_CONDITION = 0xFFFF
+GRID_STEP = 1.0  # degrees per grid cell
+GRID_ROWS = int(180 / GRID_STEP)
+GRID_COLS = int(360 / GRID_STEP)
+KM_PER_DEGREE = 111.195
+# Prefix lookups and fuzzy matching scan at most this many name index entries.
+MAX_SCAN = 50000
+
+
+class City(NamedTuple):
+    name: str
+    country: str
+    lat: float
+    lon: float
+    population: int
+    temp_c: float | None
+    condition: str | None
+
+
+def index_key(name: str) -> str:
+    """Name index key: normalize_city() with accents folded, so "Sao Paulo" finds "São Paulo"."""
+    folded = unicodedata.normalize("NFKD", name)
+    return normalize_city("".join(ch for ch in folded if not unicodedata.combining(ch)))
+
+
+def _split_country(query: str) -> tuple[str, str | None]:
+    # OpenWeather-style "London,GB" narrows the match to one country.
+    name, _, country = query.partition(",")
+    country = country.strip().upper()
+    return name, country[:2] if country else None
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * 6371.0 * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(lat: float, lon: float) -> tuple[int, int]:
+    row = min(GRID_ROWS - 1, max(0, int((lat + 90) / GRID_STEP)))
+    return row, int((lon + 180) / GRID_STEP) % GRID_COLS
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def load_dataset(path: str) -> Iterator[dict]:
+    """Yields {"name", "country", "lat", "lon", "population", "temp_c", "condition", "alt_names"} per city."""
+    base = path[:-3] if path.endswith(".gz") else path
+    with _open_text(path) as f:
+        if base.endswith(".json"):
+            yield from _openweather_records(json.load(f))
+        elif base.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {"name": row["name"], "country": row.get("country", ""), "lat": float(row["lat"]),
+                       "lon": float(row["lon"]), "population": int(row.get("population") or 0),
+                       "temp_c": float(row["temp_c"]) if row.get("temp_c") else None,
+                       "condition": row.get("condition") or None, "alt_names": ()}
+        else:
+            for line in f:
+                # GeoNames: geonameid, name, asciiname, alternatenames, latitude, longitude, feature class,
+                # feature code, country code, cc2, admin1-4, population, ...
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 15:
+                    continue
+                yield {"name": cols[1], "country": cols[8], "lat": float(cols[4]), "lon": float(cols[5]),
+                       "population": int(cols[14] or 0), "temp_c": None, "condition": None,
+                       "alt_names": (cols[2],) if cols[2] != cols[1] else ()}
+
+
+def _openweather_records(data) -> Iterator[dict]:
+    for item in data if isinstance(data, list) else data.get("list", []):
+        # Bulk weather files wrap the city and report temperatures in Kelvin.
+        city = item.get("city", item)
+        coord = city.get("coord", {})
+        main, weather = item.get("main"), item.get("weather")
+        yield {"name": city["name"], "country": city.get("country", ""),
+               "lat": float(coord.get("lat", coord.get("Lat", 0))), "lon": float(coord.get("lon", coord.get("Lon", 0))),
+               "population": int(city.get("population") or 0),
+               "temp_c": round(main["temp"] - 273.15, 2) if main and "temp" in main else None,
+               "condition": weather[0].get("description") if weather else None, "alt_names": ()}
+
+
+def build_index(records: Iterable[dict], path: str) -> int:
+    """Compiles dataset records (see load_dataset) into an index file at `path`. Returns the city count."""
+    names, keys, conditions = bytearray(), bytearray(), {}
+    key_offsets = {}
+    rows, entries, cells = [], [], []
+    for record in records:
+        name = record["name"].strip()
+        if not name:
+            continue
+        rid = len(rows)
+        encoded = name.encode("utf-8")[:0xFFFF]
+        condition = record.get("condition")
+        cond_id = conditions.setdefault(condition, len(conditions)) if condition else NO_CONDITION
+        temp_c = record.get("temp_c")
+        country = (record.get("country") or "").upper().encode("ascii", "replace")[:2]
+        rows.append(RECORD.pack(record["lat"], record["lon"], record.get("population") or 0,
+                                math.nan if temp_c is None else temp_c, len(names), len(encoded), cond_id, country))
+        names += encoded
+        for key in {index_key(n) for n in (name, *record.get("alt_names", ())) if n}:
+            if key not in key_offsets:
+                key_offsets[key] = (len(keys), len(key.encode("utf-8")))
+                keys += key.encode("utf-8")
+            entries.append((key.encode("utf-8"), -(record.get("population") or 0), rid, key_offsets[key]))
+        cells.append((_cell(record["lat"], record["lon"]), rid))
+
+    entries.sort()
+    cells.sort()
+    directory = [0] * (GRID_ROWS * GRID_COLS + 1)
+    for (row, col), _ in cells:
+        directory[row * GRID_COLS + col + 1] += 1
+    for i in range(1, len(directory)):
+        directory[i] += directory[i - 1]
+    condition_blob = "\n".join(sorted(conditions, key=conditions.get)).encode("utf-8")
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(rows), len(entries), len(names), len(keys), len(condition_blob)))
+        f.write(b"".join(rows))
+        f.write(b"".join(KEY_ENTRY.pack(offset, length, rid) for _, _, rid, (offset, length) in entries))
+        f.write(struct.pack(f"<{len(directory)}I", *directory))
+        f.write(struct.pack(f"<{len(cells)}I", *(rid for _, rid in cells)))
+        f.write(names)
+        f.write(keys)
+        f.write(condition_blob)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+class _Keys:
+    """Sequence view of the sorted name index keys, for bisect."""
+
+    def __init__(self, index: "CityIndex"):
+        self.index = index
+
+    def __len__(self) -> int:
+        return self.index.key_count
+
+    def __getitem__(self, i: int) -> bytes:
+        return self.index._key(i)
+
+
+class CityIndex:
+    """Read-only, memory-mapped view of an index file written by build_index().
+    Args:
+        path (str): The index file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.key_count, names_size, keys_size, conditions_size = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a city index")
+        self._records_at = HEADER.size
+        self._entries_at = self._records_at + self.count * RECORD.size
+        self._directory_at = self._entries_at + self.key_count * KEY_ENTRY.size
+        self._cells_at = self._directory_at + (GRID_ROWS * GRID_COLS + 1) * U32.size
+        self._names_at = self._cells_at + self.count * U32.size
+        self._keys_at = self._names_at + names_size
+        conditions_at = self._keys_at + keys_size
+        blob = self._mm[conditions_at:conditions_at + conditions_size].decode("utf-8")
+        self.conditions = blob.split("\n") if blob else []
+        self._keys = _Keys(self)
+
+    def close(self):
+        self._mm.close()
+
+    def city(self, rid: int) -> City:
+        lat, lon, population, temp_c, name_at, name_len, cond_id, country = RECORD.unpack_from(
+            self._mm, self._records_at + rid * RECORD.size)
+        name_at += self._names_at
+        return City(self._mm[name_at:name_at + name_len].decode("utf-8"), country.rstrip(b"\0").decode("ascii"),
+                    lat, lon, population, None if math.isnan(temp_c) else temp_c,
+                    None if cond_id == NO_CONDITION else self.conditions[cond_id])
+
+    def _entry(self, i: int) -> tuple[int, int, int]:
+        return KEY_ENTRY.unpack_from(self._mm, self._entries_at + i * KEY_ENTRY.size)
+
+    def _key(self, i: int) -> bytes:
+        offset, length, _ = self._entry(i)
+        return self._mm[self._keys_at + offset:self._keys_at + offset + length]
+
+    def _prefix_range(self, prefix: bytes) -> tuple[int, int]:
+        start = bisect.bisect_left(self._keys, prefix)
+        # Every key starting with `prefix` sorts below prefix + the largest byte.
+        return start, bisect.bisect_left(self._keys, prefix + b"\xff", lo=start)
+
+    def exact(self, name: str, limit: int | None = None) -> list[City]:
+        """Cities whose name (or ASCII name) matches, most populous first. Accepts "Name,CC"."""
+        name, country = _split_country(name)
+        key = index_key(name).encode("utf-8")
+        start = bisect.bisect_left(self._keys, key)
+        end = bisect.bisect_right(self._keys, key, lo=start)
+        cities = [self.city(self._entry(i)[2]) for i in range(start, end)]
+        if country:
+            cities = [c for c in cities if c.country == country]
+        return cities[:limit]
+
+    def prefix(self, text: str, limit: int = 10) -> list[City]:
+        """The `limit` most populous cities whose name starts with `text` (autocomplete)."""
+        start, end = self._prefix_range(index_key(text).encode("utf-8"))
+        rids = {self._entry(i)[2] for i in range(start, min(end, start + MAX_SCAN))}
+        top = heapq.nlargest(limit, rids, key=self._population)
+        return [self.city(rid) for rid in top]
+
+    def _population(self, rid: int) -> int:
+        return RECORD.unpack_from(self._mm, self._records_at + rid * RECORD.size)[2]
+
+    def fuzzy(self, name: str, limit: int = 5, cutoff: float = 0.8) -> list[City]:
+        """Close spellings of `name`, best match first (ties go to the larger city).
+
+        Candidates are the keys sharing its first two characters (or the first one if that finds
+        nothing close), so typos there aren't corrected.
+        """
+        name, country = _split_country(name)
+        key = index_key(name).encode("utf-8")
+        # Keys are compared as UTF-8 bytes, which saves decoding every candidate.
+        matcher = difflib.SequenceMatcher(autojunk=False, b=key)
+        for width in (2, 1):
+            start, end = self._prefix_range(key[:width])
+            end = min(end, start + MAX_SCAN)
+            scored = []
+            previous, ratio = None, 0.0
+            for i in range(start, end):
+                offset, length, rid = self._entry(i)
+                # ratio() can't beat 2*min/(sum of lengths), so most keys are ruled out without reading them.
+                if 2 * min(length, len(key)) < cutoff * (length + len(key)):
+                    continue
+                candidate = self._mm[self._keys_at + offset:self._keys_at + offset + length]
+                if candidate != previous:
+                    previous = candidate
+                    matcher.set_seq1(candidate)
+                    ratio = matcher.quick_ratio() >= cutoff and matcher.ratio()
+                if ratio and ratio >= cutoff:
+                    scored.append((ratio, self._population(rid), rid))
+            if country:
+                scored = [s for s in scored if self.city(s[2]).country == country]
+            if scored:
+                return [self.city(rid) for _, _, rid in heapq.nlargest(limit, scored)]
+        return []
+
+    def lookup(self, name: str) -> City | None:
+        """Best city for a free-text name: the largest exact match, else the best fuzzy one."""
+        matches = self.exact(name, limit=1) or self.fuzzy(name, limit=1)
+        return matches[0] if matches else None
+
+    def _cell_ids(self, row: int, col: int) -> range:
+        slot = self._directory_at + (row * GRID_COLS + col) * U32.size
+        return range(U32.unpack_from(self._mm, slot)[0], U32.unpack_from(self._mm, slot + U32.size)[0])
+
+    @staticmethod
+    def _ring_bound_km(lat: float, ring: int) -> float:
+        # Anything outside the searched (2*ring+1)-cell box is at least this far away.
+        degrees = ring * GRID_STEP
+        if 2 * ring + 1 >= GRID_COLS:
+            return degrees * KM_PER_DEGREE
+        edge = min(90.0, abs(lat) + degrees + GRID_STEP)
+        return degrees * KM_PER_DEGREE * max(0.0, math.cos(math.radians(edge)))
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: float | None = None) -> list[tuple[City, float]]:
+        """The k cities closest to (lat, lon) by great-circle distance, as (city, km), nearest first."""
+        row0, col0 = _cell(lat, lon)
+        best = []  # max-heap of (-km, rid)
+        for ring in range(GRID_ROWS + GRID_COLS):
+            visited = set()
+            for row in range(row0 - ring, row0 + ring + 1):
+                if not 0 <= row < GRID_ROWS:
+                    continue
+                edge_row = abs(row - row0) == ring
+                for col in range(col0 - ring, col0 + ring + 1) if edge_row else (col0 - ring, col0 + ring):
+                    cell = (row, col % GRID_COLS)
+                    if cell in visited:
+                        continue
+                    visited.add(cell)
+                    for slot in self._cell_ids(*cell):
+                        rid = U32.unpack_from(self._mm, self._cells_at + slot * U32.size)[0]
+                        c_lat, c_lon = RECORD.unpack_from(self._mm, self._records_at + rid * RECORD.size)[:2]
+                        km = haversine_km(lat, lon, c_lat, c_lon)
+                        if max_km is not None and km > max_km:
+                            continue
+                        if len(best) < k:
+                            heapq.heappush(best, (-km, rid))
+                        elif km < -best[0][0]:
+                            heapq.heapreplace(best, (-km, rid))
+            bound = self._ring_bound_km(lat, ring)
+            if (len(best) == k and bound >= -best[0][0]) or (max_km is not None and bound > max_km):
+                break
+            if ring >= GRID_ROWS and 2 * ring + 1 >= GRID_COLS:
+                break
+        return [(self.city(rid), -neg_km) for neg_km, rid in sorted(best, reverse=True)]
+
+    def stats(self) -> dict:
+        return {"path": self.path, "cities": self.count, "names": self.key_count, "bytes": len(self._mm)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query an offline city index.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="compile a dataset into an index file")
+    build.add_argument("dataset")
+    build.add_argument("index")
+    query = commands.add_parser("query", help="look a name (or 'lat,lon') up in an index file")
+    query.add_argument("index")
+    query.add_argument("text")
+    args = parser.parse_args()
+    if args.command == "build":
+        count = build_index(load_dataset(args.dataset), args.index)
+        print(f"{count} cities -> {args.index} ({os.path.getsize(args.index)} bytes)")
+        return
+    index = CityIndex(args.index)
+    try:
+        lat, lon = (float(part) for part in args.text.split(","))
+    except ValueError:
+        for label, cities in (("exact", index.exact(args.text, limit=5)), ("prefix", index.prefix(args.text, 5)),
+                              ("fuzzy", index.fuzzy(args.text))):
+            print(f"{label}: " + "; ".join(f"{c.name}, {c.country} ({c.lat:.2f}, {c.lon:.2f})" for c in cities))
+    else:
+        for city, km in index.nearest(lat, lon, k=5):
+            print(f"{km:8.1f} km  {city.name}, {city.country}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from google.adk.events import Event
+
+load_dotenv()
+
+# State the weather agent relies on across turns; always carried into the summary.
+SUMMARY_STATE_KEYS = ("user_preference_temperature_unit", "user_preference_units", "last_city_checked_stateful",
+                      "last_weather_report")
+SUMMARY_PREFIX = "[Summary of the earlier conversation]"
+
+
+@dataclass
+class CompactionPolicy:
+    """How much of a session's event history is kept verbatim.
+
+    Once a session holds more than compact_after turns, everything but the last keep_turns
+    turns is folded into one summary event. Compacting in batches rather than every turn keeps
+    the history rewrite off most turns.
+    Args:
+        keep_turns (int): Most recent turns (a user message and everything it triggered) kept as-is.
+        compact_after (int): Turn count that triggers compaction. Must be larger than keep_turns.
+        max_summary_lines (int): Folded turns remembered in the summary; older lines are dropped.
+        max_line_chars (int): Each side of a folded turn is cut to this length.
+    """
+
+    keep_turns: int = 6
+    compact_after: int = 12
+    max_summary_lines: int = 20
+    max_line_chars: int = 160
+
+    def __post_init__(self):
+        if self.keep_turns < 1 or self.compact_after <= self.keep_turns:
+            raise ValueError(f"compaction needs 0 < keep_turns < compact_after (HISTORY_KEEP_TURNS / "
+                             f"HISTORY_COMPACT_AFTER), got {self.keep_turns} and {self.compact_after}")
+
+    @classmethod
+    def from_env(cls) -> CompactionPolicy | None:
+        """Policy from HISTORY_KEEP_TURNS / HISTORY_COMPACT_AFTER. HISTORY_KEEP_TURNS=0 disables compaction."""
+        keep_turns = int(os.getenv("HISTORY_KEEP_TURNS", str(cls.keep_turns)))
+        if keep_turns <= 0:
+            return None
+        return cls(keep_turns=keep_turns,
+                   compact_after=int(os.getenv("HISTORY_COMPACT_AFTER", str(max(keep_turns * 2, keep_turns + 1)))))
+
+
+def history_size(events: list[Event]) -> dict:
+    """Events, serialized bytes and a rough token estimate (~4 bytes per token) of a history."""
+    size = sum(len(event.model_dump_json(exclude_none=True).encode()) for event in events)
+    return {"events": len(events), "bytes": size, "tokens": size // 4}
+
+
+def is_summary(event: Event) -> bool:
+    return bool(event.custom_metadata and event.custom_metadata.get("compaction_summary"))
+
+
+def _text(event: Event) -> str:
+    if not event.content or not event.content.parts:
+        return ""
+    return " ".join(part.text for part in event.content.parts if part.text).strip()
+
+
+def split_turns(events: list[Event]) -> tuple[Event | None, list[list[Event]]]:
+    """Splits a history into (existing summary event, turns); a turn starts at each user message."""
+    summary = events[0] if events and is_summary(events[0]) else None
+    turns = []
+    for event in events[1:] if summary else events:
+        if event.author == "user" or not turns:
+            turns.append([])
+        turns[-1].append(event)
+    return summary, turns
+
+
+def _fold(turn: list[Event], max_chars: int) -> str:
+    question = next((_text(e) for e in turn if e.author == "user"), "")
+    answer = next((_text(e) for e in reversed(turn) if e.author != "user" and _text(e)), "")
+    return f"- User: {question[:max_chars]} | Agent: {answer[:max_chars]}"
+
+
+def compact_events(events: list[Event], state: dict, policy: CompactionPolicy, author: str) -> list[Event] | None:
+    """Returns the compacted history, or None if the policy doesn't call for compaction yet.
+
+    The summary event is authored by `author` (the root agent), so it reaches the model as the
+    agent's own earlier message.
+    """
+    summary, turns = split_turns(events)
+    if len(turns) <= policy.compact_after:
+        return None
+    from google.adk.events import Event
+    from google.genai import types
+
+    folded, kept = turns[:-policy.keep_turns], turns[-policy.keep_turns:]
+
+    lines = summary.custom_metadata["lines"] if summary else []
+    lines = (lines + [_fold(turn, policy.max_line_chars) for turn in folded])[-policy.max_summary_lines:]
+    known_state = [f"- {key}: {state[key]}" for key in SUMMARY_STATE_KEYS if state.get(key) is not None]
+    text = "\n".join([SUMMARY_PREFIX, *lines, "Known state:", *known_state])
+
+    last_folded = folded[-1][-1]
+    summary_event = Event(
+        invocation_id=last_folded.invocation_id,
+        author=author,
+        content=types.Content(role="model", parts=[types.Part(text=text)]),
+        timestamp=last_folded.timestamp,
+        custom_metadata={"compaction_summary": True, "lines": lines},
+    )
+    return [summary_event] + [event for turn in kept for event in turn]
+
+
+def compact_session(session_service, session, policy: CompactionPolicy, author: str) -> dict | None:
+    """Compacts a stored session's history if the policy says it's due.
+
+    session_service must provide replace_events() (SqliteSessionService does).
+    Returns:
+        dict: {"before": history_size, "after": history_size}, or None if nothing was compacted
+            (including when the store was too busy to rewrite it; the next turn tries again).
+    """
+    events = compact_events(session.events, session.state, policy, author)
+    if events is None:
+        return None
+    before = history_size(session.events)
+    if session_service.replace_events(app_name=session.app_name, user_id=session.user_id,
+                                      session_id=session.id, events=events) is False:
+        return None
+    return {"before": before, "after": history_size(events)}
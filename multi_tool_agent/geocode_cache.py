@@ -0,0 +1,122 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH")
+# Lookups run on the event loop, so a write doesn't wait on another process's lock for longer than
+# this; it is skipped instead and the entry stays in memory.
+GEOCODE_CACHE_DB_BUSY_TIMEOUT = 0.005
+
+
+def normalize_city(city: str) -> str:
+    """Cache key for a city name, same normalization the weather tools use."""
+    return city.lower().replace(" ", "")
+
+
+class GeocodeCache:
+    """City name -> (lat, lon) cache with LRU eviction and an optional SQLite store.
+
+    A city's coordinates don't change, so entries live until evicted unless a ttl is given.
+    With db_path set every entry is also written to SQLite (skipped while another process holds
+    the write lock), and a new process loads the most recently used entries back into memory on
+    start (warm start).
+    Args:
+        max_entries (int): Entries kept in memory before the least recently used is dropped.
+        ttl (float, optional): Seconds an entry stays valid. None means forever.
+        db_path (str, optional): SQLite file backing the cache. Defaults to GEOCODE_CACHE_PATH.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float | None = None, db_path: str | None = GEOCODE_CACHE_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.write_skips = 0
+        self._entries = OrderedDict()  # key -> (lat, lon, stored_at)
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS geocode ("
+                             "city TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL, stored_at REAL NOT NULL)")
+            self._db.commit()
+            self._warm_start()
+            self._db.execute(f"PRAGMA busy_timeout = {int(GEOCODE_CACHE_DB_BUSY_TIMEOUT * 1000)}")
+
+    def _warm_start(self):
+        rows = self._db.execute("SELECT city, lat, lon, stored_at FROM geocode ORDER BY stored_at DESC LIMIT ?",
+                                (self.max_entries,)).fetchall()
+        for city, lat, lon, stored_at in reversed(rows):
+            if not self._expired(stored_at):
+                self._entries[city] = (lat, lon, stored_at)
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _remember(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, city: str) -> tuple[float, float] | None:
+        """Returns cached (lat, lon) for the city, or None on a miss."""
+        key = normalize_city(city)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                # Evicted from memory but may still be on disk.
+                try:
+                    row = self._db.execute("SELECT lat, lon, stored_at FROM geocode WHERE city = ?",
+                                           (key,)).fetchone()
+                except sqlite3.OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    row = None
+                if row is not None:
+                    entry = row
+                    self._remember(key, entry)
+            if entry is None or self._expired(entry[2]):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, city: str, coords: tuple[float, float]):
+        """Stores a city's (lat, lon)."""
+        key = normalize_city(city)
+        entry = (coords[0], coords[1], time.time())
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO geocode (city, lat, lon, stored_at) VALUES (?, ?, ?, ?)",
+                                     (key, *entry))
+                    self._db.commit()
+                except sqlite3.OperationalError as e:
+                    self._db.rollback()
+                    if "locked" not in str(e):
+                        raise
+                    self.write_skips += 1
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "write_skips": self.write_skips}
+
+
+_shared_cache = None
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """Returns the process-wide GeocodeCache, creating it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = GeocodeCache()
+    return _shared_cache
@@ -0,0 +1,175 @@
+import asyncio
+import heapq
+import logging
+import os
+import time
+
+from dotenv import load_dotenv
+
+from .geocode_cache import normalize_city
+from .rate_limiter import PRIORITY_BACKGROUND, MemoryQuota, get_rate_limiter, request_priority
+from .weather_cache import get_weather_cache
+from .weather_provider import ProviderError, get_provider
+
+load_dotenv()
+# How many of the most requested cities are kept warm (0 disables prefetching).
+PREFETCH_TOP_K = int(os.getenv("PREFETCH_TOP_K", "10"))
+# Seconds before a hot city's observation expires that it gets refreshed.
+PREFETCH_LEAD_TIME = float(os.getenv("PREFETCH_LEAD_TIME", "60"))
+# Largest fraction of the OpenWeather per-minute budget refreshes may use.
+PREFETCH_BUDGET_SHARE = float(os.getenv("PREFETCH_BUDGET_SHARE", "0.2"))
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Keeps the top-K most requested cities' observations fresh so hot lookups stay cache hits.
+
+    Weather lookups report each city (with its coordinates) through record(). A background task
+    wakes every `interval` seconds and refreshes any top-K city whose cached observation expires
+    within `lead_time`, at background priority and within `budget_share` of the rate limiter's
+    per-minute budget. Request counts are halved every `decay_interval` seconds so yesterday's
+    hot cities fade out.
+    Args:
+        top_k (int): Defaults to PREFETCH_TOP_K.
+        lead_time (float): Defaults to PREFETCH_LEAD_TIME.
+        budget_share (float): Defaults to PREFETCH_BUDGET_SHARE.
+        interval (float, optional): Seconds between scans. Defaults to a quarter of lead_time, at most 15.
+        decay_interval (float): Seconds between halvings of the request counts.
+        cache (WeatherCache, optional): Defaults to get_weather_cache() at each scan.
+        provider (WeatherProvider, optional): Defaults to get_provider() at each scan.
+    """
+
+    def __init__(self, top_k: int = PREFETCH_TOP_K, lead_time: float = PREFETCH_LEAD_TIME,
+                 budget_share: float = PREFETCH_BUDGET_SHARE, interval: float | None = None,
+                 decay_interval: float = 3600.0, cache=None, provider=None):
+        self.top_k = top_k
+        self.lead_time = lead_time
+        self.budget_share = budget_share
+        self.interval = interval if interval is not None else min(15.0, lead_time / 4)
+        self.decay_interval = decay_interval
+        self._cache = cache
+        self._provider = provider
+        self.counts = {}  # normalized city -> decayed request count
+        self.coords = {}  # normalized city -> (lat, lon)
+        self.refreshed = 0
+        self.failed = 0
+        self.skipped_budget = 0
+        self._budget = None
+        self._last_decay = time.monotonic()
+        self._task = None
+
+    @property
+    def cache(self):
+        return self._cache or get_weather_cache()
+
+    @property
+    def provider(self):
+        return self._provider or get_provider()
+
+    def record(self, city: str, coords: tuple[float, float]):
+        """Counts one request for the city and makes sure the refresh task is running."""
+        if self.top_k <= 0:
+            return
+        key = normalize_city(city)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.coords[key] = coords
+        self.start()
+
+    def hot_cities(self) -> list[str]:
+        return heapq.nlargest(self.top_k, self.counts, key=self.counts.get)
+
+    def start(self):
+        """Starts the refresh task on the running loop, if there is one and it isn't already running."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _take_budget(self) -> bool:
+        per_minute = get_rate_limiter().calls_per_minute * self.budget_share
+        if not per_minute:
+            return True
+        if self._budget is None or self._budget.rate != per_minute / 60:
+            self._budget = MemoryQuota(per_minute, 0, burst=max(1.0, per_minute / 6))
+        return self._budget.try_acquire() == 0
+
+    def _decay(self):
+        if time.monotonic() - self._last_decay < self.decay_interval:
+            return
+        self._last_decay = time.monotonic()
+        self.counts = {city: count / 2 for city, count in self.counts.items() if count >= 1}
+        self.coords = {city: self.coords[city] for city in self.counts}
+
+    def due(self) -> list[tuple[float, float]]:
+        """Coordinates of hot cities whose observation is missing or expires within lead_time."""
+        cache = self.cache
+        due = []
+        for city in self.hot_cities():
+            expires_in = cache.expires_in(*self.coords[city])
+            if expires_in is None or expires_in <= self.lead_time:
+                due.append(self.coords[city])
+        return due
+
+    async def refresh_due(self) -> int:
+        """One scan: refreshes every due hot city the budget allows. Returns how many were refreshed."""
+        self._decay()
+        due = []
+        for coords in self.due():
+            if not self._take_budget():
+                self.skipped_budget += 1
+                continue
+            due.append(coords)
+        if not due:
+            return 0
+        cache, fetch = self.cache, self.provider.current_weather
+        with request_priority(PRIORITY_BACKGROUND):
+            results = await asyncio.gather(*(cache.get_or_fetch(*coords, fetch, refresh=True) for coords in due),
+                                           return_exceptions=True)
+        refreshed = 0
+        for result in results:
+            if isinstance(result, ProviderError):
+                self.failed += 1
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                refreshed += 1
+        self.refreshed += refreshed
+        return refreshed
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_due()
+            except Exception:
+                logger.exception("Prefetch scan failed")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        """Refresh counts, the current hot list and the weather cache hit rate it is buying."""
+        cache_stats = self.cache.stats()
+        return {"top_k": self.top_k, "hot_cities": self.hot_cities(), "tracked": len(self.counts),
+                "refreshed": self.refreshed, "failed": self.failed, "skipped_budget": self.skipped_budget,
+                "cache_hit_rate": cache_stats["hit_rate"]}
+
+
+_prefetcher = None
+
+
+def get_prefetcher() -> Prefetcher:
+    """Returns the process-wide Prefetcher, creating it on first use."""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = Prefetcher()
+    return _prefetcher
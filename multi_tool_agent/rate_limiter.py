@@ -0,0 +1,271 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# OpenWeather plan limits (the free plan allows 60 calls/minute). 0 means unlimited.
+OPENWEATHER_CALLS_PER_MINUTE = float(os.getenv("OPENWEATHER_CALLS_PER_MINUTE", "60"))
+OPENWEATHER_CALLS_PER_DAY = int(os.getenv("OPENWEATHER_CALLS_PER_DAY", "0"))
+# Calls that may go out back to back before the per-minute refill rate applies.
+RATE_LIMIT_BURST = os.getenv("RATE_LIMIT_BURST")
+# Longest a request waits in the queue for quota before it fails with RateLimitTimeout.
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+# SQLite file shared by every process on the host so they draw from one budget; unset keeps it per process.
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB")
+# Seconds an acquire waits for another process's lock on the shared budget before backing off. Acquires
+# run on the event loop, so this bounds how long one can stall it; a backed-off call retries after
+# RATE_LIMIT_DB_RETRY seconds like any other wait for quota.
+RATE_LIMIT_DB_BUSY_TIMEOUT = 0.005
+RATE_LIMIT_DB_RETRY = 0.01
+
+# Queue priorities: lower goes first. A user waiting on a turn outranks background work.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+_priority = contextvars.ContextVar("rate_limit_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Runs the enclosed OpenWeather calls at the given queue priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a request can't get quota before its deadline."""
+
+
+def _utc_day(now: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+
+def take_token(state: tuple[float, float, str, int], now: float, rate: float, capacity: float,
+               per_day: int) -> tuple[float, tuple[float, float, str, int]]:
+    """Token-bucket step shared by the quota backends.
+    Args:
+        state: (tokens, updated_at, utc_day, used_today) as last stored.
+    Returns:
+        tuple: (0.0 and the new state if a call may go out now, else seconds until one may and the
+               state unchanged apart from the refill).
+    """
+    tokens, updated_at, day, used_today = state
+    today = _utc_day(now)
+    if day != today:
+        day, used_today = today, 0
+    if per_day and used_today >= per_day:
+        tomorrow = (int(now) // 86400 + 1) * 86400
+        return tomorrow - now, (tokens, updated_at, day, used_today)
+    if rate:
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        if tokens < 1:
+            return (1 - tokens) / rate, (tokens, now, day, used_today)
+        tokens -= 1
+    return 0.0, (tokens, now, day, used_today + 1)
+
+
+class MemoryQuota:
+    """Per-minute token bucket plus per-UTC-day call counter for one process."""
+
+    def __init__(self, per_minute: float, per_day: int, burst: float):
+        self.rate = per_minute / 60
+        self.capacity = burst
+        self.per_day = per_day
+        self._state = (burst, time.time(), _utc_day(time.time()), 0)
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> float:
+        """Spends one call if the budget allows and returns 0, else returns seconds until it would."""
+        with self._lock:
+            wait, self._state = take_token(self._state, time.time(), self.rate, self.capacity, self.per_day)
+            return wait
+
+    def usage(self) -> dict:
+        with self._lock:
+            tokens, _, day, used_today = self._state
+        return {"tokens": round(tokens, 2), "day": day, "used_today": used_today}
+
+
+class SqliteQuota(MemoryQuota):
+    """Same budget as MemoryQuota, kept in a SQLite row so every process on the host shares it.
+
+    Each acquire is one short BEGIN IMMEDIATE transaction, so concurrent processes serialize on
+    the database lock instead of double-spending tokens. If another process holds the lock for
+    longer than RATE_LIMIT_DB_BUSY_TIMEOUT, the acquire reports a RATE_LIMIT_DB_RETRY wait
+    instead of blocking.
+    """
+
+    def __init__(self, db_path: str, per_minute: float, per_day: int, burst: float, name: str = "openweather"):
+        super().__init__(per_minute, per_day, burst)
+        self.name = name
+        self.lock_retries = 0
+        # Setup isn't on a hot path, so it may wait out a busy database like any other connection.
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rate_limit (name TEXT PRIMARY KEY, tokens REAL, "
+                         "updated_at REAL, day TEXT, used_today INTEGER)")
+        self._db.execute("INSERT OR IGNORE INTO rate_limit VALUES (?, ?, ?, ?, ?)", (name, *self._state))
+        self._db.execute(f"PRAGMA busy_timeout = {int(RATE_LIMIT_DB_BUSY_TIMEOUT * 1000)}")
+
+    def try_acquire(self) -> float:
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                self.lock_retries += 1
+                return RATE_LIMIT_DB_RETRY
+            try:
+                state = self._db.execute("SELECT tokens, updated_at, day, used_today FROM rate_limit WHERE name = ?",
+                                         (self.name,)).fetchone()
+                wait, self._state = take_token(state, time.time(), self.rate, self.capacity, self.per_day)
+                self._db.execute("UPDATE rate_limit SET tokens = ?, updated_at = ?, day = ?, used_today = ? "
+                                 "WHERE name = ?", (*self._state, self.name))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return wait
+
+    def usage(self) -> dict:
+        return {**super().usage(), "lock_retries": self.lock_retries}
+
+
+class RateLimiter:
+    """Client-side OpenWeather budget shared by every session in the process.
+
+    Calls within budget go straight through. Calls over budget wait in a priority queue (see
+    request_priority) and are released in priority order as quota refills; one that can't be
+    served before its deadline fails with RateLimitTimeout instead of going out to collect a 429.
+    Args:
+        calls_per_minute (float): Defaults to OPENWEATHER_CALLS_PER_MINUTE. 0 means unlimited.
+        calls_per_day (int): Defaults to OPENWEATHER_CALLS_PER_DAY. 0 means unlimited.
+        burst (float, optional): Bucket size. Defaults to RATE_LIMIT_BURST, else a sixth of a minute's calls.
+        max_wait (float): Default queueing deadline in seconds. Defaults to RATE_LIMIT_MAX_WAIT.
+        db_path (str, optional): SQLite file for a budget shared across processes. Defaults to RATE_LIMIT_DB.
+    """
+
+    def __init__(self, calls_per_minute: float = OPENWEATHER_CALLS_PER_MINUTE,
+                 calls_per_day: int = OPENWEATHER_CALLS_PER_DAY, burst: float | None = None,
+                 max_wait: float = RATE_LIMIT_MAX_WAIT, db_path: str | None = RATE_LIMIT_DB):
+        if burst is None:
+            burst = float(RATE_LIMIT_BURST) if RATE_LIMIT_BURST else max(1.0, calls_per_minute / 6)
+        self.calls_per_minute = calls_per_minute
+        self.calls_per_day = calls_per_day
+        self.max_wait = max_wait
+        self.quota = (SqliteQuota(db_path, calls_per_minute, calls_per_day, burst) if db_path
+                      else MemoryQuota(calls_per_minute, calls_per_day, burst))
+        self.granted = 0
+        self.queued = 0
+        self.timed_out = 0
+        self.waits = deque(maxlen=4096)  # seconds queued, per granted call that had to wait
+        self._waiters = []  # heap of [priority, seq, deadline, enqueued_at, future]
+        self._seq = itertools.count()
+        self._dispatcher = None
+        self._next_quota_at = 0.0  # loop time the quota last said a call may go out
+
+    async def acquire(self, max_wait: float | None = None) -> float:
+        """Waits for quota for one call at the current request_priority. Returns seconds spent queued."""
+        loop = asyncio.get_running_loop()
+        if not self._waiters:
+            wait = self.quota.try_acquire()
+            if wait == 0:
+                self.granted += 1
+                return 0.0
+            self._next_quota_at = loop.time() + wait
+        now = loop.time()
+        deadline = now + (self.max_wait if max_wait is None else max_wait)
+        if deadline < self._next_quota_at:
+            # Nothing frees up before the deadline (e.g. the daily quota is spent): don't queue at all.
+            self.timed_out += 1
+            raise RateLimitTimeout(f"no OpenWeather quota within {deadline - now:.1f}s "
+                                   f"(next call allowed in {self._next_quota_at - now:.1f}s)")
+        future = loop.create_future()
+        heapq.heappush(self._waiters, [_priority.get(), next(self._seq), deadline, now, future])
+        self.queued += 1
+        if self._dispatcher is None or self._dispatcher.done() or self._dispatcher.get_loop() is not loop:
+            self._dispatcher = loop.create_task(self._dispatch())
+        return await future
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while self._waiters:
+            while self._waiters and self._waiters[0][4].done():
+                heapq.heappop(self._waiters)  # cancelled callers
+            if not self._waiters:
+                return
+            wait = self.quota.try_acquire()
+            now = loop.time()
+            if wait == 0:
+                _, _, _, enqueued_at, future = heapq.heappop(self._waiters)
+                self.granted += 1
+                self.waits.append(now - enqueued_at)
+                future.set_result(now - enqueued_at)
+                continue
+            self._next_quota_at = now + wait
+            # Nobody can be served before now + wait; fail those whose deadline comes first.
+            for waiter in self._waiters:
+                if not waiter[4].done() and waiter[2] < now + wait:
+                    self.timed_out += 1
+                    waiter[4].set_exception(RateLimitTimeout(
+                        f"no OpenWeather quota within {waiter[2] - waiter[3]:.1f}s "
+                        f"(next call allowed in {wait:.1f}s)"))
+            deadlines = [waiter[2] for waiter in self._waiters if not waiter[4].done()]
+            if not deadlines:
+                self._waiters.clear()
+                return
+            # The wait can be hours (daily quota); wake by the earliest deadline to fail it on time.
+            await asyncio.sleep(max(0.0, min(wait, min(deadlines) - now)))
+
+    def acquire_blocking(self, max_wait: float | None = None) -> float:
+        """Blocking acquire for synchronous callers; it polls the quota instead of joining the queue."""
+        start = time.monotonic()
+        deadline = start + (self.max_wait if max_wait is None else max_wait)
+        waited = 0.0
+        while (wait := self.quota.try_acquire()) > 0:
+            if time.monotonic() + wait > deadline:
+                self.timed_out += 1
+                raise RateLimitTimeout(f"no OpenWeather quota within {deadline - start:.1f}s")
+            time.sleep(wait)
+            waited = time.monotonic() - start
+        self.granted += 1
+        if waited:
+            self.queued += 1
+            self.waits.append(waited)
+        return waited
+
+    def stats(self) -> dict:
+        """Quota consumption and queue wait metrics."""
+        waits = sorted(self.waits)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))] * 1000, 1) if waits else 0.0
+
+        return {"calls_per_minute": self.calls_per_minute, "calls_per_day": self.calls_per_day,
+                **self.quota.usage(), "granted": self.granted, "queued": self.queued,
+                "timed_out": self.timed_out, "waiting": sum(not w[4].done() for w in self._waiters),
+                "wait_ms": {"p50": pct(50), "p95": pct(95), "max": pct(100)}}
+
+
+_shared_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Returns the process-wide RateLimiter, creating it on first use."""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter()
+    return _shared_limiter
@@ -0,0 +1,106 @@
+import os
+import random
+import time
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Total tries per upstream request, including the first one.
+OPENWEATHER_MAX_ATTEMPTS = int(os.getenv("OPENWEATHER_MAX_ATTEMPTS", "3"))
+# Consecutive upstream failures that open the circuit, and seconds it stays open before a probe.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+# Statuses that mean "upstream is struggling, try again later" rather than "your request is wrong".
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff.
+
+    The delay before retry n is uniform in [0, min(max_delay, base_delay * 2**(n-1))], so clients
+    that failed together don't come back together. A Retry-After from a 429/503 is honoured up to
+    max_delay.
+    Args:
+        max_attempts (int): Total tries, including the first. Defaults to OPENWEATHER_MAX_ATTEMPTS.
+        base_delay (float): Backoff scale in seconds.
+        max_delay (float): Cap on any single delay in seconds.
+    """
+
+    def __init__(self, max_attempts: int = OPENWEATHER_MAX_ATTEMPTS, base_delay: float = 0.2,
+                 max_delay: float = 2.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        """Seconds to wait after failed attempt number `attempt` (1-based)."""
+        if retry_after:
+            try:
+                return min(self.max_delay, max(0.0, float(retry_after)))
+            except ValueError:
+                pass  # HTTP-date form; fall back to jittered backoff.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast while an upstream is degraded instead of piling more requests onto it.
+
+    closed: requests flow; `failure_threshold` consecutive failures open the circuit.
+    open: requests are rejected for `reset_timeout` seconds.
+    half_open: one probe request is let through; success closes the circuit, failure reopens it.
+    Args:
+        name (str): Shown in errors and stats.
+        failure_threshold (int): Defaults to BREAKER_FAILURE_THRESHOLD.
+        reset_timeout (float): Defaults to BREAKER_RESET_TIMEOUT.
+    """
+
+    def __init__(self, name: str = "", failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def check(self):
+        """Raises CircuitOpenError if a request may not go upstream right now."""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                self.rejected += 1
+                raise CircuitOpenError(f"circuit for {self.name} is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                self.rejected += 1
+                raise CircuitOpenError(f"circuit for {self.name} is half-open and already probing")
+            self._probing = True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Gives back a probe slot taken by check() when the request ended without an outcome (e.g. cancelled)."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
@@ -0,0 +1,124 @@
+import contextvars
+import os
+import re
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from .geocode_cache import normalize_city
+from .weather_cache import get_weather_cache
+
+load_dotenv()
+# Turns remembered by the response cache (0 disables it).
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+# Tools whose results a cached reply may depend on, and the state keys such a turn may write.
+CACHEABLE_TOOLS = frozenset({"get_weather_stateful_async", "get_weather_many"})
+CACHEABLE_STATE_KEYS = frozenset({"last_city_checked_stateful", "last_weather_report"})
+
+_lookups = contextvars.ContextVar("response_cache_lookups", default=None)
+
+
+def normalize_query(query: str) -> str:
+    """Cache key for a user message: case, spacing, curly quotes and surrounding punctuation don't matter."""
+    query = query.lower().replace("’", "'")
+    return re.sub(r"\s+", " ", query).strip(" ?!.,")
+
+
+@contextmanager
+def track_lookups():
+    """Collects the (city, coords, weather cache generation) of every weather lookup in the block."""
+    lookups = []
+    token = _lookups.set(lookups)
+    try:
+        yield lookups
+    finally:
+        _lookups.reset(token)
+
+
+def note_lookup(city: str, coords: tuple[float, float]):
+    """Called by the weather tools after each lookup; a no-op outside track_lookups()."""
+    lookups = _lookups.get()
+    if lookups is not None:
+        lookups.append((city, coords, get_weather_cache().generation(*coords)))
+
+
+class ResponseCache:
+    """Replays the final reply of a repeated weather question instead of running the agents again.
+
+    Entries are keyed by the normalized query and the session's unit preference code. Each entry
+    remembers which observations its reply was built from (their weather cache generations); it
+    is only served while every one of them is still the current, fresh observation, so a reply
+    never outlives the weather it reports. Only self-contained turns are stored: the root agent
+    answered itself using only the weather tools, every city it looked up is named in the query,
+    and the turn changed no state beyond the last city / last report, which a hit replays.
+    Args:
+        max_entries (int): Entries kept before the least recently used is dropped. Defaults to RESPONSE_CACHE_SIZE.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.stored = 0
+        self.uncacheable = 0
+        self.evicted = 0
+        self._entries = OrderedDict()  # (query, unit) -> {"text", "author", "state_delta", "deps"}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, query: str, unit: int) -> dict | None:
+        """Returns {"text", "author", "state_delta"} for a still-valid earlier answer, else None."""
+        key = (normalize_query(query), unit)
+        entry = self._entries.get(key)
+        if entry is not None:
+            weather_cache = get_weather_cache()
+            if all(weather_cache.generation(*coords) == generation for coords, generation in entry["deps"]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            del self._entries[key]
+            self.invalidated += 1
+        self.misses += 1
+        return None
+
+    def put(self, query: str, unit: int, text: str, author: str, lookups: list, tools: list[str],
+            state_delta: dict) -> bool:
+        """Stores a finished turn if it is self-contained (see the class docstring). Returns whether it was."""
+        compact_query = normalize_city(normalize_query(query))
+        if (not lookups or not tools or not set(tools) <= CACHEABLE_TOOLS
+                or not set(state_delta) <= CACHEABLE_STATE_KEYS
+                or any(generation is None or normalize_city(city) not in compact_query
+                       for city, _, generation in lookups)):
+            self.uncacheable += 1
+            return False
+        self._entries[(normalize_query(query), unit)] = {
+            "text": text, "author": author, "state_delta": {**state_delta, "last_weather_report": text},
+            "deps": [(coords, generation) for _, coords, generation in lookups]}
+        self._entries.move_to_end((normalize_query(query), unit))
+        self.stored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+        return True
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "invalidated": self.invalidated, "stored": self.stored, "uncacheable": self.uncacheable,
+                "evicted": self.evicted, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+_shared_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide ResponseCache, creating it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
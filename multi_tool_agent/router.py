@@ -0,0 +1,69 @@
+import os
+import re
+
+from dotenv import load_dotenv
+
+load_dotenv()
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ROUTER", "1").lower() not in ("0", "false", "no", "off")
+
+# Only messages that are *nothing but* a greeting / farewell match, so "Hi, weather in Paris?"
+# still goes to the LLM. A name is only taken from an introduction: anything after "my name is",
+# or a capitalised word after "I'm" / "I am" / "this is" ("Hi, I'm fine" goes to the LLM).
+GREETING_PATTERN = (r"^\s*(?:(?:hi|hello|hey|hiya|howdy|greetings|yo|good\s+(?:morning|afternoon|evening))"
+                    r"(?:\s+there)?[\s,!.]*)+"
+                    r"(?:(?:my\s+name\s+is|(?P<intro>i\s*am|i'm|im|this\s+is))\s+(?P<name>[a-z][\w'-]*))?"
+                    r"[\s!.:)]*$")
+FAREWELL_PATTERN = (r"^\s*(?:(?:thanks|thank\s+you|thx|ok|okay|cheers|great|that's\s+all|that\s+is\s+all)[\s,!.]*)*"
+                    r"(?:bye|goodbye|bye\s+bye|see\s+you(?:\s+later|\s+soon)?|see\s+ya|later|good\s+night|take\s+care)"
+                    r"[\s,!.:)]*$")
+
+
+class FastPathRouter:
+    """Answers trivial greetings and farewells locally, without a round-trip through the LLM agents.
+
+    classify() is a pair of anchored regexes; anything they don't fully match is left to the
+    LLM. The answers come from the same say_hello / say_goodbye tools the sub-agents would call.
+    Args:
+        greeting (callable): Called as greeting(name) for greetings, e.g. say_hello.
+        farewell (callable): Called as farewell() for farewells, e.g. say_goodbye.
+        enabled (bool): When False every query falls back to the LLM. Defaults to FAST_PATH_ROUTER.
+        greeting_pattern (str, optional): Regex overriding GREETING_PATTERN; may capture a `name` group.
+        farewell_pattern (str, optional): Regex overriding FAREWELL_PATTERN.
+    """
+
+    def __init__(self, greeting, farewell, enabled: bool = FAST_PATH_ENABLED,
+                 greeting_pattern: str = GREETING_PATTERN, farewell_pattern: str = FAREWELL_PATTERN):
+        self.greeting = greeting
+        self.farewell = farewell
+        self.enabled = enabled
+        self.greeting_re = re.compile(greeting_pattern, re.IGNORECASE)
+        self.farewell_re = re.compile(farewell_pattern, re.IGNORECASE)
+        self.handled = {"greeting": 0, "farewell": 0}
+        self.fallbacks = 0
+
+    def classify(self, query: str) -> tuple[str, dict] | None:
+        """Returns (intent, tool_args) for a trivial query, or None if the LLM should handle it."""
+        match = self.greeting_re.match(query)
+        if match:
+            groups = match.groupdict()
+            name = groups.get("name")
+            if name and groups.get("intro") and not name[0].isupper():
+                return None  # "I'm good", not a name
+            return "greeting", ({"name": name[0].upper() + name[1:]} if name else {})
+        if self.farewell_re.match(query):
+            return "farewell", {}
+        return None
+
+    def try_answer(self, query: str) -> tuple[str, str] | None:
+        """Returns (intent, reply) if the query can be answered on the fast path, else None."""
+        intent = self.classify(query) if self.enabled else None
+        if intent is None:
+            self.fallbacks += 1
+            return None
+        intent, args = intent
+        self.handled[intent] += 1
+        reply = self.greeting(**args) if intent == "greeting" else self.farewell(**args)
+        return intent, reply
+
+    def stats(self) -> dict:
+        return {**self.handled, "fallbacks": self.fallbacks}
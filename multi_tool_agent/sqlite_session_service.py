@@ -0,0 +1,518 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListEventsResponse, ListSessionsResponse
+from google.adk.sessions.state import State
+
+from .tracing import get_tracer
+from .units import Locale, TemperatureUnit, UnitPreference, WindUnit
+
+load_dotenv()
+# When appended events reach the database: "event" (each in its own commit), "turn" (one commit per
+# turn, at its final response) or "group" (finished turns of all sessions committed together every
+# SESSION_FLUSH_INTERVAL seconds; a crash can lose the last interval's turns).
+SESSION_DURABILITY = os.getenv("SESSION_DURABILITY", "turn")
+SESSION_FLUSH_INTERVAL = float(os.getenv("SESSION_FLUSH_INTERVAL", "0.05"))
+DURABILITY_MODES = ("event", "turn", "group")
+# Minimum seconds between sweeps of idle sessions; create_session runs one when this much time has passed.
+SESSION_EXPIRY_INTERVAL = float(os.getenv("SESSION_EXPIRY_INTERVAL", "300"))
+# Turn commits run on the event loop, so they don't wait on another process's write lock: after
+# SESSION_DB_BUSY_TIMEOUT the turn stays buffered and the group-commit thread retries it. Calls that
+# must write before returning (create_session, set_state, delete_session, flush) wait up to
+# SESSION_DB_LOCK_TIMEOUT seconds.
+SESSION_DB_BUSY_TIMEOUT = 0.005
+SESSION_DB_LOCK_TIMEOUT = float(os.getenv("SESSION_DB_LOCK_TIMEOUT", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+def _is_locked(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and "locked" in str(error)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_by_update ON sessions (last_update_time);
+CREATE TABLE IF NOT EXISTS session_state (
+    app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL,
+    key TEXT NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, key)
+);
+CREATE TABLE IF NOT EXISTS user_state (
+    app_name TEXT NOT NULL, user_id TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, key)
+);
+CREATE TABLE IF NOT EXISTS app_state (
+    app_name TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,
+    PRIMARY KEY (app_name, key)
+);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    app_name TEXT NOT NULL, user_id TEXT NOT NULL, session_id TEXT NOT NULL,
+    timestamp REAL NOT NULL, data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_by_session ON events (app_name, user_id, session_id, seq);
+"""
+
+
+class SqliteSessionService(BaseSessionService):
+    """Drop-in replacement for InMemorySessionService backed by an embedded SQLite database.
+
+    Sessions are looked up by their (app, user, session) primary key, and each appended event
+    writes only its own row plus the state keys it changed, never the whole session. The
+    database runs in WAL mode so readers don't block the writer. Sessions idle for longer
+    than idle_ttl are treated as gone, and create_session removes them with expire_idle_sessions()
+at most once every expiry_interval seconds.
+
+    Appended events are buffered per session (write-behind) and a turn's events and state deltas
+    reach the database together in one transaction once its final response arrives, instead of
+    one commit per event. With durability="group" finished turns wait up to flush_interval
+    seconds so that many sessions' turns share one commit. get_session reads buffered turns on
+    top of the database, and other reads and writes of a session first write out what is
+    buffered, so callers always see their own writes (other processes see them once committed).
+    If another process holds the write lock when a turn is committed, the turn stays buffered and
+    is retried from the group-commit thread rather than blocking the caller.
+    Args:
+        db_path (str): SQLite file, or ":memory:" for a throwaway store.
+        idle_ttl (float, optional): Seconds without activity after which a session expires.
+        durability (str): "event", "turn" or "group", see SESSION_DURABILITY. Defaults to SESSION_DURABILITY.
+        flush_interval (float): Seconds between group commits. Defaults to SESSION_FLUSH_INTERVAL.
+        expiry_interval (float): Minimum seconds between idle-session sweeps. Defaults to SESSION_EXPIRY_INTERVAL.
+        lock_timeout (float): Seconds a write that can't be deferred waits for the database's write lock.
+            Defaults to SESSION_DB_LOCK_TIMEOUT.
+    """
+
+    def __init__(self, db_path: str = ":memory:", idle_ttl: float | None = None,
+                 durability: str = SESSION_DURABILITY, flush_interval: float = SESSION_FLUSH_INTERVAL,
+                 expiry_interval: float = SESSION_EXPIRY_INTERVAL, lock_timeout: float = SESSION_DB_LOCK_TIMEOUT):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"durability must be one of {DURABILITY_MODES}, not {durability!r}")
+        self.db_path = db_path
+        self.idle_ttl = idle_ttl
+        self.durability = durability
+        self.flush_interval = flush_interval
+        self.expiry_interval = expiry_interval
+        self.lock_timeout = lock_timeout
+        self.lock_busy = 0
+        self.deferred_commits = 0
+        self.expired = 0
+        self._last_expiry = 0.0
+        self.commits = 0
+        self.events_written = 0
+        self.batches_written = 0
+        self._open = {}  # (app, user, session) -> batch of the turn in progress
+        self._sealed = []  # finished turns waiting for a group commit, oldest first
+        self._flusher = None
+        self._closed = threading.Event()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute(f"PRAGMA busy_timeout = {int(SESSION_DB_BUSY_TIMEOUT * 1000)}")
+
+    # --- helpers -----------------------------------------------------------------------
+
+    def _load_state(self, app_name: str, user_id: str, session_id: str) -> dict[str, Any]:
+        state = {}
+        for key, value in self._db.execute(
+                "SELECT key, value FROM session_state WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                (app_name, user_id, session_id)):
+            state[key] = json.loads(value)
+        for key, value in self._db.execute(
+                "SELECT key, value FROM user_state WHERE app_name = ? AND user_id = ?", (app_name, user_id)):
+            state[State.USER_PREFIX + key] = json.loads(value)
+        for key, value in self._db.execute("SELECT key, value FROM app_state WHERE app_name = ?", (app_name,)):
+            state[State.APP_PREFIX + key] = json.loads(value)
+        return state
+
+    def _write_state(self, app_name: str, user_id: str, session_id: str, delta: dict[str, Any]):
+        for key, value in delta.items():
+            if key.startswith(State.TEMP_PREFIX):
+                continue
+            if key.startswith(State.APP_PREFIX):
+                self._db.execute("INSERT OR REPLACE INTO app_state VALUES (?, ?, ?)",
+                                 (app_name, key.removeprefix(State.APP_PREFIX), json.dumps(value)))
+            elif key.startswith(State.USER_PREFIX):
+                self._db.execute("INSERT OR REPLACE INTO user_state VALUES (?, ?, ?, ?)",
+                                 (app_name, user_id, key.removeprefix(State.USER_PREFIX), json.dumps(value)))
+            else:
+                self._db.execute("INSERT OR REPLACE INTO session_state VALUES (?, ?, ?, ?, ?)",
+                                 (app_name, user_id, session_id, key, json.dumps(value)))
+
+    def _begin(self, wait: float):
+        """BEGIN IMMEDIATE, retrying for up to `wait` seconds while another process holds the write lock.
+        Raises sqlite3.OperationalError if it is still held."""
+        deadline = time.monotonic() + wait
+        delay = SESSION_DB_BUSY_TIMEOUT
+        while True:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e):
+                    raise
+                self.lock_busy += 1
+                if time.monotonic() + delay > deadline:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def _commit(self, batches: list[dict], wait: float = 0.0):
+        """Writes buffered turns in one transaction: their events, merged state deltas and update times."""
+        if not batches:
+            return
+        with get_tracer().span("state.commit", turns=len(batches), events=sum(len(b["events"]) for b in batches)):
+            self._begin(wait)
+            try:
+                for batch in batches:
+                    app_name, user_id, session_id = batch["key"]
+                    updated = self._db.execute(
+                        "UPDATE sessions SET last_update_time = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                        (batch["updated"], app_name, user_id, session_id)).rowcount
+                    if updated:
+                        self._db.executemany(
+                            "INSERT INTO events (app_name, user_id, session_id, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                            [(app_name, user_id, session_id, timestamp, data) for timestamp, data in batch["events"]])
+                        self._write_state(app_name, user_id, session_id, batch["state"])
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        self.commits += 1
+        self.events_written += sum(len(b["events"]) for b in batches)
+        self.batches_written += len(batches)
+
+    def _flush(self, key: tuple | None = None, open_turns: bool = True, wait: float = 0.0):
+        """Commits every finished turn, plus turns still in progress if open_turns: only `key`'s if given,
+        else all of them. Waits up to `wait` seconds for the write lock. Call with the lock held."""
+        batches, self._sealed = self._sealed, []
+        if open_turns and key is None:
+            batches += self._open.values()
+            self._open = {}
+        elif open_turns and key in self._open:
+            batches.append(self._open.pop(key))
+        try:
+            self._commit(batches, wait)
+        except BaseException:
+            # Keep them for the next flush rather than dropping acknowledged turns.
+            self._sealed = batches + self._sealed
+            raise
+
+    def _flush_or_defer(self, key: tuple | None = None, open_turns: bool = True):
+        """_flush without waiting for the write lock: if another process holds it, the turns stay
+        buffered (reads still see them) and the group-commit thread retries them."""
+        try:
+            self._flush(key, open_turns)
+        except sqlite3.OperationalError as e:
+            if not _is_locked(e):
+                raise
+            self.deferred_commits += 1
+            self._start_flusher()
+
+    def _start_flusher(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._run_flusher, name="session-group-commit", daemon=True)
+            self._flusher.start()
+            atexit.register(self._close_at_exit)
+
+    def _drop_buffered(self, key: tuple):
+        self._open.pop(key, None)
+        self._sealed = [batch for batch in self._sealed if batch["key"] != key]
+
+    def _run_flusher(self):
+        while not self._closed.wait(self.flush_interval):
+            with self._lock:
+                if not self._sealed:
+                    continue
+                try:
+                    self._flush(open_turns=False)
+                except Exception as e:
+                    if _is_locked(e):
+                        logger.debug("Session database locked; retrying %d turns", len(self._sealed))
+                    else:
+                        logger.exception("Group commit of %d session turns failed", len(self._sealed))
+
+    def flush(self):
+        """Writes out everything buffered, including turns still in progress."""
+        with self._lock:
+            self._flush(wait=self.lock_timeout)
+
+    def _is_idle(self, last_update_time: float) -> bool:
+        return self.idle_ttl is not None and time.time() - last_update_time > self.idle_ttl
+
+    def _delete(self, app_name: str, user_id: str, session_id: str):
+        """Deletes a session's rows. Call inside a transaction."""
+        for table in ("sessions", "session_state", "events"):
+            self._db.execute(f"DELETE FROM {table} WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                             (app_name, user_id, session_id))
+
+    # --- BaseSessionService ------------------------------------------------------------
+
+    def create_session(self, *, app_name: str, user_id: str, state: Optional[dict[str, Any]] = None,
+                       session_id: Optional[str] = None) -> Session:
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._drop_buffered((app_name, user_id, session_id))
+            self._begin(self.lock_timeout)
+            try:
+                # Recreating an existing id starts it over, like InMemorySessionService does.
+                self._delete(app_name, user_id, session_id)
+                self._db.execute("INSERT INTO sessions VALUES (?, ?, ?, ?)", (app_name, user_id, session_id, now))
+                self._write_state(app_name, user_id, session_id, state or {})
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            session = Session(app_name=app_name, user_id=user_id, id=session_id,
+                              state=self._load_state(app_name, user_id, session_id), last_update_time=now)
+            if self.idle_ttl is not None and now - self._last_expiry >= self.expiry_interval:
+                try:
+                    self._expire_idle(self.idle_ttl, wait=0.0)
+                except Exception as e:
+                    if _is_locked(e):
+                        logger.debug("Session database locked; skipping the idle-session sweep")
+                    else:
+                        logger.exception("Expiring idle sessions failed")
+            return session
+
+    def get_session(self, *, app_name: str, user_id: str, session_id: str,
+                    config: Optional[GetSessionConfig] = None) -> Optional[Session]:
+        key = (app_name, user_id, session_id)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                key).fetchone()
+            if row is None:
+                return None
+            # Buffered turns aren't in the database yet; read them from the buffer on top of it.
+            buffered = [batch for batch in self._sealed if batch["key"] == key]
+            if key in self._open:
+                buffered.append(self._open[key])
+            last_update_time = max([row[0]] + [batch["updated"] for batch in buffered])
+            if self._is_idle(last_update_time):
+                self._drop_buffered(key)
+                # Best effort: if the database is busy the next sweep removes it.
+                try:
+                    self._begin(0.0)
+                except sqlite3.OperationalError as e:
+                    if not _is_locked(e):
+                        raise
+                else:
+                    try:
+                        self._delete(app_name, user_id, session_id)
+                        self._db.execute("COMMIT")
+                    except BaseException:
+                        self._db.execute("ROLLBACK")
+                        raise
+                return None
+
+            query = "SELECT data FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?"
+            params = [app_name, user_id, session_id]
+            if config and config.after_timestamp:
+                query += " AND timestamp >= ?"
+                params.append(config.after_timestamp)
+            query += " ORDER BY seq DESC"
+            if config and config.num_recent_events:
+                query += " LIMIT ?"
+                params.append(config.num_recent_events)
+            events = [Event.model_validate_json(data) for (data,) in self._db.execute(query, params)]
+            events.reverse()
+            state = self._load_state(app_name, user_id, session_id)
+            for batch in buffered:
+                events += [event for event in batch["objects"]
+                           if not (config and config.after_timestamp) or event.timestamp >= config.after_timestamp]
+                state.update((k, v) for k, v in batch["state"].items() if not k.startswith(State.TEMP_PREFIX))
+            if config and config.num_recent_events:
+                events = events[-config.num_recent_events:]
+
+            return Session(app_name=app_name, user_id=user_id, id=session_id, state=state,
+                           events=events, last_update_time=last_update_time)
+
+    def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        with self._lock:
+            self._flush(wait=self.lock_timeout)
+            rows = self._db.execute(
+                "SELECT session_id, last_update_time FROM sessions WHERE app_name = ? AND user_id = ?",
+                (app_name, user_id)).fetchall()
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=session_id, last_update_time=last_update_time)
+            for session_id, last_update_time in rows if not self._is_idle(last_update_time)])
+
+    def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._drop_buffered((app_name, user_id, session_id))
+            self._begin(self.lock_timeout)
+            try:
+                self._delete(app_name, user_id, session_id)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def list_events(self, *, app_name: str, user_id: str, session_id: str) -> ListEventsResponse:
+        session = self.get_session(app_name=app_name, user_id=user_id, session_id=session_id)
+        return ListEventsResponse(events=session.events if session else [])
+
+    def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+
+        key = (session.app_name, session.user_id, session.id)
+        with self._lock:
+            batch = self._open.get(key)
+            if batch is None:
+                batch = self._open[key] = {"key": key, "events": [], "objects": [], "state": {},
+                                                 "updated": event.timestamp}
+            batch["events"].append((event.timestamp, event.model_dump_json(exclude_none=True)))
+            batch["objects"].append(event)
+            if event.actions and event.actions.state_delta:
+                batch["state"].update(event.actions.state_delta)
+            batch["updated"] = event.timestamp
+            if self.durability == "event":
+                self._flush_or_defer(key)
+            elif event.author != "user" and event.is_final_response():
+                self._sealed.append(self._open.pop(key))
+                if self.durability == "turn":
+                    self._flush_or_defer(open_turns=False)
+                else:
+                    self._start_flusher()
+        return event
+
+    # --- state and lifecycle API ---------------------------------------------------------
+
+    def set_state(self, *, app_name: str, user_id: str, session_id: str, delta: dict[str, Any]) -> bool:
+        """Writes state keys outside of a turn. Returns False if the session doesn't exist."""
+        with get_tracer().span("state.set_state", state_keys=len(delta)):
+            with self._lock:
+                self._flush((app_name, user_id, session_id), wait=self.lock_timeout)
+                self._begin(self.lock_timeout)
+                try:
+                    updated = self._db.execute(
+                        "UPDATE sessions SET last_update_time = ? WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                        (time.time(), app_name, user_id, session_id)).rowcount
+                    if updated:
+                        self._write_state(app_name, user_id, session_id, delta)
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+        return bool(updated)
+
+    def set_temperature_unit(self, *, app_name: str, user_id: str, session_id: str, unit: str) -> bool:
+        """Sets the session's temperature unit ("Celsius", "Fahrenheit" or "Kelvin")."""
+        return self.set_units(app_name=app_name, user_id=user_id, session_id=session_id, temperature=unit)
+
+    def set_units(self, *, app_name: str, user_id: str, session_id: str, temperature=None, wind=None,
+                  locale=None) -> bool:
+        """Changes the session's unit preference; fields left as None keep their current value.
+        Args:
+            temperature: A TemperatureUnit or a name such as "Kelvin".
+            wind: A WindUnit or a symbol such as "km/h" ("none" leaves wind out of reports).
+            locale: A Locale or a name such as "de_DE".
+        """
+        session = self.get_session(app_name=app_name, user_id=user_id, session_id=session_id,
+                                   config=GetSessionConfig(num_recent_events=1))
+        if session is None:
+            return False
+        preference = UnitPreference.from_state(session.state)
+        if temperature is not None:
+            preference = preference._replace(temperature=TemperatureUnit.parse(temperature))
+        if wind is not None:
+            preference = preference._replace(wind=WindUnit.parse(wind))
+        if locale is not None:
+            preference = preference._replace(locale=Locale.parse(locale))
+        return self.set_state(app_name=app_name, user_id=user_id, session_id=session_id,
+                              delta=preference.state_delta())
+
+    def replace_events(self, *, app_name: str, user_id: str, session_id: str, events: list[Event]) -> bool:
+        """Rewrites a session's event history in one transaction, e.g. after compaction.
+        Returns False, leaving the history as it was, if another process holds the write lock."""
+        with get_tracer().span("state.replace_events", events=len(events)) as span:
+            with self._lock:
+                try:
+                    self._flush((app_name, user_id, session_id))
+                    self._begin(0.0)
+                except sqlite3.OperationalError as e:
+                    if not _is_locked(e):
+                        raise
+                    span.set(skipped="locked")
+                    return False
+                try:
+                    self._db.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?",
+                                     (app_name, user_id, session_id))
+                    self._db.executemany(
+                        "INSERT INTO events (app_name, user_id, session_id, timestamp, data) VALUES (?, ?, ?, ?, ?)",
+                        [(app_name, user_id, session_id, event.timestamp, event.model_dump_json(exclude_none=True))
+                         for event in events])
+                    self._db.execute("COMMIT")
+                except BaseException:
+                    self._db.execute("ROLLBACK")
+                    raise
+        return True
+
+    def expire_idle_sessions(self, max_idle: float | None = None) -> int:
+        """Deletes sessions idle for longer than max_idle seconds (defaults to idle_ttl). Returns how many.
+        Sessions with a turn in progress are kept."""
+        max_idle = self.idle_ttl if max_idle is None else max_idle
+        if max_idle is None:
+            return 0
+        return self._expire_idle(max_idle, self.lock_timeout)
+
+    def _expire_idle(self, max_idle: float, wait: float) -> int:
+        now = time.time()
+        with self._lock:
+            self._last_expiry = now
+            # Finished turns carry their sessions' latest update times; turns in progress stay buffered.
+            self._flush(open_turns=False, wait=wait)
+            self._begin(wait)
+            try:
+                expired = [key for key in self._db.execute(
+                    "SELECT app_name, user_id, session_id FROM sessions WHERE last_update_time < ?",
+                    (now - max_idle,)).fetchall() if key not in self._open]
+                for key in expired:
+                    self._delete(*key)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self.expired += len(expired)
+        return len(expired)
+
+    def stats(self) -> dict:
+        """Commits made and what they carried; events per commit is the write amplification saved."""
+        with self._lock:
+            pending = len(self._sealed) + len(self._open)
+        return {"durability": self.durability, "commits": self.commits, "events_written": self.events_written,
+                "batches_written": self.batches_written, "pending_turns": pending, "expired_sessions": self.expired,
+                "lock_busy": self.lock_busy, "deferred_commits": self.deferred_commits,
+                "events_per_commit": self.events_written / self.commits if self.commits else 0.0}
+
+    def _close_at_exit(self):
+        if not self._closed.is_set():
+            self.close()
+
+    def close(self):
+        """Writes out anything buffered and closes the database."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            self._flush(wait=self.lock_timeout)
+            self._db.close()
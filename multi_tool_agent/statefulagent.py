@@ -1,20 +1,38 @@
 import datetime
 import asyncio
+import contextlib
+import logging
 import os
+from functools import cached_property
+from typing import TYPE_CHECKING
 from dotenv import load_dotenv
 from zoneinfo import ZoneInfo
-from google.adk.agents import Agent
-from google.adk.sessions import InMemorySessionService
-from google.adk.runners import Runner
-from google.genai import types
-from google.adk.tools.tool_context import ToolContext
-import requests
+from .weather_provider import ProviderError, get_provider
+from .geocode_cache import get_geocode_cache
+from .weather_cache import get_weather_cache
+from .prefetch import get_prefetcher
+from .response_cache import get_response_cache, note_lookup, track_lookups
+from .router import FastPathRouter
+from .compaction import CompactionPolicy, compact_session
+from .tracing import get_tracer, trace_llm_end, trace_llm_start
+from .tool_memo import memo_after_tool, memo_before_tool
+from .units import FormattedObservation, TemperatureUnit, UnitPreference, format_report
+
+# google.adk takes seconds to import, so it is only imported once agents are actually built
+# (see WeatherApp). ADK recognises the tool_context parameter by name, not by its annotation.
+if TYPE_CHECKING:
+    from google.adk.tools.tool_context import ToolContext
 
 load_dotenv()
 WEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", ":memory:")
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "86400"))
 agent_model = "gemini-2.0-flash-exp"
 APP_NAME = "weather_tutorial_agent_team"
 
+# Tool chatter goes to the debug log instead of stdout, so it costs nothing on the hot path unless enabled.
+logger = logging.getLogger(__name__)
+
 #defining the tools:
 def say_hello(name:str="there") -> str:
     """Provides a simple greeting,optionally addressing the user by name.
@@ -23,277 +41,565 @@ def say_hello(name:str="there") -> str:
     Returns:
     str: A friendly greeting message.
     """
-    print(f"--- Tool: say_hello called with name: {name} ---")
+    logger.debug("say_hello called with name: %s", name)
     return f"Hello, {name}!"
 
 def say_goodbye() -> str:
     """Provides a simple farewell message to conclude the conversation."""
-    print(f"--- Tool: say_goodbye called ---")
+    logger.debug("say_goodbye called")
     return "Goodbye!Have a great day."
 
-def get_weather_stateful(city: str, tool_context: ToolContext) -> dict:
+def build_report(city: str, condition: str, temp_c: float, preferred_unit, age_s: float | None = None,
+                 wind_ms: float | None = None) -> str:
+    """Formats a weather report in the preferred units: a UnitPreference, or a temperature unit name
+    such as "Fahrenheit". Wind is included when both wind_ms and a wind unit are given.
+
+    age_s is set for a stale observation served while OpenWeather is unavailable; the report says so.
+    """
+    if not isinstance(preferred_unit, UnitPreference):
+        preferred_unit = UnitPreference(TemperatureUnit.parse(preferred_unit))
+    report = format_report(city, {"condition": condition, "temp_c": temp_c, "wind_ms": wind_ms}, preferred_unit)
+    if age_s is not None:
+        report += f" (Last observed {max(1, round(age_s / 60))} min ago; live data is temporarily unavailable.)"
+    return report
+
+def observation_report(city: str, observation: dict, preference: UnitPreference) -> str:
+    """The report for an observation; observations from the weather cache return their ready-made text."""
+    if isinstance(observation, FormattedObservation):
+        return observation.report(city, preference)
+    return build_report(city, observation["condition"], observation["temp_c"], preference,
+                        observation.get("age_s") if observation.get("stale") else None, observation.get("wind_ms"))
+
+def get_weather_stateful(city: str, tool_context: "ToolContext") -> dict:
     """Retrieves weather, converts temp unit based on session state."""
-    print(f"--- Tool: get_weather_stateful called for {city} ---")
+    logger.debug("get_weather_stateful called for %s", city)
 
     
-    preferred_unit = tool_context.state.get("user_preference_temperature_unit", "Celsius") 
-    print(f"--- Tool: Reading state 'user_preference_temperature_unit': {preferred_unit} ---")
-
-    city_normalized = city.lower().replace(" ", "")
-
-    #--------------------------------------------------------
-    lat = 0
-    lon = 0
-    url = "http://api.openweathermap.org/geo/1.0/direct"
-    params = {
-        "q": city,
-        "limit": 2,
-        "appid": WEATHER_API_KEY
-    }
+    preference = UnitPreference.from_state(tool_context.state)
+    logger.debug("Reading unit preference from state: %s", preference)
+
+    error_msg = f"Sorry, I don't have weather information for '{city}'."
+
+    provider = get_provider()
+    geocode_cache = get_geocode_cache()
+    coords = geocode_cache.get(city)
+    if coords is None:
+        try:
+            coords = provider.geocode_blocking(city)
+        except ProviderError as e:
+            logger.debug("Geocoding '%s' failed: %s", city, e)
+            return {"status": "error", "error_message": error_msg}
+        if coords is None:
+            # An empty result used to fall through and fetch the weather at lat=0, lon=0.
+            logger.debug("City '%s' not found.", city)
+            return {"status": "error", "error_message": error_msg}
+        geocode_cache.put(city, coords)
+    get_prefetcher().record(city, coords)
+
+    weather_cache = get_weather_cache()
+    observation = weather_cache.get(*coords)
+    if observation is None:
+        try:
+            observation = provider.current_weather_blocking(*coords)
+        except ProviderError as e:
+            logger.debug("Weather lookup for '%s' failed: %s", city, e)
+            observation = weather_cache.get_stale(*coords)
+            if observation is None:
+                return {"status": "error", "error_message": error_msg}
+        else:
+            observation = weather_cache.put(*coords, observation)
+    note_lookup(city, coords)
+
+    report = observation_report(city, observation, preference)
+    result = {"status": "success", "report": report}
+    logger.debug("Generated report in %s. Result: %s", preference, result)
+
+    tool_context.state["last_city_checked_stateful"] = city
+    logger.debug("Updated state 'last_city_checked_stateful': %s", city)
+
+    return result
+
+
+async def fetch_observation(city: str) -> dict | None:
+    """Resolves a city to its current observation through the geocode and weather caches.
+    Returns:
+        dict: {"condition": str, "temp_c": float}, or None if the weather provider doesn't know the city.
+        Raises ProviderError if the provider can't answer.
+    """
+    tracer = get_tracer()
+    with tracer.span("weather.lookup", city=city) as span:
+        provider = get_provider()
+        geocode_cache = get_geocode_cache()
+        with tracer.span("cache.geocode") as cache_span:
+            coords = geocode_cache.get(city)
+            cache_span.set(outcome="miss" if coords is None else "hit")
+        if coords is None:
+            coords = await provider.geocode(city)
+            if coords is None:
+                span.set(found=False)
+                return None
+            geocode_cache.put(city, coords)
+        get_prefetcher().record(city, coords)
+        with tracer.span("cache.weather"):
+            observation = await get_weather_cache().get_or_fetch(*coords, provider.current_weather,
+                                                                 stale_on=(ProviderError,))
+        note_lookup(city, coords)
+        return observation
+
+async def get_weather_stateful_async(city: str, tool_context: "ToolContext") -> dict:
+    """Retrieves weather without blocking the event loop, converts temp unit based on session state.
+
+    Uses the shared pooled OpenWeather client, so lookups from many sessions overlap
+    instead of queueing behind each other.
+    """
+    logger.debug("get_weather_stateful_async called for %s", city)
 
-    response = requests.get(url, params=params)
+    preference = UnitPreference.from_state(tool_context.state)
+    error_msg = f"Sorry, I don't have weather information for '{city}'."
 
-    if response.status_code == 200:
-        data = response.json()
-        if data:
-            lat = data[0]['lat']
-            lon = data[0]['lon']
-    else:
-        error_msg = f"Sorry, I don't have weather information for '{city}'."
-        print(f"--- Tool: City '{city}' not found. ---")
+    try:
+        observation = await fetch_observation(city)
+    except ProviderError as e:
+        logger.debug("Weather lookup for '%s' failed: %s", city, e)
         return {"status": "error", "error_message": error_msg}
-    
-
-
-
-    weather_url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "appid": WEATHER_API_KEY,
-        "units": "metric" 
-
-    }
-
-    response = requests.get(weather_url, params=params)
-    if response.status_code == 200:
-        data = response.json()
-        weather = data['weather'][0]['description']
-        temp = data['main']['temp']
-    else:
-        error_msg = f"Sorry, I don't have weather information for '{city}'."
-        print(f"--- Tool: City '{city}' not found. ---")
+    if observation is None:
+        logger.debug("City '%s' not found.", city)
         return {"status": "error", "error_message": error_msg}
 
-    #--------------------------------------------------------
-    
-
-    
-    
-
-    if temp:
-        temp_c = temp
-        condition = weather
+    report = observation_report(city, observation, preference)
+    result = {"status": "success", "report": report}
+    logger.debug("Generated report in %s. Result: %s", preference, result)
 
-        
-        if preferred_unit == "Fahrenheit":
-            temp_value = (temp_c * 9/5) + 32 
-            temp_unit = "°F"
-        else: 
-            temp_value = temp_c
-            temp_unit = "°C"
+    tool_context.state["last_city_checked_stateful"] = city
+    return result
 
-        report = f"The weather in {city.capitalize()} is {condition} with a temperature of {temp_value:.0f}{temp_unit}."
-        result = {"status": "success", "report": report}
-        print(f"--- Tool: Generated report in {preferred_unit}. Result: {result} ---")
 
-        
-        tool_context.state["last_city_checked_stateful"] = city
-        print(f"--- Tool: Updated state 'last_city_checked_stateful': {city} ---")
+async def get_weather_many(cities: list[str], tool_context: "ToolContext") -> dict:
+    """Retrieves the weather for several cities at once, converting temp units based on session state.
 
-        return result
-    else:
-        error_msg = f"Sorry, I don't have weather information for '{city}'."
-        print(f"--- Tool: City '{city}' not found. ---")
-        return {"status": "error", "error_message": error_msg}
-
-print("✅ State-aware 'get_weather_stateful' tool defined.")
-
-#creating stateful session and memory
-session_service_stateful = InMemorySessionService()
-print("✅ New InMemorySessionService created for state demonstration.")
+    Args:
+        cities (list[str]): The city names (e.g., ["London", "Paris", "Tokyo"]).
 
-SESSION_ID_STATEFUL = "session_state_demo_001"
-USER_ID_STATEFUL = "user_state_demo"
+    Returns:
+        dict: Includes a 'status' key ('success' if at least one city was found, else 'error').
+              'report' holds one combined report, 'reports' maps each found city to its report
+              and 'errors' lists the cities that could not be looked up.
+    """
+    logger.debug("get_weather_many called for %s", cities)
+
+    preference = UnitPreference.from_state(tool_context.state)
+    # All cities are geocoded and fetched concurrently; repeats share the in-flight requests.
+    observations = await asyncio.gather(*(fetch_observation(city) for city in cities), return_exceptions=True)
+
+    reports = {}
+    errors = []
+    for city, observation in zip(cities, observations):
+        if isinstance(observation, ProviderError):
+            logger.debug("Weather lookup for '%s' failed: %s", city, observation)
+            errors.append(city)
+        elif isinstance(observation, BaseException):
+            raise observation
+        elif observation is None:
+            errors.append(city)
+        else:
+            reports[city] = observation_report(city, observation, preference)
+
+    if not reports:
+        return {"status": "error",
+                "error_message": f"Sorry, I don't have weather information for {', '.join(cities)}."}
+
+    report = " ".join(reports.values())
+    if errors:
+        report += f" Sorry, I don't have weather information for {', '.join(errors)}."
+    tool_context.state["last_city_checked_stateful"] = list(reports)[-1]
+    return {"status": "success", "report": report, "reports": reports, "errors": errors}
+
+
+#creating the agents, session service and runner (lazily, on first use)
+class WeatherApp:
+    """Builds the stateful agent team, its session service and runner the first time they're used.
+
+    Importing this module doesn't create anything; get_app() returns a shared instance, and
+    tests/benchmarks can build their own with a different model or session service.
+    Args:
+        model (str or BaseLlm, optional): Model for all three agents. Defaults to agent_model.
+        session_service (BaseSessionService, optional): Defaults to a SqliteSessionService on SESSION_DB_PATH.
+        verbose (bool): Print a line as each piece is created.
+    """
 
-initial_state = {
-    "user_preference_temperature_unit": "Celsius"
+    def __init__(self, model=None, session_service=None, verbose: bool = False):
+        self.model = model or agent_model
+        self._session_service = session_service
+        self.verbose = verbose
+
+    def _log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    @cached_property
+    def session_service(self):
+        if self._session_service is None:
+            from .sqlite_session_service import SqliteSessionService
+            self._session_service = SqliteSessionService(SESSION_DB_PATH, idle_ttl=SESSION_IDLE_TTL)
+            self._log(f"✅ New SqliteSessionService created (db: {SESSION_DB_PATH}).")
+        return self._session_service
+
+    @cached_property
+    def greeting_agent(self):
+        from google.adk.agents import Agent
+        agent = Agent(
+            model=self.model,
+            name="greeting_agent",
+            instruction="You are the Greeting Agent. Your ONLY task is to provide a friendly greeting using the 'say_hello' tool. Do nothing else.",
+            description="Handles simple greetings and hellos using the 'say_hello' tool.",
+            tools=[say_hello],
+            before_model_callback=trace_llm_start,
+            after_model_callback=trace_llm_end,
+            before_tool_callback=memo_before_tool,
+            after_tool_callback=memo_after_tool,
+        )
+        self._log(f"✅ Agent '{agent.name}' created.")
+        return agent
+
+    @cached_property
+    def farewell_agent(self):
+        from google.adk.agents import Agent
+        agent = Agent(
+            model=self.model,
+            name="farewell_agent",
+            instruction="You are the Farewell Agent. Your ONLY task is to provide a polite goodbye message using the 'say_goodbye' tool. Do not perform any other actions.",
+            description="Handles simple farewells and goodbyes using the 'say_goodbye' tool.",
+            tools=[say_goodbye],
+            before_model_callback=trace_llm_start,
+            after_model_callback=trace_llm_end,
+            before_tool_callback=memo_before_tool,
+            after_tool_callback=memo_after_tool,
+        )
+        self._log(f"✅ Agent '{agent.name}' created.")
+        return agent
+
+    @cached_property
+    def root_agent(self):
+        from google.adk.agents import Agent
+        agent = Agent(
+            name="weather_agent_v4_stateful",
+            model=self.model,
+            description="Main agent: Provides weather (state-aware unit), delegates greetings/farewells, saves report to state.",
+            instruction="You are the main Weather Agent. Your job is to provide weather using 'get_weather_stateful_async'. "
+                        "When the user asks about more than one city, call 'get_weather_many' once with all of them instead. "
+                        "The tool will format the temperature (and wind) based on the unit preference stored in state. "
+                        "Delegate simple greetings to 'greeting_agent' and farewells to 'farewell_agent'. "
+                        "Handle only weather requests, greetings, and farewells.",
+            tools=[get_weather_stateful_async, get_weather_many],
+            sub_agents=[self.greeting_agent, self.farewell_agent],
+            output_key="last_weather_report",
+            before_model_callback=trace_llm_start,
+            after_model_callback=trace_llm_end,
+            before_tool_callback=memo_before_tool,
+            after_tool_callback=memo_after_tool,
+        )
+        self._log(f"✅ Root Agent '{agent.name}' created using stateful tool and output_key.")
+        return agent
+
+    @cached_property
+    def runner(self):
+        from google.adk.runners import Runner
+        runner = Runner(
+            agent=self.root_agent,
+            app_name=APP_NAME,
+            session_service=self.session_service
+        )
+        self._log(f"✅ Runner created for stateful root agent '{runner.agent.name}'.")
+        return runner
+
+
+_app = None
+
+
+def get_app() -> WeatherApp:
+    """Returns the process-wide WeatherApp, creating it (but none of its parts) on first use."""
+    global _app
+    if _app is None:
+        _app = WeatherApp()
+    return _app
+
+
+# Old module-level names, now built on first access.
+_LAZY_ATTRIBUTES = {
+    "session_service_stateful": "session_service",
+    "greeting_agent": "greeting_agent",
+    "farewell_agent": "farewell_agent",
+    "root_agent_stateful": "root_agent",
+    "runner_root_stateful": "runner",
 }
-session_stateful = session_service_stateful.create_session(
-    app_name=APP_NAME, 
-    user_id=USER_ID_STATEFUL,
-    session_id=SESSION_ID_STATEFUL,
-    state=initial_state 
-)
-
-print(f"✅ Session '{SESSION_ID_STATEFUL}' created for user '{USER_ID_STATEFUL}'.")
-
-retrieved_session = session_service_stateful.get_session(app_name=APP_NAME,
-                                                         user_id=USER_ID_STATEFUL,
-                                                         session_id = SESSION_ID_STATEFUL)
-print("\n--- Initial Session State ---")
-if retrieved_session:
-    print(retrieved_session.state)
-else:
-    print("Error: Could not retrieve session.")
-
-
-#defining agents
-greeting_agent = None
-try:
-    greeting_agent = Agent(
-        model=agent_model,
-        name="greeting_agent",
-        instruction="You are the Greeting Agent. Your ONLY task is to provide a friendly greeting using the 'say_hello' tool. Do nothing else.",
-        description="Handles simple greetings and hellos using the 'say_hello' tool.",
-        tools=[say_hello],
-    )
-    print(f"✅ Agent '{greeting_agent.name}' redefined.")
-except Exception as e:
-    print(f"❌ Could not redefine Greeting agent. Error: {e}")
-
-
-farewell_agent = None
-try:
-    farewell_agent = Agent(
-        model=agent_model,
-        name="farewell_agent",
-        instruction="You are the Farewell Agent. Your ONLY task is to provide a polite goodbye message using the 'say_goodbye' tool. Do not perform any other actions.",
-        description="Handles simple farewells and goodbyes using the 'say_goodbye' tool.",
-        tools=[say_goodbye],
-    )
-    print(f"✅ Agent '{farewell_agent.name}' redefined.")
-except Exception as e:
-    print(f"❌ Could not redefine Farewell agent. Error: {e}")
 
 
-root_agent_stateful = None
-runner_root_stateful = None 
-
-
-if greeting_agent and farewell_agent and 'get_weather_stateful' in globals():
-
-    root_agent_model = agent_model
-
-    root_agent_stateful = Agent(
-        name="weather_agent_v4_stateful", 
-        model=root_agent_model,
-        description="Main agent: Provides weather (state-aware unit), delegates greetings/farewells, saves report to state.",
-        instruction="You are the main Weather Agent. Your job is to provide weather using 'get_weather_stateful'. "
-                    "The tool will format the temperature based on user preference stored in state. "
-                    "Delegate simple greetings to 'greeting_agent' and farewells to 'farewell_agent'. "
-                    "Handle only weather requests, greetings, and farewells.",
-        tools=[get_weather_stateful], 
-        sub_agents=[greeting_agent, farewell_agent], 
-        output_key="last_weather_report" 
-    )
-    print(f"✅ Root Agent '{root_agent_stateful.name}' created using stateful tool and output_key.")
-
-    runner_root_stateful = Runner(
-        agent=root_agent_stateful,
-        app_name=APP_NAME,
-        session_service=session_service_stateful 
-    )
-    print(f"✅ Runner created for stateful root agent '{runner_root_stateful.agent.name}' using stateful session service.")
-
-else:
-    print("❌ Cannot create stateful root agent. Prerequisites missing.")
-    if not greeting_agent: print(" - greeting_agent definition missing.")
-    if not farewell_agent: print(" - farewell_agent definition missing.")
-    if 'get_weather_stateful' not in globals(): print(" - get_weather_stateful tool missing.")
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(get_app(), _LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+#fast path: trivial greetings/farewells are answered without calling the LLM (FAST_PATH_ROUTER=0 disables it)
+fast_path_router = FastPathRouter(greeting=say_hello, farewell=say_goodbye)
+
+
+def record_local_turn(runner, user_Id, session_Id, query: str, reply: str, state_delta: dict | None = None):
+    """Appends the user's message and a locally produced reply (fast path or response cache) to the
+    session, like a normal turn would, applying state_delta with the reply."""
+    from google.adk.events import Event, EventActions
+    from google.genai import types
+    session = runner.session_service.get_session(app_name=runner.app_name, user_id=user_Id, session_id=session_Id)
+    invocation_id = f"e-{Event.new_id()}"
+    runner.session_service.append_event(session, Event(
+        invocation_id=invocation_id, author="user",
+        content=types.Content(role="user", parts=[types.Part(text=query)])))
+    # Authored by the root agent rather than a sub-agent, so the next turn still starts at the root.
+    runner.session_service.append_event(session, Event(
+        invocation_id=invocation_id, author=runner.agent.name,
+        content=types.Content(role="model", parts=[types.Part(text=reply)]),
+        actions=EventActions(state_delta=state_delta or {})))
+
+
+#history compaction: older turns are folded into a summary (HISTORY_KEEP_TURNS=0 disables it)
+compaction_policy = CompactionPolicy.from_env()
+
+
+def maybe_compact_history(runner, user_Id, session_Id):
+    """Applies compaction_policy to the session after a turn; the size change goes on its span and the log."""
+    if compaction_policy is None or not hasattr(runner.session_service, "replace_events"):
+        return None
+    session = runner.session_service.get_session(app_name=runner.app_name, user_id=user_Id, session_id=session_Id)
+    with get_tracer().span("session.compact") as span:
+        report = compact_session(runner.session_service, session, compaction_policy, author=runner.agent.name)
+        span.set(compacted=bool(report))
+        if report:
+            before, after = report["before"], report["after"]
+            span.set(events_before=before["events"], events_after=after["events"],
+                     bytes_before=before["bytes"], bytes_after=after["bytes"])
+            logger.info("Compacted session history: %d -> %d events, %d -> %d bytes, ~%d -> ~%d tokens",
+                        before["events"], after["events"], before["bytes"], after["bytes"],
+                        before["tokens"], after["tokens"])
+    return report
+
+
+def current_unit_preference(runner, user_Id, session_Id) -> UnitPreference:
+    """The session's unit preference, read without loading its history."""
+    from google.adk.sessions.base_session_service import GetSessionConfig
+    session = runner.session_service.get_session(app_name=runner.app_name, user_id=user_Id, session_id=session_Id,
+                                                 config=GetSessionConfig(num_recent_events=1))
+    return UnitPreference.from_state(session.state) if session else UnitPreference()
+
+
+def describe_tool_call(name: str, args: dict) -> str:
+    """A short progress line for a tool call, shown while the tool runs."""
+    if name == "get_weather_stateful_async":
+        return f"Looking up {args.get('city')}..."
+    if name == "get_weather_many":
+        return f"Looking up {', '.join(args.get('cities') or [])}..."
+    if name == "transfer_to_agent":
+        return f"Handing over to {args.get('agent_name')}..."
+    return f"Calling {name}..."
+
+
+async def stream_agent_async(query:str,runner,user_Id,session_Id,streaming:bool=True):
+    """Runs one turn and yields its progress as it happens, instead of only the final answer.
+
+    Each turn is a root trace span (sampled at TRACE_SAMPLE_RATE); LLM calls, delegation, tool
+    lookups, HTTP requests, cache lookups and state writes made during the turn nest under it.
+    Args:
+        streaming (bool): Ask the model for partial text (ADK's SSE streaming mode).
+    Yields:
+        dict: {"type": "tool_call", "tool", "args", "message"} when an agent calls a tool or hands over,
+              {"type": "tool_result", "tool", "status"} when a tool returns,
+              {"type": "text", "author", "text"} for each chunk of partial model text (streaming only),
+              {"type": "final", "author", "text", "fast_path", "cached"} last, with the turn's full response.
+              A repeated weather question may be answered from the response cache (cached=True)
+              without running the agents; see response_cache.py.
+    """
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from google.genai import types
+
+    tracer = get_tracer()
+    with tracer.span("turn", root=True, user=user_Id, session=session_Id, streaming=streaming) as turn_span:
+        fast_path = fast_path_router.try_answer(query)
+        turn_span.set(fast_path=bool(fast_path))
+        if fast_path:
+            intent, final_response_text = fast_path
+            record_local_turn(runner, user_Id, session_Id, query, final_response_text)
+            maybe_compact_history(runner, user_Id, session_Id)
+            yield {"type": "final", "author": runner.agent.name, "text": final_response_text, "fast_path": intent,
+                   "cached": False}
+            return
+
+        response_cache = get_response_cache()
+        unit = None
+        if response_cache.enabled:
+            unit = current_unit_preference(runner, user_Id, session_Id).code
+            cached = response_cache.get(query, unit)
+            turn_span.set(response_cache="miss" if cached is None else "hit")
+            if cached is not None:
+                record_local_turn(runner, user_Id, session_Id, query, cached["text"], cached["state_delta"])
+                maybe_compact_history(runner, user_Id, session_Id)
+                yield {"type": "final", "author": cached["author"], "text": cached["text"], "fast_path": None,
+                       "cached": True}
+                return
+
+        content = types.Content(role='user',parts=[types.Part(text=query)])
+        run_config = RunConfig(streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE)
+
+        final = {"type": "final", "author": runner.agent.name,
+                 "text": "Agent did not produce a final response.", "fast_path": None, "cached": False}
+        delegation = None
+        tools, state_delta, answered = [], {}, False
+
+        # The run is read to its end, and aclosing shuts it down on an early exit, so ADK's generators
+        # (and the OpenTelemetry spans they hold) always finish in the turn's context rather than being
+        # finalised later from another one.
+        finished = False
+        with track_lookups() as lookups:
+            async with contextlib.aclosing(runner.run_async(user_id=user_Id, session_id=session_Id,
+                                                            new_message=content, run_config=run_config)) as events:
+                async for event in events:
+                    if finished:
+                        continue
+                    # print(f"  [Event] Author: {event.author}, Type: {type(event).__name__}, Final: {event.is_final_response()}, Content: {event.content}")
+                    if event.partial:
+                        for part in (event.content.parts if event.content and event.content.parts else []):
+                            if part.text:
+                                yield {"type": "text", "author": event.author, "text": part.text}
+                        continue
+                    for call in event.get_function_calls():
+                        args = call.args or {}
+                        tools.append(call.name)
+                        yield {"type": "tool_call", "tool": call.name, "args": args,
+                               "message": describe_tool_call(call.name, args)}
+                    for response in event.get_function_responses():
+                        status = (response.response or {}).get("status")
+                        if status != "success":
+                            # A failed lookup keeps the turn out of the cache.
+                            tools.append(f"{response.name}:{status}")
+                        yield {"type": "tool_result", "tool": response.name, "status": status}
+                    if event.actions:
+                        state_delta.update(event.actions.state_delta)
+                    if event.actions and event.actions.transfer_to_agent and delegation is None:
+                        # Covers the sub-agent's share of the turn, from the transfer to its final response.
+                        delegation = tracer.start_span("agent.delegate", agent=event.actions.transfer_to_agent)
+                    if event.is_final_response():
+                        final["author"] = event.author
+                        if event.content and event.content.parts:
+                            final["text"] = event.content.parts[0].text
+                            answered = bool(final["text"])
+                        elif event.actions and event.actions.escalate:
+                            final["text"] = f"Agent escalated: {event.error_message or 'No specific message.'}"
+                        turn_span.set(final_agent=event.author)
+                        finished = True
+        if delegation is not None:
+            tracer.end_span(delegation)
+        if response_cache.enabled and answered and final["author"] == runner.agent.name:
+            response_cache.put(query, unit, final["text"], final["author"], lookups, tools, state_delta)
+        maybe_compact_history(runner, user_Id, session_Id)
+        yield final
 
 
 async def call_agent_async(query:str,runner,user_Id,session_Id):
     """Sends a query to the agent and prints the final response."""
     print(f"\n>>>User Query: {query}")
+    async for update in stream_agent_async(query, runner, user_Id, session_Id, streaming=False):
+        if update["type"] == "final":
+            if update["fast_path"]:
+                print(f"<<< Agent Response (fast path, {update['fast_path']}): {update['text']}")
+            elif update["cached"]:
+                print(f"<<< Agent Response (cached): {update['text']}")
+            else:
+                print(f"<<< Agent Response: {update['text']}")  
 
-    content = types.Content(role='user',parts=[types.Part(text=query)])
 
-    final_response_text = "Agent did not produce a final response."
 
-    async for event in runner.run_async(user_id=user_Id,session_id=session_Id,new_message=content):
-        # print(f"  [Event] Author: {event.author}, Type: {type(event).__name__}, Final: {event.is_final_response()}, Content: {event.content}")
-        if event.is_final_response():
-            if event.content and event.content.parts:
-                final_response_text = event.content.parts[0].text
-            elif event.actions and event.actions.escalate:
-                final_response_text = f"Agent escalated: {event.error_message or 'No specific message.'}"
-            break
-    print(f"<<< Agent Response: {final_response_text}")  
 
 
 
+SESSION_ID_STATEFUL = "session_state_demo_001"
+USER_ID_STATEFUL = "user_state_demo"
 
 
+async def run_stateful_conversation(app: WeatherApp):
+    runner = app.runner
+    session_service = app.session_service
 
-if 'runner_root_stateful' in globals() and runner_root_stateful:
-  async def run_stateful_conversation():
-      print("\n--- Testing State: Temp Unit Conversion & output_key ---")
+    initial_state = {
+        "user_preference_temperature_unit": "Celsius"
+    }
+    # With a SESSION_DB_PATH file the session survives restarts, so only create it the first time.
+    session = session_service.get_session(
+        app_name=APP_NAME,
+        user_id=USER_ID_STATEFUL,
+        session_id=SESSION_ID_STATEFUL
+    ) or session_service.create_session(
+        app_name=APP_NAME,
+        user_id=USER_ID_STATEFUL,
+        session_id=SESSION_ID_STATEFUL,
+        state=initial_state
+    )
+    print(f"✅ Session '{SESSION_ID_STATEFUL}' ready for user '{USER_ID_STATEFUL}'.")
+    print("\n--- Initial Session State ---")
+    print(session.state)
 
+    print("\n--- Testing State: Temp Unit Conversion & output_key ---")
 
-      print("--- Turn 1: Requesting weather in London (expect Celsius) ---")
-      await call_agent_async(query= "What's the weather in London?",
-                             runner=runner_root_stateful,
-                             user_Id=USER_ID_STATEFUL,
-                             session_Id=SESSION_ID_STATEFUL
-                            )
 
+    print("--- Turn 1: Requesting weather in London (expect Celsius) ---")
+    await call_agent_async(query= "What's the weather in London?",
+                           runner=runner,
+                           user_Id=USER_ID_STATEFUL,
+                           session_Id=SESSION_ID_STATEFUL
+                          )
 
-      print("\n--- Manually Updating State: Setting unit to Fahrenheit ---")
-      try:
-          
-          stored_session = session_service_stateful.sessions[APP_NAME][USER_ID_STATEFUL][SESSION_ID_STATEFUL]
-          stored_session.state["user_preference_temperature_unit"] = "Fahrenheit"
-          print(f"--- Stored session state updated. Current 'user_preference_temperature_unit': {stored_session.state['user_preference_temperature_unit']} ---")
-      except KeyError:
-          print(f"--- Error: Could not retrieve session '{SESSION_ID_STATEFUL}' from internal storage for user '{USER_ID_STATEFUL}' in app '{APP_NAME}' to update state. Check IDs and if session was created. ---")
-      except Exception as e:
-           print(f"--- Error updating internal session state: {e} ---")
+
+    print("\n--- Manually Updating State: Setting unit to Fahrenheit ---")
+    if session_service.set_temperature_unit(app_name=APP_NAME,
+                                            user_id=USER_ID_STATEFUL,
+                                            session_id=SESSION_ID_STATEFUL,
+                                            unit="Fahrenheit"):
+        print("--- Stored session state updated. Current 'user_preference_temperature_unit': Fahrenheit ---")
+    else:
+        print(f"--- Error: Could not find session '{SESSION_ID_STATEFUL}' for user '{USER_ID_STATEFUL}' in app '{APP_NAME}' to update state. Check IDs and if session was created. ---")
 
 
-      print("\n--- Turn 2: Requesting weather in New York (expect Fahrenheit) ---")
-      await call_agent_async(query= "Tell me the weather in New York.",
-                             runner=runner_root_stateful,
-                             user_Id=USER_ID_STATEFUL,
-                             session_Id=SESSION_ID_STATEFUL
-                            )
+    print("\n--- Turn 2: Requesting weather in New York (expect Fahrenheit) ---")
+    await call_agent_async(query= "Tell me the weather in New York.",
+                           runner=runner,
+                           user_Id=USER_ID_STATEFUL,
+                           session_Id=SESSION_ID_STATEFUL
+                          )
 
 
-      print("\n--- Turn 3: Sending a greeting ---")
-      await call_agent_async(query= "Hi!",
-                             runner=runner_root_stateful,
-                             user_Id=USER_ID_STATEFUL,
-                             session_Id=SESSION_ID_STATEFUL
-                            )
+    print("\n--- Turn 3: Sending a greeting ---")
+    await call_agent_async(query= "Hi!",
+                           runner=runner,
+                           user_Id=USER_ID_STATEFUL,
+                           session_Id=SESSION_ID_STATEFUL
+                          )
 
- 
-  asyncio.run(run_stateful_conversation())
- 
 
- 
-  print("\n--- Inspecting Final Session State ---")
-  final_session = session_service_stateful.get_session(app_name=APP_NAME,
-                                                       user_id= USER_ID_STATEFUL,
-                                                       session_id=SESSION_ID_STATEFUL)
-  if final_session:
-      print(f"Final Preference: {final_session.state.get('user_preference_temperature_unit')}")
-      print(f"Final Last Weather Report (from output_key): {final_session.state.get('last_weather_report')}")
-      print(f"Final Last City Checked (by tool): {final_session.state.get('last_city_checked_stateful')}")
+def main():
+    """Runs the state demo conversation: python -m multi_tool_agent.statefulagent"""
+    global _app
+    _app = WeatherApp(verbose=True)
+    asyncio.run(run_stateful_conversation(_app))
 
-  else:
-      print("\n❌ Error: Could not retrieve final session state.")
+    print("\n--- Inspecting Final Session State ---")
+    final_session = _app.session_service.get_session(app_name=APP_NAME,
+                                                     user_id= USER_ID_STATEFUL,
+                                                     session_id=SESSION_ID_STATEFUL)
+    if final_session:
+        print(f"Final Preference: {final_session.state.get('user_preference_temperature_unit')}")
+        print(f"Final Last Weather Report (from output_key): {final_session.state.get('last_weather_report')}")
+        print(f"Final Last City Checked (by tool): {final_session.state.get('last_city_checked_stateful')}")
 
-else:
-  print("\n⚠️ Skipping state test conversation. Stateful root agent runner ('runner_root_stateful') is not available.")
+    else:
+        print("\n❌ Error: Could not retrieve final session state.")
 
 
+if __name__ == "__main__":
+    main()
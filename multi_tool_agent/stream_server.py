@@ -0,0 +1,177 @@
+"""Local HTTP endpoint that streams agent turns as Server-Sent Events.
+
+    python -m multi_tool_agent.stream_server --port 8080
+
+    curl -N "http://127.0.0.1:8080/chat?user_id=u1&session_id=s1&q=What's+the+weather+in+London%3F"
+    curl -N -d '{"user_id": "u1", "session_id": "s1", "query": "Hi!"}' http://127.0.0.1:8080/chat
+
+Every item from stream_agent_async becomes one SSE message (`event: <type>`, `data: <json>`), so a
+chat front end can show "Looking up London..." and partial text while the turn is still running.
+A turn that fails after the stream has started ends with an `event: error` message.
+GET works with a browser EventSource; POST takes a JSON body. The session is created on first use.
+"""
+import argparse
+import asyncio
+import contextlib
+import http
+import json
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+from .statefulagent import APP_NAME, get_app, stream_agent_async
+
+logger = logging.getLogger(__name__)
+
+
+class StreamServer:
+    """Serves POST/GET /chat as an SSE stream and GET /health, on top of a runner.
+    Args:
+        runner (Runner, optional): Defaults to the shared WeatherApp's runner.
+        streaming (bool): Ask the model for partial text, see stream_agent_async.
+    """
+
+    def __init__(self, runner=None, streaming: bool = True):
+        self._runner = runner
+        self.streaming = streaming
+        self.server = None
+
+    @property
+    def runner(self):
+        if self._runner is None:
+            self._runner = get_app().runner
+        return self._runner
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def ensure_session(self, user_id: str, session_id: str | None):
+        service = self.runner.session_service
+        session = None
+        if session_id:
+            session = service.get_session(app_name=self.runner.app_name, user_id=user_id, session_id=session_id)
+        if session is None:
+            session = service.create_session(app_name=self.runner.app_name, user_id=user_id,
+                                             session_id=session_id or None)
+        return session
+
+    @staticmethod
+    async def read_request(reader: asyncio.StreamReader):
+        """(method, url, body), or None if the client closed without a request.
+        Raises ValueError on a malformed request line or Content-Length."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        headers = {}
+        while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise ValueError(f"malformed request line: {request_line!r}")
+        method, target, _ = parts
+        length = headers.get("content-length", "0")
+        if not length.isdigit():
+            raise ValueError(f"invalid Content-Length: {length!r}")
+        length = int(length)
+        body = await reader.readexactly(length) if length else b""
+        return method, urlsplit(target), body
+
+    @staticmethod
+    def parse_chat(method: str, url, body: bytes) -> dict | None:
+        """The chat request from a JSON body (POST) or query string (GET), or None if it has no query."""
+        if method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return None
+        else:
+            payload = {k: v[0] for k, v in parse_qs(url.query).items()}
+            payload.setdefault("query", payload.pop("q", None))
+        if not isinstance(payload, dict) or not payload.get("query"):
+            return None
+        return payload
+
+    @staticmethod
+    def reply(writer: asyncio.StreamWriter, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        writer.write(f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+
+    async def chat(self, writer: asyncio.StreamWriter, request: dict):
+        user_id = request.get("user_id") or "anonymous"
+        session = self.ensure_session(user_id, request.get("session_id"))
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        writer.write(f"event: session\ndata: {json.dumps({'user_id': user_id, 'session_id': session.id})}\n\n".encode())
+        await writer.drain()
+        # aclosing keeps the turn's cleanup (and its trace span) in this task if the client goes away.
+        try:
+            async with contextlib.aclosing(stream_agent_async(request["query"], self.runner, user_id, session.id,
+                                                              streaming=self.streaming)) as updates:
+                async for update in updates:
+                    writer.write(f"event: {update['type']}\ndata: {json.dumps(update)}\n\n".encode())
+                    await writer.drain()
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # The 200 is already sent; tell the client the turn failed rather than just ending the stream.
+            logger.exception("Turn failed for session %s", session.id)
+            writer.write(f"event: error\ndata: {json.dumps({'type': 'error', 'error': str(e)})}\n\n".encode())
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                request = await self.read_request(reader)
+            except ValueError as e:
+                self.reply(writer, 400, {"error": str(e)})
+                await writer.drain()
+                return
+            if request is None:
+                return
+            method, url, body = request
+            if url.path == "/health":
+                self.reply(writer, 200, {"status": "ok", "app": APP_NAME})
+            elif url.path != "/chat":
+                self.reply(writer, 404, {"error": "not found"})
+            else:
+                payload = self.parse_chat(method, url, body)
+                if payload is None:
+                    self.reply(writer, 400, {"error": "expected a query (GET ?q=... or POST {\"query\": ...})"})
+                else:
+                    await self.chat(writer, payload)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def _serve(host: str, port: int):
+    server = await StreamServer().start(host, port)
+    print(f"Streaming weather agent listening on http://{host}:{server.port}/chat")
+    await server.server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import json
+import os
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Set TOOL_MEMO=0 to run every tool call, even exact repeats within a turn.
+TOOL_MEMO_ENABLED = os.getenv("TOOL_MEMO", "1").lower() not in ("0", "false", "no", "off")
+# Seconds a result may also be reused by later turns of the same session (0: only within the turn).
+TOOL_MEMO_WINDOW = float(os.getenv("TOOL_MEMO_WINDOW", "0"))
+
+# Tools that may be memoized, and the session state each one's result depends on besides its arguments.
+TOOL_STATE_KEYS = {
+    "get_weather_stateful": ("user_preference_temperature_unit", "user_preference_units"),
+    "get_weather_stateful_async": ("user_preference_temperature_unit", "user_preference_units"),
+    "get_weather_many": ("user_preference_temperature_unit", "user_preference_units"),
+    "say_hello": (),
+    "say_goodbye": (),
+}
+
+
+class ToolMemo:
+    """Returns the earlier result when a model repeats a tool call it already made in the same turn.
+
+    Models sometimes call the same tool with the same arguments twice in one turn (a retry, or a
+    sub-agent redoing what the root agent did). Results are remembered per turn (or per session,
+    with a window) and keyed by tool name, arguments and the state keys the tool reads
+    (TOOL_STATE_KEYS, which the tool must not write itself), so a repeat gets the identical result
+    object and the state the tool wrote, without running it again. Results are reused within the
+    same invocation, or for `window` seconds across the session's later turns.
+    Error results are not remembered, so a retry after a failure really retries.
+    Args:
+        window (float): Defaults to TOOL_MEMO_WINDOW.
+        enabled (bool): Defaults to TOOL_MEMO_ENABLED.
+        max_scopes (int): Turns (or sessions, with a window) whose results are kept before the least
+            recently used is dropped.
+    """
+
+    def __init__(self, window: float = TOOL_MEMO_WINDOW, enabled: bool = TOOL_MEMO_ENABLED,
+                 max_scopes: int = 1024):
+        self.window = window
+        self.enabled = enabled
+        self.max_scopes = max_scopes
+        self.calls = 0
+        self.executed = 0
+        self.suppressed = {}  # tool name -> duplicate calls answered from the memo
+        self._scopes = OrderedDict()  # invocation id or session -> {key: (result, state_delta, stored_at, invocation)}
+
+    def _scope(self, tool_context):
+        if not self.window:
+            return tool_context.invocation_id
+        # Reuse across turns needs the session, which ToolContext has no public accessor for.
+        session = tool_context._invocation_context.session
+        return session.app_name, session.user_id, session.id
+
+    @staticmethod
+    def key(name: str, args: dict, state) -> tuple:
+        relevant = tuple(state.get(k) for k in TOOL_STATE_KEYS[name])
+        return name, json.dumps(args, sort_keys=True, default=str), json.dumps(relevant, default=str)
+
+    def _usable(self, entry: tuple, invocation_id: str, now: float) -> bool:
+        return entry[3] == invocation_id or now - entry[2] <= self.window
+
+    def before(self, tool, args: dict, tool_context):
+        """before_tool_callback: the remembered result for a repeated call (replaying its state writes), else None."""
+        if not self.enabled or tool.name not in TOOL_STATE_KEYS:
+            return None
+        self.calls += 1
+        memo = self._scopes.get(self._scope(tool_context))
+        entry = memo.get(self.key(tool.name, args, tool_context.state)) if memo else None
+        if entry is None or not self._usable(entry, tool_context.invocation_id, time.monotonic()):
+            self.executed += 1
+            return None
+        result, state_delta = entry[0], entry[1]
+        for k, v in state_delta.items():
+            tool_context.state[k] = v
+        self.suppressed[tool.name] = self.suppressed.get(tool.name, 0) + 1
+        return result
+
+    def after(self, tool, args: dict, tool_context, tool_response):
+        """after_tool_callback: remembers a fresh result. Always returns None (the response is unchanged)."""
+        if (not self.enabled or tool.name not in TOOL_STATE_KEYS
+                or (isinstance(tool_response, dict) and tool_response.get("status") == "error")):
+            return None
+        # Recomputed here instead of kept from before(): ADK doesn't call after() when the tool raises,
+        # so anything kept would leak. The state keys in it are ones the tool doesn't write.
+        key = self.key(tool.name, args, tool_context.state)
+        scope, now = self._scope(tool_context), time.monotonic()
+        memo = self._scopes.get(scope)
+        if memo is None:
+            memo = self._scopes[scope] = {}
+        else:
+            entry = memo.get(key)
+            if entry is not None and entry[0] is tool_response:
+                return None  # answered from the memo by before(); keep its original stored_at
+            # Drop what neither this turn nor the window can reuse any more.
+            for stale in [k for k, entry in memo.items() if not self._usable(entry, tool_context.invocation_id, now)]:
+                del memo[stale]
+        self._scopes.move_to_end(scope)
+        memo[key] = (tool_response, dict(tool_context.actions.state_delta), now, tool_context.invocation_id)
+        while len(self._scopes) > self.max_scopes:
+            self._scopes.popitem(last=False)
+        return None
+
+    def stats(self) -> dict:
+        suppressed = sum(self.suppressed.values())
+        return {"calls": self.calls, "executed": self.executed, "suppressed": suppressed,
+                "suppressed_by_tool": dict(self.suppressed),
+                "suppressed_rate": suppressed / self.calls if self.calls else 0.0}
+
+
+_shared_memo = None
+
+
+def get_tool_memo() -> ToolMemo:
+    """Returns the process-wide ToolMemo, creating it on first use."""
+    global _shared_memo
+    if _shared_memo is None:
+        _shared_memo = ToolMemo()
+    return _shared_memo
+
+
+def memo_before_tool(tool, args, tool_context):
+    """before_tool_callback for the agents: answers repeated tool calls from get_tool_memo()."""
+    return get_tool_memo().before(tool, args, tool_context)
+
+
+def memo_after_tool(tool, args, tool_context, tool_response):
+    """after_tool_callback for the agents: remembers tool results in get_tool_memo()."""
+    return get_tool_memo().after(tool, args, tool_context, tool_response)
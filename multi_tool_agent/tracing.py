@@ -0,0 +1,209 @@
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+# Fraction of turns that get traced; 0 turns tracing off, 1 traces every turn.
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# Where finished spans go: a JSON-lines file path, or unset for the in-process ring buffer.
+TRACE_FILE = os.getenv("TRACE_FILE")
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation inside a traced turn."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration", "attributes", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration = None
+        self.attributes = attributes
+        self._token = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "trace_id": self.trace_id, "span_id": self.span_id,
+                "parent_id": self.parent_id, "start": self.start,
+                "duration_ms": None if self.duration is None else round(self.duration * 1000, 3),
+                "attributes": self.attributes}
+
+
+class _NoopSpan:
+    """Stands in for a span when the turn isn't sampled, so call sites never need to check."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class RingBufferExporter:
+    """Keeps the most recent finished spans in memory."""
+
+    def __init__(self, max_spans: int = 4096):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def flush(self):
+        pass
+
+    def traces(self) -> dict[str, list[dict]]:
+        """Buffered spans grouped by trace id, in finishing order."""
+        grouped = {}
+        for span in list(self.spans):
+            grouped.setdefault(span.trace_id, []).append(span.to_dict())
+        return grouped
+
+
+class JsonlFileExporter:
+    """Appends finished spans to a JSON-lines file, batching writes off the per-span path."""
+
+    def __init__(self, path: str, batch_size: int = 256):
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        with self._lock:
+            self._pending.append(span)
+            if len(self._pending) < self.batch_size:
+                return
+            pending, self._pending = self._pending, []
+        self._write(pending)
+
+    def _write(self, spans: list[Span]):
+        with open(self.path, "a") as f:
+            f.write("".join(json.dumps(span.to_dict()) + "\n" for span in spans))
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if pending:
+            self._write(pending)
+
+
+class Tracer:
+    """Records per-turn spans (LLM calls, delegation, HTTP, cache lookups, state writes).
+
+    Sampling is decided once per turn when the root span starts; for unsampled turns every
+    span() call returns NOOP_SPAN after a single context-variable lookup.
+    Args:
+        sample_rate (float): Fraction of turns traced. Defaults to TRACE_SAMPLE_RATE.
+        exporter: Receives finished spans. Defaults to a JsonlFileExporter on TRACE_FILE if set,
+            otherwise a RingBufferExporter.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE, exporter=None):
+        self.sample_rate = sample_rate
+        self.exporter = exporter or (JsonlFileExporter(TRACE_FILE) if TRACE_FILE else RingBufferExporter())
+
+    def start_span(self, name: str, root: bool = False, **attributes):
+        """Starts a span without making it current; finish it with end_span()."""
+        parent = _current_span.get()
+        if parent is None:
+            if not root or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+                return NOOP_SPAN
+            return Span(name, f"{random.getrandbits(64):016x}", None, attributes)
+        if parent is NOOP_SPAN:
+            return NOOP_SPAN
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+
+    def end_span(self, span):
+        if span is NOOP_SPAN:
+            return
+        span.duration = time.time() - span.start
+        self.exporter.export(span)
+        if span.parent_id is None and _open_llm_spans:
+            # The turn is over. A model call that raised never reached after_model, so its span ends here.
+            for key in [key for key, llm_span in _open_llm_spans.items() if llm_span.trace_id == span.trace_id]:
+                llm_span = _open_llm_spans.pop(key)
+                llm_span.set(error="model call did not complete")
+                self.end_span(llm_span)
+
+    @contextmanager
+    def span(self, name: str, root: bool = False, **attributes):
+        """Times the enclosed block as a child of the current span. root=True starts a new turn trace."""
+        if root:
+            span = self.start_span(name, root=True, **attributes)
+        elif _current_span.get() in (None, NOOP_SPAN):
+            # Fast path for unsampled turns and untraced callers.
+            yield NOOP_SPAN
+            return
+        else:
+            span = self.start_span(name, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set(error=repr(e))
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    def current_span(self):
+        return _current_span.get() or NOOP_SPAN
+
+
+_tracer = None
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide Tracer, creating it on first use."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+        # The file exporter batches writes; don't lose the last partial batch at exit.
+        atexit.register(_tracer.exporter.flush)
+    return _tracer
+
+
+# ADK model callbacks run in the turn's context but can't wrap the call in a with-block,
+# so open LLM spans are parked here between before_model and after_model (or the end of the turn).
+_open_llm_spans = {}
+
+
+def trace_llm_start(callback_context, llm_request):
+    """before_model_callback: opens an "llm.call" span for the agent's model call."""
+    span = get_tracer().start_span("llm.call", agent=callback_context.agent_name,
+                                   request_contents=len(llm_request.contents))
+    if span is not NOOP_SPAN:
+        _open_llm_spans[(callback_context.invocation_id, callback_context.agent_name)] = span
+    return None
+
+
+def trace_llm_end(callback_context, llm_response):
+    """after_model_callback: closes the span, noting any tool calls or transfer the model asked for."""
+    if llm_response.partial:
+        return None  # streaming runs this once per chunk; the span covers the whole call
+    span = _open_llm_spans.pop((callback_context.invocation_id, callback_context.agent_name), None)
+    if span is None:
+        return None
+    parts = llm_response.content.parts if llm_response.content and llm_response.content.parts else []
+    calls = [part.function_call.name for part in parts if part.function_call]
+    if calls:
+        span.set(function_calls=calls)
+    get_tracer().end_span(span)
+    return None
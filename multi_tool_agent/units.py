@@ -0,0 +1,207 @@
+from enum import IntEnum
+from typing import NamedTuple
+
+# Session state keys: the compact preference code, and the readable temperature unit name older
+# sessions (and the agents' instructions) use. Both are written together; see UnitPreference.from_state.
+UNITS_STATE_KEY = "user_preference_units"
+TEMPERATURE_STATE_KEY = "user_preference_temperature_unit"
+
+
+class TemperatureUnit(IntEnum):
+    CELSIUS = 0
+    FAHRENHEIT = 1
+    KELVIN = 2
+
+    @classmethod
+    def parse(cls, value) -> "TemperatureUnit":
+        """Accepts the enum, its value, or a name or symbol such as "Fahrenheit", "f", "°F" or "K"."""
+        if isinstance(value, int):
+            return cls(value)
+        text = str(value).strip().lstrip("°").upper()
+        for unit in cls:
+            if text in (unit.name, unit.name[0]):
+                return unit
+        raise ValueError(f"unknown temperature unit {value!r}")
+
+    @property
+    def label(self) -> str:
+        return self.name.capitalize()
+
+    def convert(self, temp_c: float) -> float:
+        if self is TemperatureUnit.FAHRENHEIT:
+            return temp_c * 9 / 5 + 32
+        if self is TemperatureUnit.KELVIN:
+            return temp_c + 273.15
+        return temp_c
+
+
+class WindUnit(IntEnum):
+    """NONE leaves wind out of the report."""
+    NONE = 0
+    METRES_PER_SECOND = 1
+    KILOMETRES_PER_HOUR = 2
+    MILES_PER_HOUR = 3
+    KNOTS = 4
+
+    @classmethod
+    def parse(cls, value) -> "WindUnit":
+        """Accepts the enum, its value, its name or a symbol such as "km/h", "mph" or "kn"."""
+        if isinstance(value, int):
+            return cls(value)
+        text = str(value).strip().lower()
+        for unit, (symbol, _, _) in WIND_FORMATS.items():
+            if text in (unit.name.lower(), symbol.lower()):
+                return unit
+        if text in ("", "none", "off"):
+            return cls.NONE
+        raise ValueError(f"unknown wind speed unit {value!r}")
+
+
+# WindUnit -> (symbol, factor from m/s, decimals shown)
+WIND_FORMATS = {
+    WindUnit.METRES_PER_SECOND: ("m/s", 1.0, 1),
+    WindUnit.KILOMETRES_PER_HOUR: ("km/h", 3.6, 0),
+    WindUnit.MILES_PER_HOUR: ("mph", 2.2369363, 0),
+    WindUnit.KNOTS: ("kn", 1.9438445, 0),
+}
+
+
+class Locale(IntEnum):
+    EN = 0
+    DE = 1
+    FR = 2
+    ES = 3
+
+    @classmethod
+    def parse(cls, value) -> "Locale":
+        """Accepts the enum, its value or a locale name such as "de", "de_DE" or "fr-FR"."""
+        if isinstance(value, int):
+            return cls(value)
+        try:
+            return cls[str(value).strip()[:2].upper()]
+        except KeyError:
+            raise ValueError(f"unsupported locale {value!r}") from None
+
+
+# Locale -> (decimal separator, space between a number and °C / °F). The report sentence stays
+# English like the agents' answers; only numbers and units follow the locale. The formatting is
+# done here rather than with the `locale` module, whose setting is process-wide.
+LOCALE_FORMATS = {
+    Locale.EN: (".", ""),
+    Locale.DE: (",", " "),
+    Locale.FR: (",", " "),
+    Locale.ES: (",", " "),
+}
+
+
+def format_temperature(temp_c: float, unit: TemperatureUnit, locale: Locale = Locale.EN) -> str:
+    """e.g. "16°C", "61°F", "289 K", or "16 °C" in the DE locale."""
+    value = f"{unit.convert(temp_c):.0f}"
+    if unit is TemperatureUnit.KELVIN:
+        return f"{value} K"
+    return f"{value}{LOCALE_FORMATS[locale][1]}°{unit.name[0]}"
+
+
+def format_wind(speed_ms: float, unit: WindUnit, locale: Locale = Locale.EN) -> str:
+    """e.g. "3.6 m/s", "13 km/h", or "3,6 m/s" in the DE locale. Empty for WindUnit.NONE."""
+    if unit is WindUnit.NONE:
+        return ""
+    symbol, factor, decimals = WIND_FORMATS[unit]
+    value = f"{speed_ms * factor:.{decimals}f}"
+    return f"{value.replace('.', LOCALE_FORMATS[locale][0])} {symbol}"
+
+
+class UnitPreference(NamedTuple):
+    """A session's units and number format. Stored in state as one small int (code)."""
+    temperature: TemperatureUnit = TemperatureUnit.CELSIUS
+    wind: WindUnit = WindUnit.NONE
+    locale: Locale = Locale.EN
+
+    @property
+    def code(self) -> int:
+        return self.temperature | self.wind << 4 | self.locale << 8
+
+    @classmethod
+    def from_code(cls, code: int) -> "UnitPreference":
+        try:
+            return _PREFERENCES[code]
+        except (KeyError, TypeError):
+            raise ValueError(f"unknown unit preference code {code!r}") from None
+
+    @classmethod
+    def from_state(cls, state) -> "UnitPreference":
+        """The preference in a session's state: the code if set, else the temperature unit name, else the default.
+
+        The name can also be written on its own (set_state, older clients); when it disagrees with the
+        code's temperature unit the name is the newer of the two and wins.
+        """
+        preference = _PREFERENCES.get(state.get(UNITS_STATE_KEY))
+        name = state.get(TEMPERATURE_STATE_KEY)
+        if not name:
+            return preference or _PREFERENCES[0]
+        named = _PREFERENCES_BY_NAME.get(name)
+        if named is None:
+            try:
+                named = cls(TemperatureUnit.parse(name))
+            except ValueError:
+                return preference or _PREFERENCES[0]
+        if preference is None:
+            return named
+        if preference.temperature is named.temperature:
+            return preference
+        return _PREFERENCES[preference.code & ~0xF | named.temperature]
+
+    def state_delta(self) -> dict:
+        """State changes that store this preference (both keys, so they never disagree)."""
+        return {UNITS_STATE_KEY: self.code, TEMPERATURE_STATE_KEY: self.temperature.label}
+
+
+# Every preference by code, and the plain ones by temperature unit name, built once: decoding a session's
+# preference on each tool call is then a dict lookup instead of constructing enums.
+_PREFERENCES = {preference.code: preference for preference in
+                (UnitPreference(t, w, l) for t in TemperatureUnit for w in WindUnit for l in Locale)}
+_PREFERENCES_BY_NAME = {unit.label: UnitPreference(unit) for unit in TemperatureUnit}
+
+
+def compose_report(city: str, condition: str, temperature: str, wind: str = "") -> str:
+    report = f"The weather in {city.capitalize()} is {condition} with a temperature of {temperature}"
+    return f"{report} and wind at {wind}." if wind else f"{report}."
+
+
+def format_report(city: str, observation: dict, preference: UnitPreference) -> str:
+    """Formats an observation ({"condition", "temp_c", optional "wind_ms"}) from scratch."""
+    wind_ms = observation.get("wind_ms")
+    return compose_report(city, observation["condition"],
+                          format_temperature(observation["temp_c"], preference.temperature, preference.locale),
+                          "" if wind_ms is None else format_wind(wind_ms, preference.wind, preference.locale))
+
+
+class FormattedObservation(dict):
+    """An observation that carries its temperature and wind text in every unit and locale.
+
+    Built once when the weather cache stores an observation, so that reports for cache hits
+    are assembled from ready-made parts, and a finished report is kept per (city, preference)
+    so a repeated lookup gets the same string back without formatting anything.
+    """
+
+    max_reports = 64
+
+    def __init__(self, observation: dict):
+        super().__init__(observation)
+        self.temperatures = {(unit, locale): format_temperature(self["temp_c"], unit, locale)
+                             for unit in TemperatureUnit for locale in Locale}
+        wind_ms = self.get("wind_ms")
+        self.winds = {(unit, locale): format_wind(wind_ms, unit, locale)
+                      for unit in WindUnit for locale in Locale} if wind_ms is not None else {}
+        self.reports = {}  # (city, preference code) -> report
+
+    def report(self, city: str, preference: UnitPreference) -> str:
+        key = (city, preference.code)
+        report = self.reports.get(key)
+        if report is None:
+            if len(self.reports) >= self.max_reports:
+                self.reports.clear()
+            report = self.reports[key] = compose_report(
+                city, self["condition"], self.temperatures[preference.temperature, preference.locale],
+                self.winds.get((preference.wind, preference.locale), ""))
+        return report
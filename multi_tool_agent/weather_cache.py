@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from .tracing import get_tracer
+from .units import FormattedObservation
+
+load_dotenv()
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+# How long past its TTL an observation may still be served when fetching a fresh one fails (0 disables).
+WEATHER_STALE_TTL = float(os.getenv("WEATHER_STALE_TTL", "3600"))
+# SQLite file shared by every process on the host (e.g. serving workers); unset keeps the cache in memory.
+WEATHER_CACHE_PATH = os.getenv("WEATHER_CACHE_PATH")
+# Cache reads and writes run on the event loop, so they don't wait on another process's write lock;
+# a write that can't get it within WEATHER_CACHE_DB_BUSY_TIMEOUT is skipped (the copy in memory is kept).
+WEATHER_CACHE_DB_BUSY_TIMEOUT = 0.005
+
+
+class WeatherCache:
+    """Short-lived cache of current observations keyed by rounded (lat, lon), with request coalescing.
+
+    OpenWeather refreshes observations roughly every 10 minutes, so a TTL in the 5-10 minute
+    range serves repeat cities without losing freshness. Concurrent misses for the same key
+    share one in-flight fetch instead of each going upstream. If that fetch fails, an expired
+    observation up to stale_ttl seconds past its TTL is served instead, marked "stale".
+    Stored observations are FormattedObservations, so their report text in every unit is
+    formatted once per observation rather than on every hit.
+    With db_path set, stored observations are also written to SQLite and a process whose own
+    copy is missing or expired checks there first, so one upstream fetch serves every process.
+    Writing there is best effort: if another process holds the lock the write is skipped.
+    Args:
+        ttl (float): Seconds an observation is served from cache. Defaults to WEATHER_CACHE_TTL.
+        stale_ttl (float): Extra seconds an expired observation may stand in for a failed fetch.
+            Defaults to WEATHER_STALE_TTL.
+        precision (int): Decimal places lat/lon are rounded to for the key (2 is ~1 km).
+        max_entries (int): Entries kept before the least recently used is dropped.
+        db_path (str, optional): SQLite file shared with other processes. Defaults to WEATHER_CACHE_PATH.
+    """
+
+    def __init__(self, ttl: float = WEATHER_CACHE_TTL, precision: int = 2, max_entries: int = 4096,
+                 stale_ttl: float = WEATHER_STALE_TTL, db_path: str | None = WEATHER_CACHE_PATH):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.precision = precision
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+        self.shared_loads = 0
+        self.shared_write_skips = 0
+        self._entries = OrderedDict()  # key -> (observation, stored_at, generation)
+        self._in_flight = {}  # key -> (asyncio.Future, whether it is a background refresh)
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS weather (lat REAL NOT NULL, lon REAL NOT NULL, "
+                             "observation TEXT NOT NULL, stored_at REAL NOT NULL, PRIMARY KEY (lat, lon))")
+            self._db.commit()
+            self._db.execute(f"PRAGMA busy_timeout = {int(WEATHER_CACHE_DB_BUSY_TIMEOUT * 1000)}")
+
+    def key(self, lat: float, lon: float) -> tuple[float, float]:
+        return round(lat, self.precision), round(lon, self.precision)
+
+    def _remember(self, key: tuple[float, float], observation: dict, stored_at: float) -> tuple:
+        self._generation += 1
+        entry = self._entries[key] = (FormattedObservation(observation), stored_at, self._generation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _entry(self, key: tuple[float, float]) -> tuple | None:
+        """This process's entry, or a newer one from the shared store if ours is missing or expired."""
+        entry = self._entries.get(key)
+        if self._db is not None and (entry is None or time.time() - entry[1] > self.ttl):
+            with self._lock:
+                try:
+                    row = self._db.execute("SELECT observation, stored_at FROM weather WHERE lat = ? AND lon = ?",
+                                           key).fetchone()
+                except sqlite3.OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    row = None
+            if row is not None and (entry is None or row[1] > entry[1]):
+                entry = self._remember(key, json.loads(row[0]), row[1])
+                self.shared_loads += 1
+        return entry
+
+    def _fresh(self, key: tuple[float, float]) -> dict | None:
+        entry = self._entry(key)
+        if entry is None or time.time() - entry[1] > self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def get(self, lat: float, lon: float) -> dict | None:
+        """Returns the cached observation if it is still fresh, else None. Counts a hit or miss."""
+        observation = self._fresh(self.key(lat, lon))
+        if observation is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return observation
+
+    def expires_in(self, lat: float, lon: float) -> float | None:
+        """Seconds until the cached observation goes stale (negative once it has), or None if there is none."""
+        entry = self._entry(self.key(lat, lon))
+        if entry is None:
+            return None
+        return self.ttl - (time.time() - entry[1])
+
+    def generation(self, lat: float, lon: float) -> int | None:
+        """Identifies the stored observation while it is fresh: changes whenever a new one is stored
+        for the coordinate. None if there is no fresh observation."""
+        entry = self._entry(self.key(lat, lon))
+        if entry is None or time.time() - entry[1] > self.ttl:
+            return None
+        return entry[2]
+
+    def get_stale(self, lat: float, lon: float) -> dict | None:
+        """Returns an expired observation still within stale_ttl, marked stale with its age, else None."""
+        entry = self._entry(self.key(lat, lon))
+        if entry is None:
+            return None
+        age = time.time() - entry[1]
+        if age > self.ttl + self.stale_ttl:
+            return None
+        return {**entry[0], "stale": True, "age_s": round(age)}
+
+    def put(self, lat: float, lon: float, observation: dict) -> FormattedObservation:
+        """Stores an observation and returns the stored (formatted) copy."""
+        key = self.key(lat, lon)
+        stored_at = time.time()
+        stored = self._remember(key, observation, stored_at)[0]
+        if self._db is not None:
+            with self._lock:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO weather (lat, lon, observation, stored_at) "
+                                     "VALUES (?, ?, ?, ?)", (*key, json.dumps(observation), stored_at))
+                    self._db.commit()
+                except sqlite3.OperationalError as e:
+                    self._db.rollback()
+                    if "locked" not in str(e):
+                        raise
+                    self.shared_write_skips += 1
+        return stored
+
+    async def get_or_fetch(self, lat: float, lon: float, fetch, stale_on: tuple = (), refresh: bool = False) -> dict:
+        """Returns a fresh observation, calling `await fetch(lat, lon)` only if nobody else already is.
+
+        If fetch raises one of `stale_on` and a stale observation is available (see get_stale), every
+        caller gets that instead. Other errors reach every coalesced caller and nothing is cached.
+        refresh=True fetches even if the cached observation is still fresh (background refresh); it
+        is not counted as a hit or miss. Lookups during a refresh are still served the fresh entry, and
+        never get a refresh's error.
+        """
+        key = self.key(lat, lon)
+        span = get_tracer().current_span()
+        counted = refresh  # refreshes count as neither hits nor misses
+        while True:
+            if not refresh:
+                observation = self._fresh(key)
+                if observation is not None:
+                    if not counted:
+                        self.hits += 1
+                    span.set(outcome="hit")
+                    return observation
+            flight = self._in_flight.get(key)
+            if flight is None:
+                break
+            future, refreshing = flight
+            if refresh or not refreshing:
+                if not counted:
+                    self.coalesced += 1
+                span.set(outcome="coalesced")
+                return await asyncio.shield(future)
+            # A lookup whose entry expired while a background refresh is under way waits for it, but
+            # the refresh's failure isn't handed on: it was fetched without this caller's stale_on,
+            # so look again (a fresh entry, another caller's fetch, or our own).
+            if not counted:
+                self.misses += 1
+                counted = True
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            except Exception:
+                pass
+        if not counted:
+            self.misses += 1
+        span.set(outcome="refresh" if refresh else "miss")
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (future, refresh)
+        try:
+            observation = await fetch(lat, lon)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            stale = self.get_stale(lat, lon) if isinstance(e, stale_on) else None
+            if stale is not None:
+                self.stale_served += 1
+                span.set(outcome="stale")
+                future.set_result(stale)
+                return stale
+            future.set_exception(e)
+            # Mark retrieved so an error nobody else waited for isn't logged as unhandled.
+            future.exception()
+            raise
+        else:
+            observation = self.put(lat, lon, observation)
+            future.set_result(observation)
+            return observation
+        finally:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "coalesced": self.coalesced, "stale_served": self.stale_served, "shared_loads": self.shared_loads,
+                "shared_write_skips": self.shared_write_skips,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0}
+
+
+_shared_cache = None
+
+
+def get_weather_cache() -> WeatherCache:
+    """Returns the process-wide WeatherCache, creating it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = WeatherCache()
+    return _shared_cache
@@ -0,0 +1,242 @@
+import asyncio
+import os
+import time
+
+import httpx
+import requests
+from dotenv import load_dotenv
+
+from .rate_limiter import RateLimiter, RateLimitTimeout, get_rate_limiter
+from .resilience import RETRYABLE_STATUS, CircuitBreaker, CircuitOpenError, RetryPolicy
+from .tracing import get_tracer
+from .weather_provider import ProviderError, WeatherProvider
+
+load_dotenv()
+WEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org")
+OPENWEATHER_CONNECT_TIMEOUT = float(os.getenv("OPENWEATHER_CONNECT_TIMEOUT", "3"))
+OPENWEATHER_READ_TIMEOUT = float(os.getenv("OPENWEATHER_READ_TIMEOUT", "5"))
+
+GEOCODE_PATH = "/geo/1.0/direct"
+WEATHER_PATH = "/data/2.5/weather"
+
+
+class OpenWeatherError(ProviderError):
+    """Raised when OpenWeather answers with anything other than a usable 200, or can't be reached."""
+
+    def __init__(self, message: str, status_code: int | None = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """True for timeouts, connection errors and 429/5xx; False when the request itself was rejected."""
+        return self.status_code is None or self.status_code in RETRYABLE_STATUS
+
+
+def observation_from(data: dict) -> dict:
+    """The parts of a /data/2.5/weather response (metric units) the reports use."""
+    return {"condition": data["weather"][0]["description"], "temp_c": data["main"]["temp"],
+            "wind_ms": (data.get("wind") or {}).get("speed")}
+
+
+class OpenWeatherClient(WeatherProvider):
+    """Async OpenWeather client with a pooled keep-alive connection and bounded concurrency.
+
+    One instance is meant to be shared by every session in the process (see get_client()).
+    Every request has a hard deadline, is retried with jittered backoff on timeouts, connection
+    errors and 429/5xx, and goes through a per-endpoint CircuitBreaker that fails fast while
+    OpenWeather is degraded. Each attempt first takes a call from the RateLimiter, queueing when
+    the plan's budget is spent.
+    Args:
+        api_key (str, optional): OpenWeather API key. Defaults to OPENWEATHER_API_KEY.
+        base_url (str, optional): Base URL of the API, overridable for local stub servers.
+        max_connections (int): Upper bound on pooled connections.
+        max_keepalive (int): Idle connections kept alive for reuse.
+        connect_timeout (float): Seconds to wait for a connection. Defaults to OPENWEATHER_CONNECT_TIMEOUT.
+        read_timeout (float): Seconds to wait for a response. Defaults to OPENWEATHER_READ_TIMEOUT.
+        max_concurrency (int): Upstream requests allowed in flight at once.
+        retry (RetryPolicy, optional): Defaults to RetryPolicy().
+        rate_limiter (RateLimiter, optional): Defaults to the process-wide get_rate_limiter().
+    """
+
+    def __init__(self, api_key: str | None = None, base_url: str = OPENWEATHER_BASE_URL,
+                 max_connections: int = 50, max_keepalive: int = 20,
+                 connect_timeout: float = OPENWEATHER_CONNECT_TIMEOUT,
+                 read_timeout: float = OPENWEATHER_READ_TIMEOUT,
+                 max_concurrency: int = 50, retry: RetryPolicy | None = None,
+                 rate_limiter: RateLimiter | None = None):
+        self.api_key = api_key if api_key is not None else WEATHER_API_KEY
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        # httpx's read timeout is per socket read, so a server trickling bytes could hold a
+        # request open indefinitely; this caps the whole attempt.
+        self.deadline = connect_timeout + read_timeout
+        self.max_concurrency = max_concurrency
+        self.retry = retry or RetryPolicy()
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.breakers = {path: CircuitBreaker(path) for path in (GEOCODE_PATH, WEATHER_PATH)}
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        # The pool is tied to the running loop, so rebuild it if a new loop is in charge
+        # (e.g. consecutive asyncio.run() calls in scripts).
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(base_url=self.base_url, limits=self.limits,
+                                             timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def _attempt(self, client: httpx.AsyncClient, path: str, params: dict, span) -> httpx.Response:
+        rate_wait = await self.rate_limiter.acquire()
+        queued = time.perf_counter()
+        async with self._semaphore:
+            span.set(rate_wait_ms=round(rate_wait * 1000, 3), queue_ms=round((time.perf_counter() - queued) * 1000, 3))
+            try:
+                return await asyncio.wait_for(client.get(path, params=params), self.deadline)
+            except asyncio.TimeoutError as e:
+                raise OpenWeatherError(f"Request to {path} exceeded {self.deadline}s") from e
+            except httpx.HTTPError as e:
+                raise OpenWeatherError(f"Request to {path} failed: {e!r}") from e
+
+    async def _get_json(self, path: str, params: dict):
+        client = self._get_http_client()
+        params = {**params, "appid": self.api_key}
+        breaker = self.breakers[path]
+        with get_tracer().span("http.get", path=path) as span:
+            for attempt in range(1, self.retry.max_attempts + 1):
+                try:
+                    breaker.check()
+                except CircuitOpenError as e:
+                    span.set(circuit_open=True)
+                    raise OpenWeatherError(str(e)) from e
+                retry_after = None
+                try:
+                    response = await self._attempt(client, path, params, span)
+                except OpenWeatherError as e:
+                    error = e
+                except RateLimitTimeout as e:
+                    # Nothing reached OpenWeather, so the breaker learns nothing; no point retrying either.
+                    breaker.release()
+                    span.set(rate_limited=True)
+                    raise OpenWeatherError(str(e), status_code=429) from e
+                except BaseException:
+                    breaker.release()
+                    raise
+                else:
+                    span.set(status_code=response.status_code, attempts=attempt)
+                    if response.status_code == 200:
+                        breaker.record_success()
+                        return response.json()
+                    error = OpenWeatherError(f"{path} returned HTTP {response.status_code}",
+                                             status_code=response.status_code)
+                    retry_after = response.headers.get("Retry-After")
+                if not error.retryable:
+                    # OpenWeather answered; it's this request (bad key, unknown path) that's wrong.
+                    breaker.record_success()
+                    raise error
+                breaker.record_failure()
+                if attempt < self.retry.max_attempts:
+                    await asyncio.sleep(self.retry.backoff(attempt, retry_after))
+            span.set(attempts=self.retry.max_attempts, error=str(error))
+            raise error
+
+    async def geocode(self, city: str) -> tuple[float, float] | None:
+        """Looks up a city's coordinates.
+        Returns:
+            tuple: (lat, lon) of the best match, or None if OpenWeather doesn't know the city.
+        """
+        data = await self._get_json(GEOCODE_PATH, {"q": city, "limit": 1})
+        if not data:
+            return None
+        return data[0]["lat"], data[0]["lon"]
+
+    async def current_weather(self, lat: float, lon: float) -> dict:
+        """Fetches the current observation for a coordinate, in metric units.
+        Returns:
+            dict: {"condition": str, "temp_c": float, "wind_ms": float or None}
+        """
+        data = await self._get_json(WEATHER_PATH, {"lat": lat, "lon": lon, "units": "metric"})
+        return observation_from(data)
+
+    def get_json_blocking(self, path: str, params: dict):
+        """Blocking GET for synchronous callers, with this client's timeouts, retries and circuit breakers.
+        Returns:
+            The decoded JSON body. Raises OpenWeatherError otherwise.
+        """
+        breaker = self.breakers[path]
+        timeout = (self.timeout.connect, self.timeout.read)
+        for attempt in range(1, self.retry.max_attempts + 1):
+            try:
+                breaker.check()
+            except CircuitOpenError as e:
+                raise OpenWeatherError(str(e)) from e
+            retry_after = None
+            try:
+                self.rate_limiter.acquire_blocking()
+                response = requests.get(f"{self.base_url}{path}", params={**params, "appid": self.api_key},
+                                        timeout=timeout)
+            except requests.RequestException as e:
+                error = OpenWeatherError(f"Request to {path} failed: {e!r}")
+            except RateLimitTimeout as e:
+                breaker.release()
+                raise OpenWeatherError(str(e), status_code=429) from e
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                if response.status_code == 200:
+                    breaker.record_success()
+                    return response.json()
+                error = OpenWeatherError(f"{path} returned HTTP {response.status_code}", status_code=response.status_code)
+                retry_after = response.headers.get("Retry-After")
+            if not error.retryable:
+                breaker.record_success()
+                raise error
+            breaker.record_failure()
+            if attempt < self.retry.max_attempts:
+                time.sleep(self.retry.backoff(attempt, retry_after))
+        raise error
+
+    def geocode_blocking(self, city: str) -> tuple[float, float] | None:
+        data = self.get_json_blocking(GEOCODE_PATH, {"q": city, "limit": 1})
+        if not data:
+            return None
+        return data[0]["lat"], data[0]["lon"]
+
+    def current_weather_blocking(self, lat: float, lon: float) -> dict:
+        data = self.get_json_blocking(WEATHER_PATH, {"lat": lat, "lon": lon, "units": "metric"})
+        return observation_from(data)
+
+    def stats(self) -> dict:
+        """Circuit breaker state per endpoint and rate limiter metrics."""
+        return {"breakers": {path: breaker.stats() for path, breaker in self.breakers.items()},
+                "rate_limit": self.rate_limiter.stats()}
+
+    async def aclose(self):
+        """Closes the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_shared_client = None
+
+
+def get_client() -> OpenWeatherClient:
+    """Returns the process-wide OpenWeatherClient, creating it on first use."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = OpenWeatherClient()
+    return _shared_client
+
+
+def get_json_blocking(path: str, params: dict):
+    """Blocking GET through the shared client (see OpenWeatherClient.get_json_blocking)."""
+    return get_client().get_json_blocking(path, params)
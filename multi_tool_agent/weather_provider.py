@@ -0,0 +1,163 @@
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from .city_index import CityIndex
+from .geocode_cache import normalize_city
+
+load_dotenv()
+# "openweather" (default) geocodes and fetches over the network; "local" geocodes from CITY_INDEX_PATH.
+WEATHER_PROVIDER = os.getenv("WEATHER_PROVIDER", "openweather")
+# Index file built with `python -m multi_tool_agent.city_index build <dataset> <index>`.
+CITY_INDEX_PATH = os.getenv("CITY_INDEX_PATH")
+# With the local provider, fetch observations the dataset doesn't have from OpenWeather (0 turns it off).
+LOCAL_WEATHER_FALLBACK = os.getenv("LOCAL_WEATHER_FALLBACK", "1") != "0"
+
+
+class ProviderError(Exception):
+    """Raised when a weather provider can't answer; OpenWeatherError is the network provider's kind."""
+
+
+class WeatherProvider(ABC):
+    """Where the weather tools get coordinates and observations from.
+
+    Each lookup comes in an async form for the event loop and a blocking form for synchronous
+    tools. Implementations raise ProviderError (or a subclass) when they can't answer.
+    """
+
+    @abstractmethod
+    async def geocode(self, city: str) -> tuple[float, float] | None:
+        """Returns (lat, lon) of the best match for a city name, or None if there is none."""
+
+    @abstractmethod
+    async def current_weather(self, lat: float, lon: float) -> dict:
+        """Returns {"condition": str, "temp_c": float, "wind_ms": float or None} for a coordinate."""
+
+    @abstractmethod
+    def geocode_blocking(self, city: str) -> tuple[float, float] | None:
+        """Blocking form of geocode()."""
+
+    @abstractmethod
+    def current_weather_blocking(self, lat: float, lon: float) -> dict:
+        """Blocking form of current_weather()."""
+
+
+class LocalWeatherProvider(WeatherProvider):
+    """Answers from an offline CityIndex: geocoding never touches the network.
+
+    Observations come from the dataset when it has them (e.g. an OpenWeather bulk weather file),
+    taken from the nearest city within `max_km`; otherwise from `fallback`. Names the index doesn't
+    know are remembered (the index never changes), so repeating one doesn't rerun the fuzzy search.
+    Args:
+        index (CityIndex): The opened index.
+        fallback (WeatherProvider, optional): Provider for observations the dataset lacks. Defaults
+            to the shared OpenWeather client if LOCAL_WEATHER_FALLBACK is on, else none.
+        max_km (float): How far the nearest city with an observation may be from the coordinate.
+        max_not_found (int): Unknown names remembered before the least recently used is dropped.
+    """
+
+    def __init__(self, index: CityIndex, fallback: WeatherProvider | None = None, max_km: float = 25.0,
+                 max_not_found: int = 4096):
+        self.index = index
+        self._fallback = fallback
+        self.max_km = max_km
+        self.max_not_found = max_not_found
+        self.geocoded = 0
+        self.not_found = 0
+        self.not_found_cached = 0
+        self._not_found = OrderedDict()  # normalized name -> None
+        self.served_local = 0
+        self.served_fallback = 0
+
+    @property
+    def fallback(self) -> WeatherProvider | None:
+        if self._fallback is None and LOCAL_WEATHER_FALLBACK:
+            from .weather_client import get_client  # weather_client imports this module
+            return get_client()
+        return self._fallback
+
+    def _known_missing(self, key: str) -> bool:
+        if key not in self._not_found:
+            return False
+        self._not_found.move_to_end(key)
+        self.not_found += 1
+        self.not_found_cached += 1
+        return True
+
+    def _result(self, key: str, match) -> tuple[float, float] | None:
+        if match is None:
+            self.not_found += 1
+            self._not_found[key] = None
+            while len(self._not_found) > self.max_not_found:
+                self._not_found.popitem(last=False)
+            return None
+        self.geocoded += 1
+        return match.lat, match.lon
+
+    def geocode_blocking(self, city: str) -> tuple[float, float] | None:
+        key = normalize_city(city)
+        if self._known_missing(key):
+            return None
+        return self._result(key, self.index.lookup(city))
+
+    async def geocode(self, city: str) -> tuple[float, float] | None:
+        key = normalize_city(city)
+        if self._known_missing(key):
+            return None
+        # An exact match is a binary search; the fuzzy fallback scans up to 2 * MAX_SCAN keys, so it
+        # runs in a thread instead of stalling the event loop.
+        matches = self.index.exact(city, limit=1) or await asyncio.to_thread(self.index.fuzzy, city, 1)
+        return self._result(key, matches[0] if matches else None)
+
+    def _observation(self, lat: float, lon: float) -> dict | None:
+        for city, _ in self.index.nearest(lat, lon, k=1, max_km=self.max_km):
+            if city.temp_c is not None:
+                self.served_local += 1
+                return {"condition": city.condition or "unknown", "temp_c": city.temp_c, "wind_ms": None}
+        return None
+
+    def _no_fallback(self, lat: float, lon: float) -> ProviderError:
+        return ProviderError(f"no observation within {self.max_km} km of ({lat}, {lon}) in {self.index.path}")
+
+    async def current_weather(self, lat: float, lon: float) -> dict:
+        observation = self._observation(lat, lon)
+        if observation is not None:
+            return observation
+        fallback = self.fallback
+        if fallback is None:
+            raise self._no_fallback(lat, lon)
+        self.served_fallback += 1
+        return await fallback.current_weather(lat, lon)
+
+    def current_weather_blocking(self, lat: float, lon: float) -> dict:
+        observation = self._observation(lat, lon)
+        if observation is not None:
+            return observation
+        fallback = self.fallback
+        if fallback is None:
+            raise self._no_fallback(lat, lon)
+        self.served_fallback += 1
+        return fallback.current_weather_blocking(lat, lon)
+
+    def stats(self) -> dict:
+        return {**self.index.stats(), "geocoded": self.geocoded, "not_found": self.not_found,
+                "not_found_cached": self.not_found_cached, "served_local": self.served_local, "served_fallback": self.served_fallback}
+
+
+_shared_local = None
+
+
+def get_provider() -> WeatherProvider:
+    """Returns the provider selected by WEATHER_PROVIDER (the shared OpenWeather client by default)."""
+    global _shared_local
+    if WEATHER_PROVIDER == "local":
+        if _shared_local is None:
+            if not CITY_INDEX_PATH:
+                raise RuntimeError("WEATHER_PROVIDER=local needs CITY_INDEX_PATH")
+            _shared_local = LocalWeatherProvider(CityIndex(CITY_INDEX_PATH))
+        return _shared_local
+    from .weather_client import get_client
+    return get_client()
@@ -0,0 +1,226 @@
+"""Serves the agent from N worker processes behind one local HTTP front door.
+
+    python -m multi_tool_agent.worker_pool --workers 4 --port 8080 --state-dir ./weatherbot_state
+
+Each worker is its own process running a StreamServer with its own Runner for root_agent_stateful,
+so turns (and their JSON handling) use more than one core. The front door takes the same /chat
+and /health requests as stream_server and sends every request for a user to the same worker
+(hash of user_id), so one user's turns never race each other across processes. Workers share
+their durable state through SQLite files in the state directory: sessions, the geocode and
+weather caches and the OpenWeather budget (see STATE_FILES). Because sessions are shared, a
+request whose worker is down goes to the next one, and a worker that dies is restarted.
+"""
+import argparse
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import tempfile
+import zlib
+
+from .statefulagent import APP_NAME
+from .stream_server import StreamServer
+
+# Environment variable -> file in the state directory that workers share.
+STATE_FILES = {"SESSION_DB_PATH": "sessions.db", "GEOCODE_CACHE_PATH": "geocode.db",
+               "WEATHER_CACHE_PATH": "weather.db", "RATE_LIMIT_DB": "rate_limit.db"}
+# Seconds a worker gets to import the agent and start listening.
+WORKER_START_TIMEOUT = 60.0
+
+logger = logging.getLogger(__name__)
+
+
+def _serve_worker(conn, host: str, runner_factory, streaming: bool):
+    """Worker process entry point: serves a StreamServer on a free port and sends the port through conn."""
+    async def serve():
+        runner = runner_factory() if runner_factory is not None else None
+        server = await StreamServer(runner, streaming=streaming).start(host, 0)
+        conn.send(server.port)
+        conn.close()
+        await server.server.serve_forever()
+
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve())
+
+
+class WorkerPool:
+    """Starts worker processes and proxies /chat to them with per-user affinity.
+    Args:
+        workers (int, optional): Worker processes. Defaults to the number of CPUs.
+        state_dir (str, optional): Directory for the shared SQLite files. Variables from STATE_FILES that
+            are already set in the environment win. Without it workers share only what the environment names.
+        runner_factory (callable, optional): Picklable zero-argument callable building a worker's Runner.
+            Defaults to the worker's shared WeatherApp runner.
+        streaming (bool): Passed to every worker's StreamServer.
+    """
+
+    def __init__(self, workers: int | None = None, state_dir: str | None = None, runner_factory=None,
+                 streaming: bool = True):
+        self.workers = workers or os.cpu_count() or 1
+        self.state_dir = state_dir
+        self.runner_factory = runner_factory
+        self.streaming = streaming
+        self.processes = [None] * self.workers
+        self.ports = [None] * self.workers
+        self.requests = [0] * self.workers
+        self.failovers = 0
+        self.restarts = 0
+        self.server = None
+        self._context = multiprocessing.get_context("spawn")
+        self._supervisor = None
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def worker_env(self) -> dict[str, str]:
+        """The shared-state variables workers run with."""
+        env = {name: os.environ[name] for name in STATE_FILES if os.environ.get(name)}
+        if self.state_dir:
+            for name, filename in STATE_FILES.items():
+                env.setdefault(name, os.path.join(self.state_dir, filename))
+        return env
+
+    def worker_for(self, user_id: str) -> int:
+        return zlib.crc32(user_id.encode()) % self.workers
+
+    def _spawn(self, index: int):
+        receiver, sender = self._context.Pipe(duplex=False)
+        added = {name: value for name, value in self.worker_env().items() if name not in os.environ}
+        # Spawned workers copy the environment at start, and read these when their modules load.
+        os.environ.update(added)
+        try:
+            process = self._context.Process(target=_serve_worker, daemon=True,
+                                            args=(sender, "127.0.0.1", self.runner_factory, self.streaming))
+            process.start()
+        finally:
+            for name in added:
+                del os.environ[name]
+        sender.close()
+        self.processes[index] = process
+        return receiver
+
+    async def _await_port(self, index: int, receiver):
+        try:
+            if not await asyncio.to_thread(receiver.poll, WORKER_START_TIMEOUT):
+                raise RuntimeError(f"worker {index} did not start within {WORKER_START_TIMEOUT:.0f}s")
+            self.ports[index] = receiver.recv()
+        except EOFError:
+            raise RuntimeError(f"worker {index} exited during startup") from None
+        finally:
+            receiver.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        if self.state_dir:
+            os.makedirs(self.state_dir, exist_ok=True)
+        receivers = [self._spawn(index) for index in range(self.workers)]
+        await asyncio.gather(*(self._await_port(index, r) for index, r in enumerate(receivers)))
+        self.server = await asyncio.start_server(self.handle, host, port)
+        self._supervisor = asyncio.create_task(self._supervise())
+        return self
+
+    async def _supervise(self):
+        """Restarts workers that died; their users are served by the next worker meanwhile."""
+        while True:
+            await asyncio.sleep(1.0)
+            for index, process in enumerate(self.processes):
+                if not process.is_alive():
+                    self.ports[index] = None
+                    try:
+                        await self._await_port(index, self._spawn(index))
+                    except RuntimeError:
+                        logger.exception("Restarting worker %d failed", index)
+                        continue
+                    self.restarts += 1
+
+    async def forward(self, writer: asyncio.StreamWriter, index: int, method: str, url, body: bytes):
+        """Relays the request to worker `index`, or the next reachable one, and streams the response back."""
+        for attempt in range(self.workers):
+            worker = (index + attempt) % self.workers
+            try:
+                if self.ports[worker] is None:
+                    raise ConnectionRefusedError
+                upstream_reader, upstream_writer = await asyncio.open_connection("127.0.0.1", self.ports[worker])
+            except OSError:
+                self.failovers += 1
+                continue
+            self.requests[worker] += 1
+            try:
+                upstream_writer.write(f"{method} {url.geturl()} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+                                      f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+                await upstream_writer.drain()
+                while chunk := await upstream_reader.read(65536):
+                    writer.write(chunk)
+                    await writer.drain()
+            finally:
+                upstream_writer.close()
+            return
+        StreamServer.reply(writer, 503, {"error": "no worker available"})
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await StreamServer.read_request(reader)
+            if request is None:
+                return
+            method, url, body = request
+            if url.path == "/health":
+                StreamServer.reply(writer, 200, {"status": "ok", "app": APP_NAME, **self.stats()})
+            else:
+                payload = StreamServer.parse_chat(method, url, body) if url.path == "/chat" else None
+                await self.forward(writer, self.worker_for((payload or {}).get("user_id") or "anonymous"),
+                                   method, url, body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "alive": sum(p is not None and p.is_alive() for p in self.processes),
+                "requests": list(self.requests), "failovers": self.failovers, "restarts": self.restarts}
+
+    async def stop(self):
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._supervisor
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for process in self.processes:
+            if process is not None:
+                process.terminate()
+        for process in self.processes:
+            if process is not None:
+                await asyncio.to_thread(process.join, 5)
+
+
+async def _serve(workers: int, host: str, port: int, state_dir: str):
+    pool = await WorkerPool(workers, state_dir=state_dir).start(host, port)
+    print(f"{pool.workers} weather agent workers listening on http://{host}:{pool.port}/chat (state in {state_dir})")
+    try:
+        await pool.server.serve_forever()
+    finally:
+        await pool.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--state-dir", help="directory for the shared SQLite files (default: a temporary one)")
+    args = parser.parse_args()
+    with contextlib.ExitStack() as stack:
+        state_dir = args.state_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix="weatherbot_"))
+        with contextlib.suppress(KeyboardInterrupt):
+            asyncio.run(_serve(args.workers, args.host, args.port, state_dir))
+
+
+if __name__ == "__main__":
+    main()